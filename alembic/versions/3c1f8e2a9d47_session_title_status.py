@@ -0,0 +1,27 @@
+"""Session title job status
+
+Revision ID: 3c1f8e2a9d47
+Revises: 7b794543cce9
+Create Date: 2026-10-17 10:12:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f8e2a9d47'
+down_revision: Union[str, Sequence[str], None] = '7b794543cce9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Tracks the deferred auto-title job so the UI can poll for it
+    op.add_column('chat_sessions', sa.Column('title_status', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('chat_sessions', 'title_status')
@@ -0,0 +1,27 @@
+"""Session title job claim time
+
+Revision ID: 6e1c4b9a7d30
+Revises: d4a9c6e2f815
+Create Date: 2026-10-17 23:18:05.402716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e1c4b9a7d30'
+down_revision: Union[str, Sequence[str], None] = 'd4a9c6e2f815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # When the pending title job was claimed, so a job whose worker died can be reclaimed
+    op.add_column('chat_sessions', sa.Column('title_claimed_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('chat_sessions', 'title_claimed_at')
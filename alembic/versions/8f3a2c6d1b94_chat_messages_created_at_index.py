@@ -0,0 +1,27 @@
+"""Index chat_messages.created_at for the weather prefetch
+
+Revision ID: 8f3a2c6d1b94
+Revises: 6e1c4b9a7d30
+Create Date: 2026-10-17 23:41:27.630158
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f3a2c6d1b94'
+down_revision: Union[str, Sequence[str], None] = '6e1c4b9a7d30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # find_due_cells filters the recent messages every round; without this it scans the whole table
+    op.create_index(op.f('ix_chat_messages_created_at'), 'chat_messages', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_chat_messages_created_at'), table_name='chat_messages')
@@ -0,0 +1,29 @@
+"""Rolling chat summary on sessions
+
+Revision ID: 9e4b2d6f1a83
+Revises: 3c1f8e2a9d47
+Create Date: 2026-10-17 11:02:15.402961
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4b2d6f1a83'
+down_revision: Union[str, Sequence[str], None] = '3c1f8e2a9d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Summary of messages older than the verbatim history window + the last message it covers
+    op.add_column('chat_sessions', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('chat_sessions', sa.Column('summary_message_id', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('chat_sessions', 'summary_message_id')
+    op.drop_column('chat_sessions', 'summary')
@@ -0,0 +1,34 @@
+"""Explicit expires_at on the weather cache
+
+Revision ID: a3d7e1f9c268
+Revises: f1b8c3e6a527
+Create Date: 2026-10-17 18:52:30.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d7e1f9c268'
+down_revision: Union[str, Sequence[str], None] = 'f1b8c3e6a527'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('weather_cache', sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True))
+    # Same 3-hour window the app used to compute from fetched_at
+    op.execute("UPDATE weather_cache SET expires_at = fetched_at + interval '3 hours'")
+    op.execute("DELETE FROM weather_cache WHERE expires_at IS NULL")
+    op.alter_column('weather_cache', 'expires_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+    op.drop_index('ix_weather_cache_cell_fetched_at', table_name='weather_cache')
+    op.create_index('ix_weather_cache_cell_expires_at', 'weather_cache', ['cell', 'expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_weather_cache_cell_expires_at', table_name='weather_cache')
+    op.create_index('ix_weather_cache_cell_fetched_at', 'weather_cache', ['cell', 'fetched_at'], unique=False)
+    op.drop_column('weather_cache', 'expires_at')
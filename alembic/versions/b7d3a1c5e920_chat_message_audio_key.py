@@ -0,0 +1,30 @@
+"""Audio store reference on chat messages
+
+Revision ID: b7d3a1c5e920
+Revises: 9e4b2d6f1a83
+Create Date: 2026-10-17 11:40:27.913550
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d3a1c5e920'
+down_revision: Union[str, Sequence[str], None] = '9e4b2d6f1a83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # MP3s move to the audio store, rows keep only the content key.
+    # Existing blobs are moved by api/migrate_audio_blobs.py
+    op.add_column('chat_messages', sa.Column('audio_key', sa.String(), nullable=True))
+    op.create_index(op.f('ix_chat_messages_audio_key'), 'chat_messages', ['audio_key'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_chat_messages_audio_key'), table_name='chat_messages')
+    op.drop_column('chat_messages', 'audio_key')
@@ -0,0 +1,38 @@
+"""Reverse-geocode cache per location cell
+
+Revision ID: c8f2b5d9e374
+Revises: a3d7e1f9c268
+Create Date: 2026-10-17 19:36:12.774051
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8f2b5d9e374'
+down_revision: Union[str, Sequence[str], None] = 'a3d7e1f9c268'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('geocode_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cell', sa.String(), nullable=False),
+    sa.Column('state', sa.String(), nullable=True),
+    sa.Column('district', sa.String(), nullable=True),
+    sa.Column('source', sa.String(), nullable=False),
+    sa.Column('resolved_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_geocode_cache_id'), 'geocode_cache', ['id'], unique=False)
+    op.create_index(op.f('ix_geocode_cache_cell'), 'geocode_cache', ['cell'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_geocode_cache_cell'), table_name='geocode_cache')
+    op.drop_index(op.f('ix_geocode_cache_id'), table_name='geocode_cache')
+    op.drop_table('geocode_cache')
@@ -0,0 +1,47 @@
+"""Local mandi price warehouse
+
+Revision ID: d2a6f4b8c131
+Revises: b7d3a1c5e920
+Create Date: 2026-10-17 12:20:44.581032
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a6f4b8c131'
+down_revision: Union[str, Sequence[str], None] = 'b7d3a1c5e920'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('mandi_prices',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('state', sa.String(), nullable=False),
+    sa.Column('district', sa.String(), nullable=False),
+    sa.Column('market', sa.String(), nullable=False),
+    sa.Column('commodity', sa.String(), nullable=False),
+    sa.Column('variety', sa.String(), nullable=False),
+    sa.Column('grade', sa.String(), nullable=False),
+    sa.Column('arrival_date', sa.Date(), nullable=False),
+    sa.Column('min_price', sa.Float(), nullable=True),
+    sa.Column('max_price', sa.Float(), nullable=True),
+    sa.Column('modal_price', sa.Float(), nullable=True),
+    sa.Column('fetched_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('state', 'district', 'market', 'commodity', 'variety', 'grade', 'arrival_date', name='uq_mandi_prices_record')
+    )
+    op.create_index(op.f('ix_mandi_prices_id'), 'mandi_prices', ['id'], unique=False)
+    op.create_index('ix_mandi_prices_state_district_date', 'mandi_prices', ['state', 'district', 'arrival_date'], unique=False)
+    op.create_index('ix_mandi_prices_state_commodity_date', 'mandi_prices', ['state', 'commodity', 'arrival_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_mandi_prices_state_commodity_date', table_name='mandi_prices')
+    op.drop_index('ix_mandi_prices_state_district_date', table_name='mandi_prices')
+    op.drop_index(op.f('ix_mandi_prices_id'), table_name='mandi_prices')
+    op.drop_table('mandi_prices')
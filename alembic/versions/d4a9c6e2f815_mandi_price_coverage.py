@@ -0,0 +1,38 @@
+"""Coverage log for the mandi price warehouse
+
+Revision ID: d4a9c6e2f815
+Revises: c8f2b5d9e374
+Create Date: 2026-10-17 21:04:48.215390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a9c6e2f815'
+down_revision: Union[str, Sequence[str], None] = 'c8f2b5d9e374'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('mandi_price_coverage',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('state', sa.String(), nullable=False),
+    sa.Column('district', sa.String(), nullable=False),
+    sa.Column('arrival_date', sa.Date(), nullable=False),
+    sa.Column('source', sa.String(), nullable=False),
+    sa.Column('records', sa.Integer(), nullable=False),
+    sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('state', 'district', 'arrival_date', name='uq_mandi_price_coverage_scope')
+    )
+    op.create_index(op.f('ix_mandi_price_coverage_id'), 'mandi_price_coverage', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_mandi_price_coverage_id'), table_name='mandi_price_coverage')
+    op.drop_table('mandi_price_coverage')
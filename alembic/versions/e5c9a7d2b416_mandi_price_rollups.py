@@ -0,0 +1,45 @@
+"""Precomputed mandi price rollups
+
+Revision ID: e5c9a7d2b416
+Revises: d2a6f4b8c131
+Create Date: 2026-10-17 15:02:19.305417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c9a7d2b416'
+down_revision: Union[str, Sequence[str], None] = 'd2a6f4b8c131'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('mandi_price_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('state', sa.String(), nullable=False),
+    sa.Column('district', sa.String(), nullable=False),
+    sa.Column('market', sa.String(), nullable=False),
+    sa.Column('commodity', sa.String(), nullable=False),
+    sa.Column('period', sa.String(), nullable=False),
+    sa.Column('period_start', sa.Date(), nullable=False),
+    sa.Column('observations', sa.Integer(), nullable=False),
+    sa.Column('modal_sum', sa.Float(), nullable=False),
+    sa.Column('modal_sum_sq', sa.Float(), nullable=False),
+    sa.Column('min_modal_price', sa.Float(), nullable=True),
+    sa.Column('max_modal_price', sa.Float(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('state', 'commodity', 'period', 'district', 'market', 'period_start', name='uq_mandi_price_rollups_bucket')
+    )
+    op.create_index(op.f('ix_mandi_price_rollups_id'), 'mandi_price_rollups', ['id'], unique=False)
+    # Existing rows in mandi_prices are folded in by api/rebuild_price_rollups.py
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_mandi_price_rollups_id'), table_name='mandi_price_rollups')
+    op.drop_table('mandi_price_rollups')
@@ -0,0 +1,35 @@
+"""Key the weather cache by location grid cell
+
+Revision ID: f1b8c3e6a527
+Revises: e5c9a7d2b416
+Create Date: 2026-10-17 17:41:06.118930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b8c3e6a527'
+down_revision: Union[str, Sequence[str], None] = 'e5c9a7d2b416'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Per-user rows can't be mapped to a cell reliably; it's a 3-hour cache, so start empty
+    op.execute("DELETE FROM weather_cache")
+    op.add_column('weather_cache', sa.Column('cell', sa.String(), nullable=False))
+    op.alter_column('weather_cache', 'user_id', existing_type=sa.Integer(), nullable=True)
+    op.create_unique_constraint('uq_weather_cache_cell', 'weather_cache', ['cell'])
+    op.create_index('ix_weather_cache_cell_fetched_at', 'weather_cache', ['cell', 'fetched_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM weather_cache")
+    op.drop_index('ix_weather_cache_cell_fetched_at', table_name='weather_cache')
+    op.drop_constraint('uq_weather_cache_cell', 'weather_cache', type_='unique')
+    op.alter_column('weather_cache', 'user_id', existing_type=sa.Integer(), nullable=False)
+    op.drop_column('weather_cache', 'cell')
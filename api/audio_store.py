@@ -0,0 +1,131 @@
+import os
+import hashlib
+import tempfile
+from pathlib import Path
+
+from fastapi.responses import FileResponse, RedirectResponse
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# "local" (default) or "s3" (any S3-compatible service, needs boto3)
+AUDIO_STORE_BACKEND = os.getenv("AUDIO_STORE_BACKEND", "local").lower()
+AUDIO_STORE_DIR = Path(os.getenv("AUDIO_STORE_DIR", BASE_DIR / "audio_store"))
+
+AUDIO_S3_BUCKET = os.getenv("AUDIO_S3_BUCKET")
+AUDIO_S3_PREFIX = os.getenv("AUDIO_S3_PREFIX", "tts/")
+AUDIO_S3_ENDPOINT_URL = os.getenv("AUDIO_S3_ENDPOINT_URL")  # e.g. R2 / MinIO, leave empty for AWS
+AUDIO_URL_EXPIRY_SECONDS = 3600
+
+# Keys are content hashes, so a stored clip never changes
+IMMUTABLE_CACHE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+
+def content_key(clean_text: str, voice: str) -> str:
+    """Content address of a clip: identical (cleaned text, voice) pairs share one file."""
+    digest = hashlib.sha256(f"{voice}\n{clean_text}".encode("utf-8")).hexdigest()
+    return f"{digest}.mp3"
+
+
+class LocalAudioStore:
+    """Clips on the local filesystem, sharded by hash prefix (ab/cd/abcd...mp3)."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def path_for(self, key: str) -> Path:
+        return self.root / key[:2] / key[2:4] / key
+
+    def exists(self, key: str) -> bool:
+        return self.path_for(key).is_file()
+
+    def read(self, key: str):
+        path = self.path_for(key)
+        return path.read_bytes() if path.is_file() else None
+
+    def write(self, key: str, data: bytes):
+        path = self.path_for(key)
+        if path.is_file():
+            return  # Same content already stored
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file and rename so readers never see half a clip
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def response(self, key: str):
+        # FileResponse handles Range requests, ETag/Last-Modified and uses zero-copy
+        # sending (pathsend) on servers that support it
+        return FileResponse(self.path_for(key), media_type="audio/mpeg", headers=IMMUTABLE_CACHE_HEADERS)
+
+
+class S3AudioStore:
+    """Clips in an S3-compatible bucket. Playback is redirected to a presigned URL."""
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str = None):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("AUDIO_STORE_BACKEND=s3 needs boto3 installed (pip install boto3).")
+
+        if not bucket:
+            raise RuntimeError("AUDIO_STORE_BACKEND=s3 needs AUDIO_S3_BUCKET to be set.")
+
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def object_name(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_name(key))
+            return True
+        except Exception:
+            return False
+
+    def read(self, key: str):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.object_name(key))["Body"].read()
+        except Exception:
+            return None
+
+    def write(self, key: str, data: bytes):
+        if self.exists(key):
+            return
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self.object_name(key),
+            Body=data,
+            ContentType="audio/mpeg",
+            CacheControl=IMMUTABLE_CACHE_HEADERS["Cache-Control"]
+        )
+
+    def response(self, key: str):
+        # The bucket serves Range/ETag itself, we just hand out a short-lived link
+        url = self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self.object_name(key)},
+            ExpiresIn=AUDIO_URL_EXPIRY_SECONDS
+        )
+        return RedirectResponse(url, status_code=307)
+
+
+_store = None
+
+def get_audio_store():
+    """Returns the configured store (created on first use)."""
+    global _store
+    if _store is None:
+        if AUDIO_STORE_BACKEND == "s3":
+            _store = S3AudioStore(AUDIO_S3_BUCKET, AUDIO_S3_PREFIX, AUDIO_S3_ENDPOINT_URL)
+        else:
+            _store = LocalAudioStore(AUDIO_STORE_DIR)
+    return _store
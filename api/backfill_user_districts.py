@@ -0,0 +1,85 @@
+import sys
+import time
+import traceback
+import argparse
+import logging
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy import or_
+from db.database import SessionLocal
+from db.models import User
+from api.geocoding import load_district_index, apply_location
+
+# --- Set up Logging ---
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+
+BATCH_SIZE = 1000
+
+def backfill_user_districts(dry_run: bool = False):
+    """
+    Fills User.state / User.district from the offline district index for users who have
+    coordinates but no district. No network calls; users outside the index stay as they are
+    and get resolved the next time they post their location.
+    """
+    logging.info("--- Backfilling User Districts ---")
+
+    index = load_district_index()
+    if index is None:
+        logging.error("No district index available (see api/build_district_index.py). Skipping backfill.")
+        return
+
+    db = SessionLocal()
+    try:
+        last_id = 0
+        resolved = unresolved = 0
+        started = time.perf_counter()
+        while True:
+            batch = db.query(User).filter(
+                User.id > last_id,
+                User.latitude.isnot(None),
+                User.longitude.isnot(None),
+                or_(User.district.is_(None), User.district == "")
+            ).order_by(User.id.asc()).limit(BATCH_SIZE).all()
+            if not batch:
+                break
+
+            for user, details in zip(batch, index.lookup_many([(u.latitude, u.longitude) for u in batch])):
+                if details:
+                    apply_location(user, details)
+                    resolved += 1
+                else:
+                    unresolved += 1
+
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+            last_id = batch[-1].id
+            logging.info(f"Processed users up to id {last_id}: {resolved} resolved, {unresolved} outside the index.")
+
+        action = "Would resolve" if dry_run else "Resolved"
+        logging.info(f"{action} {resolved} users ({unresolved} outside the index) in {time.perf_counter() - started:.1f}s.")
+
+    except Exception as e:
+        logging.error("Backfill failed! Full error traceback below:")
+        logging.error(traceback.format_exc())
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="Resolve and report without writing")
+    backfill_user_districts(parser.parse_args().dry_run)
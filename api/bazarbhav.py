@@ -1,10 +1,19 @@
 import os
 import json
+import random
 import asyncio
 import aiohttp
-import requests
 import traceback
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
+from sqlalchemy import func, or_, and_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from db.database import SessionLocal
+from db.models import MandiPrice, MandiPriceCoverage, get_ist_time
+from api.cache import AsyncTTLCache
+from api.http_client import get_async_session, async_get
+from api.commodity_index import resolve_commodity
+from api.price_rollups import PRICE_KEY_COLUMNS, lock_previous_prices, apply_price_rollups, load_price_trend, format_trend_for_ai
 
 API_KEY = os.getenv("DATA_GOV_API_KEY")
 RESOURCE_ID = "35985678-0d79-46b4-9ed6-6f13308a1d24"
@@ -32,111 +41,637 @@ def get_recent_business_days(num_days=4):
 
     return dates
 
-# --- FETCH MARKET DATA FOR FRONTEND (JSON RESPONSE) ---
-async def get_market_data(state: str, district: str):
+# --- LOCAL PRICE WAREHOUSE (mandi_prices, filled by api/sync_mandi_prices.py) ---
+# Local rows older than this are ignored and we go live instead
+LOCAL_MAX_AGE_DAYS = int(os.getenv("MANDI_LOCAL_MAX_AGE_DAYS", 7))
+MANDI_KEY_COLUMNS = ["state", "district", "market", "commodity", "variety", "grade", "arrival_date"]
+
+def parse_price(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def to_price_row(record: dict):
+    """Raw data.gov.in record -> mandi_prices row dict (None if it can't be keyed)."""
+    try:
+        arrival_date = datetime.strptime(record.get("Arrival_Date", ""), "%d/%m/%Y").date()
+    except ValueError:
+        return None
+
+    if not record.get("State") or not record.get("Market") or not record.get("Commodity"):
+        return None
+
+    return {
+        "state": record.get("State"),
+        "district": record.get("District") or "",
+        "market": record.get("Market"),
+        "commodity": record.get("Commodity"),
+        "variety": record.get("Variety") or "",
+        "grade": record.get("Grade") or "",
+        "arrival_date": arrival_date,
+        "min_price": parse_price(record.get("Min_Price")),
+        "max_price": parse_price(record.get("Max_Price")),
+        "modal_price": parse_price(record.get("Modal_Price")),
+        "fetched_at": get_ist_time(),
+    }
+
+def to_api_record(row: MandiPrice) -> dict:
+    """mandi_prices row -> the data.gov.in record shape the formatters expect."""
+    def price(value):
+        return "N/A" if value is None else f"{value:g}"
+
+    return {
+        "State": row.state,
+        "District": row.district,
+        "Market": row.market,
+        "Commodity": row.commodity,
+        "Variety": row.variety,
+        "Grade": row.grade,
+        "Arrival_Date": row.arrival_date.strftime("%d/%m/%Y"),
+        "Min_Price": price(row.min_price),
+        "Max_Price": price(row.max_price),
+        "Modal_Price": price(row.modal_price),
+    }
+
+def upsert_mandi_prices(db, records: list) -> int:
+    """Inserts or refreshes raw API records in mandi_prices. Returns the number of rows written."""
+    # Same key twice in one statement is an error on Postgres, keep the last one
+    rows = {}
+    for record in records:
+        row = to_price_row(record)
+        if row:
+            rows[tuple(row[c] for c in MANDI_KEY_COLUMNS)] = row
+
+    if not rows:
+        return 0
+
+    # Same key order lock_previous_prices locks in: every writer (cron sync, live write-through)
+    # takes row locks in the same order
+    rows = sorted(rows.values(), key=lambda row: tuple(row[c] for c in PRICE_KEY_COLUMNS))
+    insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    key_columns = [getattr(MandiPrice, c) for c in MANDI_KEY_COLUMNS]
+
+    # 1. New arrivals; a key a concurrent writer is inserting waits for it and lands in step 2
+    stmt = insert(MandiPrice).values(rows).on_conflict_do_nothing(index_elements=MANDI_KEY_COLUMNS).returning(*key_columns)
+    inserted = {tuple(found) for found in db.execute(stmt)}
+
+    # 2. Stored arrivals: lock them and read the prices they had, then overwrite. Rollups see the
+    #    exact change inside this transaction, so two writers never fold the same delta twice
+    previous = {}
+    existing = [row for row in rows if tuple(row[c] for c in MANDI_KEY_COLUMNS) not in inserted]
+    if existing:
+        previous = lock_previous_prices(db, existing)
+        stmt = insert(MandiPrice).values(existing)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=MANDI_KEY_COLUMNS,
+            set_={col: stmt.excluded[col] for col in ("min_price", "max_price", "modal_price", "fetched_at")}
+        )
+        db.execute(stmt)
+
+    apply_price_rollups(db, rows, previous)
+    db.commit()
+    return len(rows)
+
+def local_filters(state: str, district: str = None, commodity: str = None) -> list:
+    filters = [
+        MandiPrice.state == state.title(),
+        MandiPrice.arrival_date >= date.today() - timedelta(days=LOCAL_MAX_AGE_DAYS),
+    ]
+    if district:
+        filters.append(MandiPrice.district == district)
+    if commodity:
+        filters.append(MandiPrice.commodity == commodity)
+    return filters
+
+def covered_dates(db, state: str, district: str = None) -> list:
+    """Recent arrival dates whose complete list for this state / district is stored locally (see MandiPriceCoverage)."""
+    scopes = [
+        and_(MandiPriceCoverage.state == "", MandiPriceCoverage.district == ""),
+        and_(MandiPriceCoverage.state == state.title(), MandiPriceCoverage.district == ""),
+    ]
+    if district:
+        scopes.append(and_(MandiPriceCoverage.state == state.title(), MandiPriceCoverage.district == district))
+
+    rows = db.query(MandiPriceCoverage.arrival_date).filter(
+        or_(*scopes),
+        MandiPriceCoverage.arrival_date >= date.today() - timedelta(days=LOCAL_MAX_AGE_DAYS)
+    ).distinct().all()
+    return [row.arrival_date for row in rows]
+
+def latest_covered_date(db, filters: list, state: str, district: str = None):
+    # Rows of uncovered dates may be a partial set (a failed page, an older tool write), never serve those
+    dates = covered_dates(db, state, district)
+    if not dates:
+        return None
+    return db.query(func.max(MandiPrice.arrival_date)).filter(*filters, MandiPrice.arrival_date.in_(dates)).scalar()
+
+def record_coverage(db, state: str, district: str, arrival_date: date, source: str, records: int):
+    """Marks a scope's list for a date as complete; the caller commits."""
+    insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    stmt = insert(MandiPriceCoverage).values(
+        state=state, district=district, arrival_date=arrival_date, source=source, records=records, completed_at=get_ist_time()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["state", "district", "arrival_date"],
+        set_={col: stmt.excluded[col] for col in ("source", "records", "completed_at")}
+    )
+    db.execute(stmt)
+
+def load_local_records(state: str, district: str = None, commodity: str = None, limit: int = None) -> list:
+    """Records for the latest covered arrival date we hold locally (newest first), in the API record shape."""
+    db = SessionLocal()
+    try:
+        filters = local_filters(state, district, commodity)
+
+        latest = latest_covered_date(db, filters, state, district)
+        if not latest:
+            return []
+
+        query = db.query(MandiPrice).filter(*filters, MandiPrice.arrival_date == latest).order_by(MandiPrice.id.asc())
+        if limit:
+            query = query.limit(limit)
+        return [to_api_record(row) for row in query.all()]
+    finally:
+        db.close()
+
+def latest_local_date(state: str, district: str = None):
+    db = SessionLocal()
+    try:
+        return latest_covered_date(db, local_filters(state, district), state, district)
+    finally:
+        db.close()
+
+def load_local_page(state: str, district: str, arrival_date: date, after_id: int, limit: int):
+    """One keyset page (id > after_id) of local rows for a date. Returns (records, last_id)."""
+    db = SessionLocal()
+    try:
+        rows = db.query(MandiPrice).filter(
+            *local_filters(state, district),
+            MandiPrice.arrival_date == arrival_date,
+            MandiPrice.id > after_id
+        ).order_by(MandiPrice.id.asc()).limit(limit).all()
+        return [to_api_record(row) for row in rows], (rows[-1].id if rows else after_id)
+    finally:
+        db.close()
+
+def save_live_records(records: list) -> bool:
+    """
+    Write-through of live market pages; they only become visible locally once the fetch is covered.
+    Returns False when the page could not be stored, so the fetch must not be recorded as covered.
+    """
+    db = SessionLocal()
+    try:
+        upsert_mandi_prices(db, records)
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Could not store live market records: {repr(e)}")
+        return False
+    finally:
+        db.close()
+
+def save_live_coverage(state: str, district: str, arrival_date: date, records: int):
+    db = SessionLocal()
+    try:
+        record_coverage(db, state, district, arrival_date, "live", records)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Could not record live market coverage: {repr(e)}")
+    finally:
+        db.close()
+
+# --- DATE PROBING ---
+# How many dates we query data.gov.in for at the same time
+MAX_PARALLEL_DATE_PROBES = 4
+# Retries after a 429 before giving up on a date
+MAX_429_RETRIES = 2
+
+def retry_after_seconds(header_value, attempt: int) -> float:
+    """Honours Retry-After (seconds) when the API sends it, otherwise jittered exponential backoff."""
+    try:
+        return min(30.0, float(header_value))
+    except (TypeError, ValueError):
+        return (2 ** attempt) + random.random()
+
+def parse_total(data: dict) -> int:
+    try:
+        return int(data.get("total") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+async def fetch_records(session: aiohttp.ClientSession, params: dict, label: str, timeout: aiohttp.ClientTimeout = None):
+    """
+    One data.gov.in query with 429-aware pacing (connection errors and 502/503/504 are retried by async_get).
+    Returns (records, total) where total is the match count the API reports across all pages.
+    """
+    for attempt in range(MAX_429_RETRIES + 1):
+        response = await async_get(BASE_URL, session=session, params=params, headers=HEADERS, timeout=timeout)
+        if response.status == 200:
+            data = await response.json(content_type=None)
+            return data.get("records", []), parse_total(data)
+
+        if response.status != 429:
+            error_text = await response.text()
+            print(f"⚠️ [{label}] HTTP {response.status}: {error_text}")
+            return [], 0
+
+        # async_get has already released the host slot and pooled connection, other callers use them meanwhile
+        delay = retry_after_seconds(response.headers.get("Retry-After"), attempt)
+        print(f"⚠️ [{label}] Rate Limited (429) on {params.get('filters[Arrival_Date]')}. Retrying in {delay:.1f}s.")
+        await asyncio.sleep(delay)
+
+    return [], 0
+
+async def probe_recent_dates(session: aiohttp.ClientSession, base_params: dict, dates: list, label: str, timeout: aiohttp.ClientTimeout = None):
+    """
+    Queries all dates concurrently (bounded by a semaphore) and returns (date, records, total)
+    for the newest date that has records. Older probes still running are cancelled.
+    """
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_DATE_PROBES)
+
+    async def probe(date_str: str):
+        async with semaphore:
+            print(f"📡 [{label}] Fetching data for {date_str}...")
+            try:
+                return await fetch_records(session, {**base_params, "filters[Arrival_Date]": date_str}, label, timeout)
+            except asyncio.TimeoutError:
+                print(f"⏳ [{label}] Timeout on {date_str}. Server is slow, skipping...")
+            except Exception as e:
+                print(f"🚨 [{label}] Error: {repr(e)}")
+            return [], 0
+
+    tasks = [asyncio.create_task(probe(date_str)) for date_str in dates]
+    try:
+        # Dates are newest first, so the first non-empty one in this order wins
+        for date_str, task in zip(dates, tasks):
+            records, total = await task
+            if records:
+                return date_str, records, total
+        return None, [], 0
+    finally:
+        for task in tasks:
+            task.cancel()
+
+# --- PAGINATION ---
+# Big states (Maharashtra, Uttar Pradesh) publish thousands of arrivals a day, far more
+# than one page. Pages are fetched a few at a time and handed out in offset order, so
+# at most MAX_PARALLEL_PAGES pages are held in memory whatever the state size.
+MARKET_PAGE_SIZE = int(os.getenv("MARKET_PAGE_SIZE", 500))
+MAX_PARALLEL_PAGES = 4
+MARKET_PAGE_TIMEOUT = aiohttp.ClientTimeout(total=45)
+
+def market_params(state: str, target_district: str = None) -> dict:
+    params = {
+        "api-key": API_KEY,
+        "format": "json",
+        "limit": MARKET_PAGE_SIZE,
+        "offset": 0,
+        "filters[State]": state.title(),
+    }
+    if target_district:
+        params["filters[District]"] = target_district
+    return params
+
+async def fetch_page(session: aiohttp.ClientSession, params: dict, label: str, timeout: aiohttp.ClientTimeout = None):
+    """fetch_records for one page after the first; a timeout or connection error counts as a failed (empty) page."""
+    try:
+        return await fetch_records(session, params, label, timeout)
+    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+        print(f"⏳ [{label}] Page at offset {params.get('offset')} failed: {repr(e)}")
+        return [], 0
+
+async def iter_remaining_pages(session: aiohttp.ClientSession, params: dict, page_size: int, total: int, label: str, timeout: aiohttp.ClientTimeout = None):
+    """Yields the pages after the first one, in offset order, with up to MAX_PARALLEL_PAGES requests ahead."""
+    offsets = iter(range(page_size, total, page_size))
+    pending = []
+
+    def schedule_next():
+        offset = next(offsets, None)
+        if offset is not None:
+            page_params = {**params, "limit": page_size, "offset": offset}
+            pending.append(asyncio.create_task(fetch_page(session, page_params, label, timeout)))
+
+    try:
+        for _ in range(MAX_PARALLEL_PAGES):
+            schedule_next()
+
+        while pending:
+            records, _ = await pending.pop(0)
+            schedule_next()
+            if not records:
+                # Short or failed page: the rest of the result set has shifted or is gone
+                print(f"⚠️ [{label}] Empty page before reaching total {total}, stopping.")
+                break
+            yield records
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def iter_live_pages(state: str, target_district: str = None, label: str = "FRONTEND", status: dict = None):
+    """
+    All records for the newest date with arrivals, page by page. Each page is written through locally.
+    status["complete"] is set to False when pages failed before the API's total was reached.
+    """
+    session = get_async_session()
+    params = market_params(state, target_district)
+
+    date_str, first_page, total = await probe_recent_dates(session, params, get_recent_business_days(4), label, MARKET_PAGE_TIMEOUT)
+    if not first_page:
+        return
+
+    stored = await asyncio.to_thread(save_live_records, first_page)
+    yield first_page
+    received = len(first_page)
+
+    if total > len(first_page):
+        print(f"📚 [{label}] {total} records for {date_str}, fetching {len(first_page)} per page...")
+        # The API may cap the page size below what we asked for, so step by what it returned
+        pages = iter_remaining_pages(session, {**params, "filters[Arrival_Date]": date_str}, len(first_page), total, label, MARKET_PAGE_TIMEOUT)
+        async for records in pages:
+            stored = await asyncio.to_thread(save_live_records, records) and stored
+            received += len(records)
+            yield records
+
+    if received < total:
+        print(f"⚠️ [{label}] Partial result for {state.title()}{' / ' + target_district if target_district else ''}: {received} of {total} records.")
+        if status is not None:
+            status["complete"] = False
+
+    # Only a fetch that got and stored everything the API reported may stand in for the whole scope later
+    if not stored:
+        print(f"⚠️ [{label}] Some pages for {date_str} were not stored, not marking it as covered.")
+    elif total and received >= total:
+        arrival_date = datetime.strptime(date_str, "%d/%m/%Y").date()
+        await asyncio.to_thread(save_live_coverage, state.title(), target_district or "", arrival_date, received)
+
+async def iter_local_pages(state: str, target_district: str = None):
+    """Local rows for the latest date we hold, in keyset pages of MARKET_PAGE_SIZE."""
+    latest = await asyncio.to_thread(latest_local_date, state, target_district)
+    if not latest:
+        return
+
+    after_id = 0
+    while True:
+        records, after_id = await asyncio.to_thread(load_local_page, state, target_district, latest, after_id, MARKET_PAGE_SIZE)
+        if not records:
+            return
+        yield records
+        if len(records) < MARKET_PAGE_SIZE:
+            return
+
+def to_market_row(record: dict, source: str) -> dict:
+    return {
+        "commodity": record.get("Commodity"),
+        "district": record.get("District"),
+        "market": record.get("Market"),
+        "price_latest": str(record.get("Modal_Price", "N/A")),
+        "msp": str(record.get("Min_Price", "N/A")),
+        "date": record.get("Arrival_Date"),
+        "source": source
+    }
+
+async def stream_market_rows(state: str, district: str, status: dict = None):
+    """
+    Frontend rows for a state/district, one page at a time: local warehouse first, live if it has nothing.
+    Pass a status dict to learn whether the rows were complete (status["complete"]).
+    """
     target_district = district.title() if district and district.lower() != "all districts" else None
-    dates_to_check = get_recent_business_days(4)
-    results = []
 
-    # 45 seconds to handle large payloads (500 records)
-    custom_timeout = aiohttp.ClientTimeout(total=45)
+    found_local = False
+    async for records in iter_local_pages(state, target_district):
+        found_local = True
+        yield [to_market_row(r, "local") for r in records]
 
-    async with aiohttp.ClientSession(timeout=custom_timeout, headers=HEADERS) as session:
-        for date_str in dates_to_check:
-            params = {
-                "api-key": API_KEY,
-                "format": "json",
-                "limit": 500, # Increased to 500 based on your successful test
-                "offset": 0,
-                "filters[State]": state.title(),
-                "filters[Arrival_Date]": date_str
-            }
+    if found_local or not API_KEY:
+        return
 
-            if target_district:
-                params["filters[District]"] = target_district
+    async for records in iter_live_pages(state, target_district, status=status):
+        yield [to_market_row(r, "live") for r in records]
 
-            try:
-                print(f"📡 Fetching state data for {date_str}...")
-                async with session.get(BASE_URL, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        records = data.get("records", [])
-
-                        if records:
-                            for r in records:
-                                results.append({
-                                    "commodity": r.get("Commodity"),
-                                    "district": r.get("District"),
-                                    "market": r.get("Market"),
-                                    "price_latest": str(r.get("Modal_Price", "N/A")),
-                                    "msp": str(r.get("Min_Price", "N/A")),
-                                    "date": r.get("Arrival_Date"),
-                                    "source": "live"
-                                })
-                            # Once we find the most recent business day with data, we stop
-                            break
-
-                    elif response.status == 429:
-                        print(f"⚠️ [FRONTEND] Rate Limited (429) on {date_str}.")
-                        await asyncio.sleep(2)
-
-                    else:
-                        error_text = await response.text()
-                        print(f"⚠️ [FRONTEND] HTTP {response.status}: {error_text}")
+# --- SHARED MARKET CACHE ---
+# Prices for a date are published during the day and then stay put, so cache for a
+# short while during publishing hours and until the next morning after that.
+MARKET_CACHE_TTL_SECONDS = int(os.getenv("MARKET_CACHE_TTL_SECONDS", 1800))
+MARKET_CACHE_EMPTY_TTL_SECONDS = 300
+MARKET_CACHE_STALE_SECONDS = 6 * 3600
+ARRIVALS_START_HOUR = 8   # IST
+ARRIVALS_END_HOUR = 21    # IST
 
-            except asyncio.TimeoutError:
-                print(f"⏳ [FRONTEND] Timeout on {date_str}. Server is slow, skipping...")
-            except Exception as e:
-                print(f"🚨 [FRONTEND] Error: {repr(e)}")
+def market_cache_ttl(value: dict) -> float:
+    # Empty or partial (pages failed): retry soon instead of keeping it until the next morning
+    if not value.get("data") or not value.get("complete", True):
+        return MARKET_CACHE_EMPTY_TTL_SECONDS
 
-            await asyncio.sleep(1)
+    now = get_ist_time()
+    if ARRIVALS_START_HOUR <= now.hour < ARRIVALS_END_HOUR:
+        return MARKET_CACHE_TTL_SECONDS
 
-    return {"data": results}
+    # Nothing new is published overnight, keep it until arrivals start again
+    next_start = now.replace(hour=ARRIVALS_START_HOUR, minute=0, second=0, microsecond=0)
+    if now.hour >= ARRIVALS_START_HOUR:
+        next_start += timedelta(days=1)
+    return (next_start - now).total_seconds()
 
+market_cache = AsyncTTLCache("market", ttl=MARKET_CACHE_TTL_SECONDS, stale_ttl=MARKET_CACHE_STALE_SECONDS, ttl_for=market_cache_ttl)
 
-# --- HELPER FOR GEMINI TOOL (LIVE ONLY) ---
-def get_baazar_bhav_for_ai(state: str, district: str, commodity: str):
-    """Synchronous tool for Gemini to fetch the latest price live."""
-    if not API_KEY:
-        return "Error: Government API key is missing."
+async def get_market_data(state: str, district: str):
+    """Cached market data: identical (state, district, day) requests share one upstream fetch."""
+    target_district = district.title() if district and district.lower() != "all districts" else None
+    key = (state.title(), target_district, get_ist_time().date().isoformat())
+    return await market_cache.get_or_load(key, lambda: fetch_market_data(state, district))
+
+# --- SERVER-SIDE FILTERS AND AGGREGATES (SQL ON THE WAREHOUSE) ---
+MARKET_SORTS = {
+    "commodity": lambda: [MandiPrice.commodity.asc(), MandiPrice.market.asc()],
+    "market": lambda: [MandiPrice.market.asc(), MandiPrice.commodity.asc()],
+    # Rows without a price go last either way
+    "price_asc": lambda: [MandiPrice.modal_price.is_(None), MandiPrice.modal_price.asc()],
+    "price_desc": lambda: [MandiPrice.modal_price.is_(None), MandiPrice.modal_price.desc()],
+}
 
+async def ensure_local_prices(state: str, district: str):
+    """Latest local arrival date, filling the warehouse from the live API (via the shared cache) if empty."""
     target_district = district.title() if district and district.lower() != "all districts" else None
-    dates_to_check = get_recent_business_days(4)
+    latest = await asyncio.to_thread(latest_local_date, state, target_district)
+    if latest is None and API_KEY:
+        # Live pages are written through to mandi_prices on the way
+        await get_market_data(state, district)
+        latest = await asyncio.to_thread(latest_local_date, state, target_district)
+    return target_district, latest
+
+def price_filters(state: str, district: str, arrival_date: date, commodity: str = None, market: str = None, min_price: float = None, max_price: float = None) -> list:
+    filters = local_filters(state, district) + [MandiPrice.arrival_date == arrival_date]
+    if commodity:
+        filters.append(func.lower(MandiPrice.commodity) == commodity.lower())
+    if market:
+        filters.append(MandiPrice.market.ilike(f"%{market}%"))
+    if min_price is not None:
+        filters.append(MandiPrice.modal_price >= min_price)
+    if max_price is not None:
+        filters.append(MandiPrice.modal_price <= max_price)
+    return filters
+
+def query_local_prices(state: str, district: str, arrival_date: date, sort: str = "commodity", top_n: int = None, **filter_args) -> list:
+    db = SessionLocal()
+    try:
+        query = db.query(MandiPrice).filter(
+            *price_filters(state, district, arrival_date, **filter_args)
+        ).order_by(*MARKET_SORTS[sort](), MandiPrice.id.asc())
+        if top_n:
+            query = query.limit(top_n)
+        return [to_market_row(to_api_record(row), "local") for row in query.all()]
+    finally:
+        db.close()
+
+def summarize_local_prices(state: str, district: str, arrival_date: date, **filter_args) -> list:
+    """Per commodity: price spread across mandis plus the cheapest and costliest mandi."""
+    db = SessionLocal()
+    try:
+        filters = price_filters(state, district, arrival_date, **filter_args) + [MandiPrice.modal_price.isnot(None)]
+
+        stats = db.query(
+            MandiPrice.commodity,
+            func.count(MandiPrice.id).label("markets"),
+            func.min(MandiPrice.min_price).label("min_price"),
+            func.avg(MandiPrice.modal_price).label("avg_modal_price"),
+            func.min(MandiPrice.modal_price).label("min_modal_price"),
+            func.max(MandiPrice.modal_price).label("max_modal_price"),
+            func.max(MandiPrice.max_price).label("max_price"),
+        ).filter(*filters).group_by(MandiPrice.commodity).order_by(MandiPrice.commodity.asc()).all()
+
+        # Rank mandis within each commodity in one pass instead of a query per commodity
+        cheap_rank = func.row_number().over(partition_by=MandiPrice.commodity, order_by=(MandiPrice.modal_price.asc(), MandiPrice.id.asc()))
+        dear_rank = func.row_number().over(partition_by=MandiPrice.commodity, order_by=(MandiPrice.modal_price.desc(), MandiPrice.id.asc()))
+        ranked = db.query(
+            MandiPrice.commodity, MandiPrice.market, MandiPrice.district, MandiPrice.modal_price,
+            cheap_rank.label("cheap_rank"), dear_rank.label("dear_rank")
+        ).filter(*filters).subquery()
+
+        extremes = {}
+        for row in db.query(ranked).filter(or_(ranked.c.cheap_rank == 1, ranked.c.dear_rank == 1)).all():
+            mandi = {"market": row.market, "district": row.district, "modal_price": row.modal_price}
+            if row.cheap_rank == 1:
+                extremes.setdefault(row.commodity, {})["cheapest"] = mandi
+            if row.dear_rank == 1:
+                extremes.setdefault(row.commodity, {})["costliest"] = mandi
+
+        return [{
+            "commodity": row.commodity,
+            "markets": row.markets,
+            "min_price": row.min_price,
+            "avg_modal_price": round(row.avg_modal_price, 2),
+            "min_modal_price": row.min_modal_price,
+            "max_modal_price": row.max_modal_price,
+            "max_price": row.max_price,
+            "cheapest": extremes.get(row.commodity, {}).get("cheapest"),
+            "costliest": extremes.get(row.commodity, {}).get("costliest"),
+        } for row in stats]
+    finally:
+        db.close()
+
+async def search_market_prices(state: str, district: str, **query_args) -> dict:
+    if query_args.get("commodity"):
+        query_args["commodity"] = await resolve_commodity(query_args["commodity"]) or query_args["commodity"]
+    target_district, latest = await ensure_local_prices(state, district)
+    if latest is None:
+        return {"date": None, "data": []}
+    rows = await asyncio.to_thread(query_local_prices, state, target_district, latest, **query_args)
+    return {"date": latest.strftime("%d/%m/%Y"), "data": rows}
+
+async def summarize_market_prices(state: str, district: str, **filter_args) -> dict:
+    if filter_args.get("commodity"):
+        filter_args["commodity"] = await resolve_commodity(filter_args["commodity"]) or filter_args["commodity"]
+    target_district, latest = await ensure_local_prices(state, district)
+    if latest is None:
+        return {"date": None, "data": []}
+    rows = await asyncio.to_thread(summarize_local_prices, state, target_district, latest, **filter_args)
+    return {"date": latest.strftime("%d/%m/%Y"), "data": rows}
 
-    for date_str in dates_to_check:
-        params = {
-            "api-key": API_KEY,
-            "format": "json",
-            "limit": 5,
-            "filters[State]": state.title(),
-            "filters[Commodity]": commodity.title(),
-            "filters[Arrival_Date]": date_str
-        }
+# --- FETCH MARKET DATA FOR FRONTEND (JSON RESPONSE) ---
+async def fetch_market_data(state: str, district: str):
+    results = []
+    status = {"complete": True}
+    async for rows in stream_market_rows(state, district, status):
+        results.extend(rows)
+
+    return {"data": results, "complete": status["complete"]}
+
+
+# --- HELPER FOR GEMINI TOOL (LOCAL FIRST, LIVE FALLBACK) ---
+# Hard limit for one price question inside a chat turn
+BHAV_TOOL_DEADLINE_SECONDS = float(os.getenv("BHAV_TOOL_DEADLINE_SECONDS", 12))
+BHAV_CALL_TIMEOUT = aiohttp.ClientTimeout(total=10)
+BHAV_CACHE_TTL_SECONDS = 1800
+BHAV_CACHE_MISS_TTL_SECONDS = 300
+# How long an old price may still be handed out when the deadline hits
+BHAV_CACHE_STALE_SECONDS = 24 * 3600
+
+bhav_cache = AsyncTTLCache(
+    "bhav",
+    ttl=BHAV_CACHE_TTL_SECONDS,
+    stale_ttl=BHAV_CACHE_STALE_SECONDS,
+    ttl_for=lambda record: BHAV_CACHE_TTL_SECONDS if record else BHAV_CACHE_MISS_TTL_SECONDS
+)
+
+async def fetch_bhav_record(state: str, target_district: str, commodity: str):
+    """Latest record for one crop (official name): covered local data first, then all recent dates live in parallel."""
+    local_records = await asyncio.to_thread(load_local_records, state, target_district, commodity, 1)
+    if local_records:
+        return local_records[0]
 
-        if target_district:
-            params["filters[District]"] = target_district
+    if not API_KEY:
+        return None
 
-        try:
-            # Using browser headers in synchronous request too
-            response = requests.get(BASE_URL, params=params, headers=HEADERS, timeout=30)
+    params = {
+        "api-key": API_KEY,
+        "format": "json",
+        "limit": 5,
+        "filters[State]": state.title(),
+        "filters[Commodity]": commodity,
+    }
 
-            if response.status_code == 200:
-                records = response.json().get("records", [])
+    if target_district:
+        params["filters[District]"] = target_district
 
-                if records:
-                    record = records[0]
-                    return format_ai_response(record, commodity)
+    _, records, _ = await probe_recent_dates(get_async_session(), params, get_recent_business_days(4), "AI TOOL", BHAV_CALL_TIMEOUT)
+    # Not written to mandi_prices: a handful of one crop's rows is no state's full list (bhav_cache keeps it)
+    return records[0] if records else None
 
-            elif response.status_code == 429:
-                print(f"⚠️ [AI TOOL] Rate Limit (429) for {commodity}")
+async def get_baazar_bhav_for_ai(state: str, district: str, commodity: str):
+    """Async tool for Gemini: cached per (state, district, commodity) and bounded by a hard deadline."""
+    target_district = district.title() if district and district.lower() != "all districts" else None
 
-            import time
-            time.sleep(1)
+    # Spoken / misspelled names are mapped locally. A name we can't place may still be a crop
+    # data.gov.in lists that our index hasn't seen, so it is asked once (bhav_cache) title-cased
+    official = await resolve_commodity(commodity)
+    if not official and not commodity.strip():
+        return "Politely ask the farmer which crop they mean."
+    official_or_guess = official or commodity.strip().title()
+    key = (state.title(), target_district, official_or_guess)
+
+    try:
+        record = await asyncio.wait_for(
+            bhav_cache.get_or_load(key, lambda: fetch_bhav_record(state, target_district, official_or_guess)),
+            timeout=BHAV_TOOL_DEADLINE_SECONDS
+        )
+    except asyncio.TimeoutError:
+        # The lookup keeps running in the background and will fill the cache for next time
+        record, age = bhav_cache.peek(key)
+        print(f"⏳ [AI TOOL] Deadline hit for {commodity}, {'using cached price' if record else 'nothing cached'}.")
+    except Exception as e:
+        print(f"🚨 [AI TOOL] Error: {repr(e)}")
+        record = None
+
+    if record:
+        return format_ai_response(record, commodity)
+
+    if not official:
+        return f"'{commodity}' is not a crop name the market database knows. Politely ask the farmer which crop they mean."
 
-        except requests.exceptions.Timeout:
-            print(f"⏳ [AI TOOL] Timeout for {commodity} on {date_str}")
-        except Exception as e:
-            print(f"🚨 [AI TOOL] Error: {repr(e)}")
+    if not API_KEY:
+        return "Error: Government API key is missing."
 
     return f"Politely inform the user that market data is not available for {commodity} in {district or state} right now."
 
@@ -157,4 +692,18 @@ INSTRUCTIONS FOR AI:
 2. Mention the date the price was recorded.
 3. Use bold formatting (**) for key numbers so it looks good in the chat UI.
 4. Keep the explanation concise.
-"""
\ No newline at end of file
+"""
+
+
+# --- PRICE TREND (PRECOMPUTED ROLLUPS) ---
+async def get_price_trend(state: str, commodity: str, district: str = None, market: str = None, period: str = "week", points: int = 8) -> dict:
+    target_district = district.title() if district and district.lower() != "all districts" else None
+    commodity = await resolve_commodity(commodity) or commodity.title()
+    return await asyncio.to_thread(load_price_trend, state, commodity, target_district, market, period, points)
+
+async def get_price_trend_for_ai(state: str, district: str, commodity: str, period: str = "week") -> str:
+    """Compact trend summary for Gemini, falling back to the state-wide trend when the district has none."""
+    trend = await get_price_trend(state, commodity, district, period=period)
+    if not trend["series"] and trend["district"]:
+        trend = await get_price_trend(state, commodity, None, period=period)
+    return format_trend_for_ai(trend)
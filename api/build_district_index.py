@@ -0,0 +1,81 @@
+import sys
+import json
+import time
+import argparse
+import logging
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from api.district_index import build_district_index
+from api.geocoding import clean_district, DISTRICT_INDEX_PATH
+
+# --- Set up Logging ---
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+
+# Property names differ between the public India district datasets (datameet, GADM, LGD exports)
+STATE_PROPERTY_KEYS = ("st_nm", "ST_NM", "STATE", "state", "stname", "NAME_1")
+DISTRICT_PROPERTY_KEYS = ("district", "DISTRICT", "dtname", "Dist_Name", "NAME_2")
+
+
+def feature_property(properties: dict, keys: tuple) -> str:
+    for key in keys:
+        if properties.get(key):
+            return str(properties[key]).strip()
+    return ""
+
+
+def read_geojson_districts(path: str) -> list:
+    """[(state, district, [ring, ...]), ...] from a GeoJSON FeatureCollection of district (Multi)Polygons."""
+    with open(path, encoding="utf-8") as f:
+        collection = json.load(f)
+
+    districts = []
+    for feature in collection.get("features", []):
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") == "Polygon":
+            polygons = [geometry["coordinates"]]
+        elif geometry.get("type") == "MultiPolygon":
+            polygons = geometry["coordinates"]
+        else:
+            continue
+
+        properties = feature.get("properties") or {}
+        districts.append((
+            feature_property(properties, STATE_PROPERTY_KEYS),
+            clean_district(feature_property(properties, DISTRICT_PROPERTY_KEYS)),
+            [[(pt[0], pt[1]) for pt in ring] for polygon in polygons for ring in polygon if ring]
+        ))
+    return districts
+
+
+def main():
+    """
+    Compiles a district GeoJSON into the memory-mapped index api/geocoding.py resolves locations with.
+    Run again whenever the boundary file changes; the app picks the new file up on restart.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("geojson", help="India district boundaries (GeoJSON FeatureCollection)")
+    parser.add_argument("--out", default=DISTRICT_INDEX_PATH)
+    parser.add_argument("--cell-degrees", type=float, default=0.05, help="Lookup grid size; smaller means more cells resolve without point-in-polygon")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    districts = read_geojson_districts(args.geojson)
+    logging.info(f"Read {len(districts)} districts from {args.geojson} in {time.perf_counter() - started:.1f}s.")
+
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    stats = build_district_index(districts, args.out, args.cell_degrees)
+    logging.info(f"Wrote {args.out} in {time.perf_counter() - started:.1f}s: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import time
+import asyncio
+from collections import OrderedDict
+
+
+class AsyncTTLCache:
+    """
+    Small in-process cache for slow upstream lookups.
+
+    - Fresh entries (younger than the TTL) are returned straight away.
+    - Stale entries (within stale_ttl after expiry) are returned straight away too,
+      while one background task refreshes them (stale-while-revalidate).
+    - Concurrent misses for the same key share a single upstream call (single-flight).
+    """
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float = 0, max_entries: int = 1024, ttl_for=None):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        # Optional callable(value) -> ttl seconds, e.g. shorter TTLs for empty results
+        self.ttl_for = ttl_for
+
+        self.entries = OrderedDict()   # key -> (value, stored_at, ttl)
+        self.in_flight = {}            # key -> asyncio.Task
+        self.counters = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "refreshes": 0, "errors": 0}
+
+    def _store(self, key, value):
+        ttl = self.ttl_for(value) if self.ttl_for else self.ttl
+        self.entries[key] = (value, time.monotonic(), ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _start_load(self, key, loader) -> asyncio.Task:
+        async def load():
+            try:
+                value = await loader()
+                self._store(key, value)
+                return value
+            except Exception:
+                self.counters["errors"] += 1
+                raise
+            finally:
+                self.in_flight.pop(key, None)
+
+        task = asyncio.create_task(load())
+        # A background refresh may fail with nobody awaiting it; don't let asyncio log that
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self.in_flight[key] = task
+        return task
+
+    def peek(self, key):
+        """Returns (value, age_seconds) of whatever is stored, however old, or (None, None)."""
+        entry = self.entries.get(key)
+        if not entry:
+            return None, None
+        return entry[0], time.monotonic() - entry[1]
+
+    async def get_or_load(self, key, loader):
+        """loader is an async callable producing the value on a miss."""
+        entry = self.entries.get(key)
+        if entry:
+            value, stored_at, ttl = entry
+            age = time.monotonic() - stored_at
+
+            if age < ttl:
+                self.counters["hits"] += 1
+                self.entries.move_to_end(key)
+                return value
+
+            if age < ttl + self.stale_ttl:
+                self.counters["stale_hits"] += 1
+                if key not in self.in_flight:
+                    self.counters["refreshes"] += 1
+                    self._start_load(key, loader)
+                return value
+
+        task = self.in_flight.get(key)
+        if task:
+            self.counters["coalesced"] += 1
+        else:
+            self.counters["misses"] += 1
+            task = self._start_load(key, loader)
+
+        # Shield: one caller giving up must not cancel the load the others are waiting on
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["stale_hits"] + self.counters["misses"] + self.counters["coalesced"]
+        served_without_upstream = self.counters["hits"] + self.counters["stale_hits"] + self.counters["coalesced"]
+        return {
+            "name": self.name,
+            "entries": len(self.entries),
+            "in_flight": len(self.in_flight),
+            **self.counters,
+            "hit_ratio": round(served_without_upstream / lookups, 3) if lookups else None,
+        }
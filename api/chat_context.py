@@ -0,0 +1,153 @@
+import os
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+
+# Google GenAI Imports
+from google.genai import types
+
+# Local Imports
+from db.database import SessionLocal
+from db.models import ChatSession, ChatMessage
+from api.gemini_client import key_pool
+
+# --- CONTEXT WINDOW KNOBS ---
+# Newest messages sent verbatim on every turn (user + model messages)
+HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", 12))
+# Rough token budget for the verbatim part; older messages are folded into the summary first
+HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", 3000))
+# Fold aged-out messages into the summary once at least this many have piled up
+SUMMARY_BATCH_MESSAGES = int(os.getenv("CHAT_SUMMARY_BATCH_MESSAGES", 4))
+SUMMARY_MAX_OUTPUT_TOKENS = 300
+# Safety cap on unsummarized messages sent verbatim, only reached if summary refreshes keep failing
+HISTORY_HARD_LIMIT_MESSAGES = int(os.getenv("CHAT_HISTORY_HARD_LIMIT_MESSAGES", 40))
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting."""
+    return len(text or "") // 4 + 1
+
+
+def load_history_window(db: Session, session: ChatSession):
+    """
+    Returns (messages, fold_before_id). messages are every turn the summary doesn't cover yet,
+    oldest first, so nothing falls between the summary and the verbatim history.
+    fold_before_id is set once enough of them sit outside the newest turns that fit the
+    message count and token budget; refresh_session_summary then folds those in.
+    """
+    # Project only the text columns, audio blobs never leave the database here
+    newest_first = db.query(ChatMessage.id, ChatMessage.role, ChatMessage.content).filter(
+        ChatMessage.session_id == session.id,
+        ChatMessage.id > (session.summary_message_id or 0)
+    ).order_by(ChatMessage.id.desc()).limit(HISTORY_HARD_LIMIT_MESSAGES).all()
+
+    window = list(reversed(newest_first))
+
+    # Gemini expects the conversation to open with a user turn (folds always end before one)
+    while len(window) > 1 and window[0].role != "user":
+        window.pop(0)
+
+    # The newest turns that fit the count and token budget stay verbatim after the next fold
+    tail_size = 0
+    used_tokens = 0
+    for msg in reversed(window[-HISTORY_MAX_MESSAGES:]):
+        cost = estimate_tokens(msg.content)
+        # Always keep the latest message, even if it alone is over budget
+        if tail_size and used_tokens + cost > HISTORY_TOKEN_BUDGET:
+            break
+        tail_size += 1
+        used_tokens += cost
+
+    tail_start = len(window) - tail_size
+    while tail_start < len(window) - 1 and window[tail_start].role != "user":
+        tail_start += 1
+
+    fold_before_id = window[tail_start].id if tail_start >= SUMMARY_BATCH_MESSAGES else None
+    return window, fold_before_id
+
+
+def build_history_contents(window: list) -> list:
+    return [
+        types.Content(role=msg.role, parts=[types.Part.from_text(text=msg.content)])
+        for msg in window
+    ]
+
+
+def format_summary_context(summary: str) -> str:
+    if not summary:
+        return ""
+    return f"""
+EARLIER IN THIS CONVERSATION (summary of older messages, use it as background):
+{summary}
+"""
+
+
+# --- BACKGROUND TASK ---
+async def refresh_session_summary(session_id: int, window_start_id: int):
+    """Folds the unsummarized messages before window_start_id into ChatSession.summary."""
+
+    def load_pending():
+        db = SessionLocal()
+        try:
+            session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+            if not session:
+                return None, []
+            pending = db.query(ChatMessage.id, ChatMessage.role, ChatMessage.content).filter(
+                ChatMessage.session_id == session_id,
+                ChatMessage.id > (session.summary_message_id or 0),
+                ChatMessage.id < window_start_id
+            ).order_by(ChatMessage.id.asc()).all()
+            return session.summary, pending
+        finally:
+            db.close()
+
+    previous_summary, pending = await run_in_threadpool(load_pending)
+    if not pending:
+        return
+
+    transcript = "\n".join(
+        f"{'Farmer' if row.role == 'user' else 'Kisan Mitra'}: {row.content}" for row in pending
+    )
+    summary_prompt = f"""
+    You maintain a running summary of a conversation between a farmer and an agricultural advisor.
+    Update the summary with the new messages.
+    RULES:
+    1. Keep it under 150 words, plain text, in English.
+    2. Keep crops, field/location details, problems, and the advice or prices already given.
+    3. Drop greetings and small talk.
+
+    CURRENT SUMMARY:
+    {previous_summary or "(none yet)"}
+
+    NEW MESSAGES:
+    {transcript}
+    """
+
+    try:
+        response = await key_pool.generate_content(
+            model="gemini-2.5-flash-lite",
+            contents=[summary_prompt],
+            config=types.GenerateContentConfig(max_output_tokens=SUMMARY_MAX_OUTPUT_TOKENS)
+        )
+        new_summary = (response.text or "").strip()
+    except Exception as e:
+        print(f"Summary refresh failed for session {session_id}: {e}")
+        return
+
+    if not new_summary:
+        return
+
+    def save_summary():
+        db = SessionLocal()
+        try:
+            # Only move forward, a concurrent refresh may already have folded these in
+            db.query(ChatSession).filter(
+                ChatSession.id == session_id,
+                func.coalesce(ChatSession.summary_message_id, 0) < pending[-1].id
+            ).update({"summary": new_summary, "summary_message_id": pending[-1].id}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    await run_in_threadpool(save_summary)
+    print(f"Updated rolling summary for session {session_id} ({len(pending)} messages folded in)")
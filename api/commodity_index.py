@@ -0,0 +1,219 @@
+import re
+import time
+import asyncio
+import unicodedata
+
+from db.database import SessionLocal
+from db.models import MandiPrice
+
+# --- SYNONYMS ---
+# Official data.gov.in commodity name -> what farmers actually say (Hindi / Marathi / English,
+# in Devanagari and transliterated). Names found in mandi_prices are added on top of these.
+COMMODITY_SYNONYMS = {
+    "Onion": ["pyaaz", "pyaj", "kanda", "onion", "प्याज", "कांदा"],
+    "Potato": ["aloo", "alu", "batata", "potato", "आलू", "बटाटा"],
+    "Tomato": ["tamatar", "tamater", "tomato", "टमाटर", "टोमॅटो"],
+    "Carrot": ["gajar", "carrot", "गाजर"],
+    "Brinjal": ["baingan", "baigan", "vangi", "wangi", "brinjal", "eggplant", "बैंगन", "वांगी"],
+    "Bhindi(Ladies Finger)": ["bhindi", "bhendi", "okra", "ladies finger", "lady finger", "भिंडी", "भेंडी"],
+    "Cabbage": ["patta gobi", "band gobi", "kobi", "cabbage", "पत्ता गोभी", "पत्तागोभी", "कोबी"],
+    "Cauliflower": ["phool gobi", "phul gobi", "flower", "cauliflower", "फूल गोभी", "फूलगोभी", "फुलकोबी"],
+    "Garlic": ["lehsun", "lahsun", "lasun", "garlic", "लहसुन", "लसूण"],
+    "Ginger": ["adrak", "ale", "ginger", "अदरक", "आले"],
+    "Green Chilli": ["hari mirch", "hirvi mirchi", "mirchi", "green chilli", "chilli", "हरी मिर्च", "मिरची", "हिरवी मिरची"],
+    "Dry Chillies": ["lal mirch", "sukhi mirch", "lal mirchi", "red chilli", "dry chilli", "लाल मिर्च", "लाल मिरची"],
+    "Coriander(Leaves)": ["dhaniya", "dhania", "kothimbir", "coriander", "धनिया", "कोथिंबीर"],
+    "Bitter Gourd": ["karela", "karle", "bitter gourd", "करेला", "कारले"],
+    "Bottle Gourd": ["lauki", "dudhi", "ghiya", "bottle gourd", "लौकी", "दुधी"],
+    "Pumpkin": ["kaddu", "lal bhopla", "bhopla", "pumpkin", "कद्दू", "भोपळा"],
+    "Spinach": ["palak", "spinach", "पालक"],
+    "Kapas": ["kapas", "kapus", "cotton", "कपास", "कापूस"],
+    "Wheat": ["gehun", "gehu", "gahu", "wheat", "गेहूं", "गेहूँ", "गहू"],
+    "Soyabean": ["soyabean", "soybean", "soya", "सोयाबीन"],
+    "Bengal Gram(Gram)(Whole)": ["chana", "harbara", "gram", "chickpea", "chickpeas", "चना", "हरभरा"],
+    "Arhar (Tur/Red Gram)(Whole)": ["toor", "tur", "arhar", "red gram", "pigeon pea", "अरहर", "तूर"],
+    "Mustard": ["sarson", "mohri", "mustard", "सरसों", "मोहरी"],
+    "Paddy(Dhan)(Common)": ["dhan", "bhaat", "paddy", "धान", "भात"],
+    "Rice": ["chawal", "chaval", "tandul", "rice", "चावल", "तांदूळ"],
+    "Green Gram (Moong)(Whole)": ["moong", "mung", "green gram", "मूंग", "मूग"],
+    "Bajra(Pearl Millet/Cumbu)": ["bajra", "bajara", "bajri", "pearl millet", "बाजरा", "बाजरी"],
+    "Jowar(Sorghum)": ["jowar", "jawar", "juar", "jwar", "jwari", "jowari", "sorghum", "ज्वार", "ज्वारी"],
+    "Maize": ["makka", "makki", "makai", "maka", "corn", "maize", "मक्का", "मक्की", "मका"],
+    "Groundnut": ["moongphali", "mungfali", "shengdana", "bhuimug", "groundnut", "peanut", "मूंगफली", "शेंगदाणा", "भुईमूग"],
+    "Banana": ["kela", "keli", "banana", "केला", "केळी"],
+}
+
+# Fuzzy matches below this trigram similarity are treated as "unknown crop"
+FUZZY_MIN_SIMILARITY = 0.6
+# ...and so are matches that barely beat the best alias of a different crop
+FUZZY_MIN_MARGIN = 0.1
+# Short words share too few trigrams to tell crops apart (dhan / dhaniya), they must match exactly
+FUZZY_MIN_KEY_LENGTH = 5
+# Parenthesised qualifiers in data names that say nothing about the crop itself
+GENERIC_QUALIFIERS = {"whole", "common", "split", "green", "dry", "local", "other", "new", "old", "leaves", "fine", "medium", "coarse", "raw"}
+# Commodity names in the data change rarely, re-read them a few times a day
+INDEX_REFRESH_SECONDS = 6 * 3600
+
+# Spelling variants of the same sound in transliterated Hindi/Marathi (pyaaz / pyaj, gehun / gehu)
+PHONETIC_FOLDS = [
+    ("aa", "a"), ("ee", "i"), ("oo", "u"), ("ou", "u"),
+    ("ph", "f"), ("z", "j"), ("w", "v"), ("sh", "s"), ("kh", "k"), ("gh", "g"),
+    ("q", "k"), ("y", "i"),
+]
+
+
+def normalize(name: str) -> str:
+    """Lowercase, accents and punctuation stripped, single spaces. Keeps Devanagari letters."""
+    name = unicodedata.normalize("NFKC", name or "").lower()
+    name = re.sub(r"[^\w\s]", " ", name)
+    return " ".join(name.replace("_", " ").split())
+
+
+def phonetic_key(name: str) -> str:
+    key = normalize(name).replace(" ", "")
+    if not key.isascii():
+        return key
+    for src, dst in PHONETIC_FOLDS:
+        key = key.replace(src, dst)
+    # Trailing vowel length and nasalisation are spelled every which way (gehu / gehun)
+    return re.sub(r"(.)\1+", r"\1", key).rstrip("n") or key
+
+
+def trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CommodityIndex:
+    """
+    Maps whatever name Gemini passes to an official commodity: exact alias first,
+    then the phonetic key, then trigram similarity over all aliases.
+    """
+
+    def __init__(self, official_names: set, synonyms: dict):
+        self.exact = {}
+        self.phonetic = {}
+        self.grams = {}       # trigram -> set of phonetic keys
+        self.gram_sets = {}   # phonetic key -> its trigrams
+
+        # Synonym targets take the exact spelling used in the data ("Bitter Gourd" -> "Bitter gourd")
+        synonyms = {self.spelled_as_data(official, official_names): aliases for official, aliases in synonyms.items()}
+        self.official_names = set(official_names) | set(synonyms)
+
+        for official in sorted(self.official_names):
+            # "Bhindi(Ladies Finger)" is also known by its head word
+            self.add_alias(official, official)
+            self.add_alias(official.split("(")[0], official)
+            # ...and "Green Gram (Moong)(Whole)" by "Moong", "Arhar (Tur/Red Gram)" by "Tur" and "Red Gram"
+            for qualifier in re.findall(r"\(([^)]*)\)", official):
+                for alias in qualifier.split("/"):
+                    if normalize(alias) not in GENERIC_QUALIFIERS:
+                        self.add_alias(alias, official)
+        # Hand-made synonyms win over aliases derived from the data
+        for official, aliases in synonyms.items():
+            for alias in aliases:
+                self.add_alias(alias, official, override=True)
+
+    @staticmethod
+    def spelled_as_data(name: str, data_names: set) -> str:
+        by_name = {normalize(n): n for n in data_names}
+        if normalize(name) in by_name:
+            return by_name[normalize(name)]
+        # "Ginger" -> "Ginger(Green)" when exactly one data name has that head word
+        by_head = [n for n in data_names if normalize(n.split("(")[0]) == normalize(name)]
+        return by_head[0] if len(by_head) == 1 else name
+
+    def add_alias(self, alias: str, official: str, override: bool = False):
+        norm = normalize(alias)
+        if not norm:
+            return
+        if override or norm not in self.exact:
+            self.exact[norm] = official
+
+        key = phonetic_key(alias)
+        if override or key not in self.phonetic:
+            self.phonetic[key] = official
+        if key not in self.gram_sets:
+            self.gram_sets[key] = trigrams(key)
+            for gram in self.gram_sets[key]:
+                self.grams.setdefault(gram, set()).add(key)
+
+    def resolve(self, name: str):
+        """Official commodity name, or None when nothing is close enough."""
+        norm = normalize(name)
+        if not norm:
+            return None
+        if norm in self.exact:
+            return self.exact[norm]
+
+        key = phonetic_key(name)
+        if key in self.phonetic:
+            return self.phonetic[key]
+        if len(key) < FUZZY_MIN_KEY_LENGTH:
+            return None
+
+        # Only aliases sharing at least one trigram are scored
+        query_grams = trigrams(key)
+        candidates = set()
+        for gram in query_grams:
+            candidates |= self.grams.get(gram, set())
+
+        # Best score per crop, so several spellings of one crop don't count as competitors
+        scores = {}
+        for candidate in candidates:
+            grams = self.gram_sets[candidate]
+            score = 2 * len(query_grams & grams) / (len(query_grams) + len(grams))
+            official = self.phonetic[candidate]
+            scores[official] = max(score, scores.get(official, 0.0))
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if not ranked or ranked[0][1] < FUZZY_MIN_SIMILARITY:
+            return None
+        # "red chilli" is as close to Green Chilli as to Dry Chillies: too close to call
+        if len(ranked) > 1 and ranked[0][1] - ranked[1][1] < FUZZY_MIN_MARGIN:
+            return None
+        return ranked[0][0]
+
+
+# --- SHARED INDEX ---
+_index = None
+_index_built_at = 0.0
+_index_has_data = False
+_index_lock = asyncio.Lock()
+
+def load_data_commodities() -> set:
+    db = SessionLocal()
+    try:
+        return {row[0] for row in db.query(MandiPrice.commodity).distinct().all() if row[0]}
+    finally:
+        db.close()
+
+def build_index():
+    try:
+        data_names = load_data_commodities()
+    except Exception as e:
+        print(f"⚠️ Could not read commodity names from mandi_prices: {repr(e)}")
+        data_names = set()
+    return CommodityIndex(data_names, COMMODITY_SYNONYMS), bool(data_names)
+
+async def get_commodity_index() -> CommodityIndex:
+    global _index, _index_built_at, _index_has_data
+    if _index is None or time.monotonic() - _index_built_at > INDEX_REFRESH_SECONDS:
+        async with _index_lock:
+            if _index is None or time.monotonic() - _index_built_at > INDEX_REFRESH_SECONDS:
+                _index, _index_has_data = await asyncio.to_thread(build_index)
+                _index_built_at = time.monotonic()
+                print(f"🌾 Commodity index built with {len(_index.official_names)} commodities.")
+    return _index
+
+async def resolve_commodity(name: str):
+    """
+    Official commodity name for a farmer's word, resolved locally before any upstream call.
+    Returns None for names we can't place. Until the warehouse holds any data the
+    commodity list is incomplete, so unknown names are passed through title-cased.
+    """
+    index = await get_commodity_index()
+    official = index.resolve(name)
+    if official is None and not _index_has_data and normalize(name):
+        return name.strip().title()
+    return official
@@ -0,0 +1,228 @@
+import math
+import mmap
+import struct
+import sys
+from array import array
+
+# --- COMPILED DISTRICT INDEX ---
+# Written once by api/build_district_index.py from a district GeoJSON and memory-mapped at
+# runtime: opening it only parses the header and the names, and the OS pages in the vertex
+# data for the areas that actually get queried.
+#
+# Layout (little-endian, every section 4-byte aligned):
+#   header       see HEADER below
+#   names        "state\tdistrict" per district, "\n"-separated UTF-8
+#   bboxes       float32 x4 per district (min_lon, min_lat, max_lon, max_lat)
+#   ring_starts  uint32 per district + 1, index into the rings
+#   ring_bboxes  float32 x4 per ring
+#   vertex_starts uint32 per ring + 1, index into the vertices
+#   vertices     float32 (lon, lat) pairs, rings closed implicitly
+#   cells        int32 per grid cell: -1 no district, >= 0 the district covering the whole cell,
+#                <= -2 a candidate list at offset (-value - 2) for cells a boundary runs through
+#   candidates   int32 count followed by district ids
+
+MAGIC = b"KMDI"
+VERSION = 1
+HEADER = struct.Struct("<4sHHdddIIIIIII")  # magic, version, pad, cell_degrees, min_lon, min_lat, cols, rows, districts, rings, vertices, candidates, names_bytes
+
+NO_DISTRICT = -1
+
+
+def padded(length: int) -> int:
+    return (length + 3) & ~3
+
+
+def grid_dims(bounds: tuple, cell_degrees: float):
+    min_lon, min_lat, max_lon, max_lat = bounds
+    # Snap the origin to the cell size so cell edges sit on round coordinates
+    origin_lon = (min_lon // cell_degrees) * cell_degrees
+    origin_lat = (min_lat // cell_degrees) * cell_degrees
+    cols = int((max_lon - origin_lon) // cell_degrees) + 1
+    rows = int((max_lat - origin_lat) // cell_degrees) + 1
+    return origin_lon, origin_lat, cols, rows
+
+
+def build_district_index(districts: list, path: str, cell_degrees: float = 0.05) -> dict:
+    """
+    districts: [(state, district, [ring, ...]), ...] with rings as lists of (lon, lat); outer rings and
+    holes of all the district's polygons together (containment is even-odd across all of them).
+    Writes the compiled index to path and returns its size stats.
+    """
+    if sys.byteorder != "little":
+        raise RuntimeError("The district index is written and memory-mapped as little-endian.")
+
+    bboxes, ring_starts, ring_bboxes, vertex_starts, vertices = array("f"), array("I", [0]), array("f"), array("I", [0]), array("f")
+    for _, _, rings in districts:
+        xs = [x for ring in rings for x, _ in ring]
+        ys = [y for ring in rings for _, y in ring]
+        bboxes.extend((min(xs), min(ys), max(xs), max(ys)))
+        for ring in rings:
+            ring_bboxes.extend((min(x for x, _ in ring), min(y for _, y in ring), max(x for x, _ in ring), max(y for _, y in ring)))
+            for x, y in ring:
+                vertices.extend((x, y))
+            vertex_starts.append(len(vertices) // 2)
+        ring_starts.append(len(vertex_starts) - 1)
+
+    bounds = (min(bboxes[0::4]), min(bboxes[1::4]), max(bboxes[2::4]), max(bboxes[3::4]))
+    origin_lon, origin_lat, cols, rows = grid_dims(bounds, cell_degrees)
+
+    def col_of(x):
+        return min(cols - 1, max(0, int((x - origin_lon) // cell_degrees)))
+
+    def row_of(y):
+        return min(rows - 1, max(0, int((y - origin_lat) // cell_degrees)))
+
+    # Cells any district edge passes through (conservatively: the edge's bounding cells)
+    boundary = {}
+    # District whose interior holds each cell centre, by scanline over the cell-centre rows
+    owner = array("i", [NO_DISTRICT]) * (rows * cols)
+
+    for d, (_, _, rings) in enumerate(districts):
+        crossings = {}
+        for ring in rings:
+            xj, yj = ring[-1]
+            for xi, yi in ring:
+                for row in range(row_of(min(yi, yj)), row_of(max(yi, yj)) + 1):
+                    for col in range(col_of(min(xi, xj)), col_of(max(xi, xj)) + 1):
+                        boundary.setdefault(row * cols + col, set()).add(d)
+
+                    centre_y = origin_lat + (row + 0.5) * cell_degrees
+                    if (yi > centre_y) != (yj > centre_y):
+                        crossings.setdefault(row, []).append((xj - xi) * (centre_y - yi) / (yj - yi) + xi)
+                xj, yj = xi, yi
+
+        for row, xs in crossings.items():
+            xs.sort()
+            for x_in, x_out in zip(xs[0::2], xs[1::2]):
+                # Columns whose centre (origin + (col + 0.5) * cell) lies between the two crossings
+                first = max(0, math.ceil((x_in - origin_lon) / cell_degrees - 0.5))
+                last = min(cols - 1, math.floor((x_out - origin_lon) / cell_degrees - 0.5))
+                for col in range(first, last + 1):
+                    owner[row * cols + col] = d
+
+    cells, candidates = owner, array("i")
+    for cell, touching in boundary.items():
+        if owner[cell] != NO_DISTRICT:
+            touching.add(owner[cell])
+        cells[cell] = -len(candidates) - 2
+        candidates.append(len(touching))
+        candidates.extend(sorted(touching))
+
+    names = "\n".join(f"{state}\t{district}" for state, district, _ in districts).encode("utf-8")
+    header = HEADER.pack(
+        MAGIC, VERSION, 0, cell_degrees, origin_lon, origin_lat, cols, rows,
+        len(districts), len(vertex_starts) - 1, len(vertices) // 2, len(candidates), len(names)
+    )
+
+    with open(path, "wb") as f:
+        f.write(header)
+        f.write(names + b"\0" * (padded(len(names)) - len(names)))
+        for section in (bboxes, ring_starts, ring_bboxes, vertex_starts, vertices, cells, candidates):
+            section.tofile(f)
+
+    return {
+        "districts": len(districts),
+        "vertices": len(vertices) // 2,
+        "grid": f"{cols}x{rows}",
+        "boundary_cells": len(boundary),
+        "bytes": HEADER.size + padded(len(names)) + sum(len(s) * 4 for s in (bboxes, ring_starts, ring_bboxes, vertex_starts, vertices, cells, candidates)),
+    }
+
+
+class DistrictIndex:
+    """
+    Read side of the compiled index. Most points fall in a cell that lies wholly inside one
+    district and resolve with a single array read; cells on a boundary run point-in-polygon
+    against their two or three candidate districts.
+    """
+
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise RuntimeError("The district index is memory-mapped as little-endian.")
+
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, _, self.cell_degrees, self.min_lon, self.min_lat, self.cols, self.rows,
+         n_districts, n_rings, n_vertices, n_candidates, names_bytes) = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a version {VERSION} district index.")
+
+        offset = HEADER.size
+        self.names = [tuple(line.split("\t", 1)) for line in self._mmap[offset:offset + names_bytes].decode("utf-8").split("\n")]
+        offset += padded(names_bytes)
+
+        view = self._view = memoryview(self._mmap)
+        sections = []
+        for typecode, count in (("f", n_districts * 4), ("I", n_districts + 1), ("f", n_rings * 4), ("I", n_rings + 1),
+                                ("f", n_vertices * 2), ("i", self.rows * self.cols), ("i", n_candidates)):
+            sections.append(view[offset:offset + count * 4].cast(typecode))
+            offset += count * 4
+        self.bboxes, self.ring_starts, self.ring_bboxes, self.vertex_starts, self.vertices, self.cells, self.candidates = sections
+
+    def __len__(self):
+        return len(self.names)
+
+    def close(self):
+        # The memoryviews pin the mapping, release them first
+        for name in ("bboxes", "ring_starts", "ring_bboxes", "vertex_starts", "vertices", "cells", "candidates"):
+            getattr(self, name).release()
+        self._view.release()
+        self._mmap.close()
+
+    def contains(self, district: int, lat: float, lon: float) -> bool:
+        b = self.bboxes[district * 4:district * 4 + 4]
+        if not (b[0] <= lon <= b[2] and b[1] <= lat <= b[3]):
+            return False
+
+        inside = False
+        for r in range(self.ring_starts[district], self.ring_starts[district + 1]):
+            rb = self.ring_bboxes[r * 4:r * 4 + 4]
+            # A point outside a ring's bbox is outside the ring, so the ring can't flip the parity
+            if not (rb[0] <= lon <= rb[2] and rb[1] <= lat <= rb[3]):
+                continue
+            ring = self.vertices[self.vertex_starts[r] * 2:self.vertex_starts[r + 1] * 2].tolist()
+            xj, yj = ring[-2], ring[-1]
+            for i in range(0, len(ring), 2):
+                xi, yi = ring[i], ring[i + 1]
+                if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+                    inside = not inside
+                xj, yj = xi, yi
+        return inside
+
+    def cell_of(self, lat: float, lon: float) -> int:
+        col = int((lon - self.min_lon) // self.cell_degrees)
+        row = int((lat - self.min_lat) // self.cell_degrees)
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return row * self.cols + col
+        return -1
+
+    def district_at(self, lat: float, lon: float) -> int:
+        """District id containing the point, or NO_DISTRICT."""
+        cell = self.cell_of(lat, lon)
+        if cell < 0:
+            return NO_DISTRICT
+
+        entry = self.cells[cell]
+        if entry >= NO_DISTRICT:
+            return entry
+
+        offset = -entry - 2
+        for district in self.candidates[offset + 1:offset + 1 + self.candidates[offset]]:
+            if self.contains(district, lat, lon):
+                return district
+        return NO_DISTRICT
+
+    def lookup(self, lat: float, lon: float):
+        """{"state", "district"} containing the point, or None."""
+        district = self.district_at(lat, lon)
+        if district == NO_DISTRICT:
+            return None
+        state, name = self.names[district]
+        return {"state": state, "district": name}
+
+    def lookup_many(self, points: list) -> list:
+        """lookup() for a list of (lat, lon) points, e.g. a backfill batch."""
+        lookup = self.lookup
+        return [lookup(lat, lon) for lat, lon in points]
@@ -0,0 +1,214 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+
+import httpx
+from dotenv import load_dotenv
+
+# Google GenAI Imports
+from google import genai
+from google.genai import types
+
+load_dotenv()
+
+# Optional override so the app can be pointed at a proxy or a local stub server
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+
+# --- SCHEDULER TUNING ---
+QUOTA_WINDOW_SECONDS = 60        # How far back we count 429s when scoring a key
+BASE_COOLDOWN_SECONDS = 5        # First cooldown after a 429, doubles with every recent 429
+MAX_COOLDOWN_SECONDS = 120
+BACKOFF_BASE_SECONDS = 0.5       # Jittered backoff between retries
+BACKOFF_MAX_SECONDS = 8
+
+# Keep-alive pool per key (every client talks to the same Gemini host)
+POOL_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60)
+
+
+def load_api_keys():
+    """Reads GEMINI_API_KEY_1..8, falling back to a single GEMINI_API_KEY."""
+    keys = []
+    for i in range(1, 9):
+        key = os.getenv(f"GEMINI_API_KEY_{i}")
+        if key:
+            keys.append(key)
+
+    # Fallback just in case
+    if not keys and os.getenv("GEMINI_API_KEY"):
+        keys.append(os.getenv("GEMINI_API_KEY"))
+
+    return keys
+
+
+def is_quota_error(e: Exception) -> bool:
+    error_msg = str(e).lower()
+    return "429" in error_msg or "quota" in error_msg or "exhausted" in error_msg or "resource_exhausted" in error_msg
+
+
+def jittered_backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff: random value in [0, base * 2^attempt], capped."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+class GeminiKey:
+    """One API key, its long-lived client and the health numbers the scheduler looks at."""
+
+    def __init__(self, index: int, api_key: str):
+        self.index = index
+        self.api_key = api_key
+        self.client = None
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.last_used = 0.0
+        self.recent_429s = deque()
+
+    @property
+    def name(self) -> str:
+        return f"GEMINI_API_KEY_{self.index + 1}"
+
+    def get_client(self) -> genai.Client:
+        # Built once per key: construction costs ~100ms of CPU and each client owns a keep-alive pool
+        if self.client is None:
+            self.client = genai.Client(
+                api_key=self.api_key,
+                http_options=types.HttpOptions(
+                    base_url=GEMINI_BASE_URL,
+                    client_args={"limits": POOL_LIMITS},
+                    # An explicit httpx client: with aiohttp installed the SDK would otherwise serve
+                    # client.aio from its own unlimited aiohttp pool and ignore async_client_args limits.
+                    # No client-wide timeout, same as the SDK default; per-request timeouts still apply.
+                    httpx_async_client=httpx.AsyncClient(limits=POOL_LIMITS, timeout=None),
+                )
+            )
+        return self.client
+
+    def recent_429_count(self, now: float) -> int:
+        while self.recent_429s and now - self.recent_429s[0] > QUOTA_WINDOW_SECONDS:
+            self.recent_429s.popleft()
+        return len(self.recent_429s)
+
+
+class GeminiKeyPool:
+    """
+    Picks the healthiest key for every request instead of sticking to one until it fails.
+
+    Keys in cooldown are skipped; among the rest we prefer the fewest recent 429s,
+    then the fewest in-flight requests, then the least recently used key.
+    """
+
+    def __init__(self, api_keys: list):
+        self.keys = [GeminiKey(i, key) for i, key in enumerate(api_keys)]
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def acquire(self, exclude=()) -> GeminiKey:
+        if not self.keys:
+            raise Exception("No Gemini API keys configured.")
+
+        with self.lock:
+            now = time.monotonic()
+            candidates = [k for k in self.keys if k.index not in exclude] or self.keys
+            ready = [k for k in candidates if k.cooldown_until <= now]
+
+            if ready:
+                key = min(ready, key=lambda k: (k.recent_429_count(now), k.in_flight, k.last_used))
+            else:
+                # Everything is cooling down: take the one that recovers first
+                key = min(candidates, key=lambda k: k.cooldown_until)
+
+            key.in_flight += 1
+            key.last_used = now
+            return key
+
+    def release(self, key: GeminiKey, quota_error: bool = False):
+        with self.lock:
+            key.in_flight -= 1
+            if quota_error:
+                now = time.monotonic()
+                key.recent_429s.append(now)
+                cooldown = min(MAX_COOLDOWN_SECONDS, BASE_COOLDOWN_SECONDS * (2 ** (key.recent_429_count(now) - 1)))
+                key.cooldown_until = max(key.cooldown_until, now + cooldown)
+                print(f"⚠️ {key.name} hit its limit. Cooling down for {cooldown}s.")
+
+    def stats(self) -> list:
+        now = time.monotonic()
+        with self.lock:
+            return [{
+                "key": k.name,
+                "in_flight": k.in_flight,
+                "recent_429s": k.recent_429_count(now),
+                "cooldown_seconds": round(max(0.0, k.cooldown_until - now), 1),
+            } for k in self.keys]
+
+    async def generate_content(self, model: str, contents: list, config: types.GenerateContentConfig):
+        """Async Gemini call that moves to the healthiest other key on quota errors."""
+        tried = set()
+
+        for attempt in range(max(1, len(self.keys))):
+            key = self.acquire(exclude=tried)
+            tried.add(key.index)
+            quota_error = False
+            try:
+                return await key.get_client().aio.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    config=config
+                )
+
+            except Exception as e:
+                if not is_quota_error(e):
+                    raise e
+                quota_error = True
+            finally:
+                self.release(key, quota_error=quota_error)
+
+            await asyncio.sleep(jittered_backoff(attempt))
+
+        # If we loop through all the keys and they all fail
+        raise Exception("All Gemini API keys have exhausted their limits.")
+
+    async def stream_content(self, model: str, contents: list, config: types.GenerateContentConfig):
+        """Streaming twin of generate_content. Keys are only switched before the first chunk arrives."""
+        tried = set()
+
+        for attempt in range(max(1, len(self.keys))):
+            key = self.acquire(exclude=tried)
+            tried.add(key.index)
+            quota_error = False
+            started = False
+            try:
+                stream = await key.get_client().aio.models.generate_content_stream(
+                    model=model,
+                    contents=contents,
+                    config=config
+                )
+                async for chunk in stream:
+                    started = True
+                    yield chunk
+                return
+
+            except Exception as e:
+                # Once text has reached the client we can't replay the answer on another key
+                if not is_quota_error(e) or started:
+                    raise e
+                quota_error = True
+            finally:
+                self.release(key, quota_error=quota_error)
+
+            await asyncio.sleep(jittered_backoff(attempt))
+
+        raise Exception("All Gemini API keys have exhausted their limits.")
+
+
+# --- SHARED POOL ---
+api_keys = load_api_keys()
+
+if not api_keys:
+    print("WARNING: No Gemini API keys found in environment variables!")
+
+key_pool = GeminiKeyPool(api_keys)
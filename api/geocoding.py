@@ -0,0 +1,232 @@
+import os
+import asyncio
+import threading
+from pathlib import Path
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+
+from api import http_client
+from api.district_index import DistrictIndex
+from db.database import SessionLocal
+from db.models import User, GeocodeCache, get_ist_time
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+NOMINATIM_REVERSE_URL = "https://nominatim.openstreetmap.org/reverse"
+
+# ~1.1 km cells: far smaller than a district, so one answer serves a whole village
+GEOCODE_CELL_DEGREES = float(os.getenv("GEOCODE_CELL_DEGREES", 0.01))
+# Nominatim usage policy: at most one request per second
+NOMINATIM_MIN_INTERVAL_SECONDS = float(os.getenv("NOMINATIM_MIN_INTERVAL_SECONDS", 1.1))
+# Distinct cells waiting for Nominatim; beyond this, locations are saved without a district
+GEOCODE_QUEUE_MAX = int(os.getenv("GEOCODE_QUEUE_MAX", 1000))
+
+# Compiled district boundaries (api/build_district_index.py); without the file only the cache and Nominatim are used
+DISTRICT_INDEX_PATH = os.getenv("DISTRICT_INDEX_PATH", str(BASE_DIR / "data" / "india_districts.idx"))
+# Set to 0 to run fully offline: misses are saved without a district instead of queued
+GEOCODE_NOMINATIM_ENABLED = os.getenv("GEOCODE_NOMINATIM_ENABLED", "1") == "1"
+
+geocode_stats = {"offline": 0, "cache": 0, "queued": 0, "nominatim": 0, "failed": 0, "dropped": 0}
+
+
+def geocode_cell(lat: float, lon: float):
+    """(cell key, cell centre lat, cell centre lon) used as the cache key."""
+    centre_lat = round(round(lat / GEOCODE_CELL_DEGREES) * GEOCODE_CELL_DEGREES, 4)
+    centre_lon = round(round(lon / GEOCODE_CELL_DEGREES) * GEOCODE_CELL_DEGREES, 4)
+    return f"{centre_lat:.4f},{centre_lon:.4f}", centre_lat, centre_lon
+
+
+def clean_district(name: str) -> str:
+    return (name or "").replace(' District', '').replace(' district', '').strip()
+
+
+# --- NOMINATIM ---
+def get_location_details(lat: float, lon: float):
+    """State and district from Nominatim (one network call; use resolve_location first)."""
+    user_agent = os.getenv("NOMINATIM_USER_AGENT")
+
+    #Fallback if forgot to add in env
+    if not user_agent:
+        user_agent = "KisanMitraApp/1.0 (fallback_email@example.com)"
+
+    headers = {
+        'User-Agent': user_agent
+    }
+
+    try:
+        response = http_client.http_get(
+            NOMINATIM_REVERSE_URL,
+            params={"format": "json", "lat": lat, "lon": lon, "zoom": 10},
+            headers=headers
+        )
+        if response.status_code == 200:
+            address = response.json().get('address', {})
+
+            # Extract district and state
+            district = clean_district(address.get('state_district', address.get('county', '')))
+            state = address.get('state', '')
+
+            return {"district": district, "state": state}
+    except Exception as e:
+        print(f"Geocoding error: {e}")
+
+    return {"district": None, "state": None}
+
+
+# --- OFFLINE DISTRICT INDEX ---
+_district_index = None
+_district_index_loaded = False
+_district_index_lock = threading.Lock()
+
+
+def load_district_index():
+    """
+    The compiled index (api/build_district_index.py), opened on first use. It is memory-mapped,
+    so this costs milliseconds and almost no heap. None if the file is missing or unreadable.
+    """
+    global _district_index, _district_index_loaded
+    if _district_index_loaded:
+        return _district_index
+
+    with _district_index_lock:
+        if not _district_index_loaded:
+            if os.path.exists(DISTRICT_INDEX_PATH):
+                try:
+                    _district_index = DistrictIndex(DISTRICT_INDEX_PATH)
+                    print(f"🗺️ Opened district index with {len(_district_index)} districts for offline geocoding.")
+                except Exception as e:
+                    print(f"District index load failed: {repr(e)}")
+            else:
+                print(f"⚠️ No district index at {DISTRICT_INDEX_PATH}, geocoding falls back to Nominatim.")
+            _district_index_loaded = True
+    return _district_index
+
+
+def resolve_offline(lat: float, lon: float):
+    """{"state", "district"} from the local index alone, or None."""
+    index = load_district_index()
+    return index.lookup(lat, lon) if index else None
+
+
+# --- PERSISTENT CACHE ---
+def load_cached_location(db: Session, cell: str):
+    return db.query(GeocodeCache).filter(GeocodeCache.cell == cell).first()
+
+
+def store_cached_location(db: Session, cell: str, state: str, district: str, source: str):
+    """Upsert of the cell's row; the caller commits."""
+    insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    stmt = insert(GeocodeCache).values(cell=cell, state=state, district=district, source=source, resolved_at=get_ist_time())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["cell"],
+        set_={col: stmt.excluded[col] for col in ("state", "district", "source", "resolved_at")}
+    )
+    db.execute(stmt)
+
+
+def resolve_location(db: Session, lat: float, lon: float):
+    """
+    {"state", "district", "source"} without any network call: the offline boundaries first,
+    then the cache of earlier Nominatim answers. None means only Nominatim can answer.
+    """
+    found = resolve_offline(lat, lon)
+    if found:
+        geocode_stats["offline"] += 1
+        return {**found, "source": "offline"}
+
+    cached = load_cached_location(db, geocode_cell(lat, lon)[0])
+    if cached:
+        geocode_stats["cache"] += 1
+        return {"state": cached.state, "district": cached.district, "source": "cache"}
+    return None
+
+
+# --- RATE-LIMITED NOMINATIM QUEUE ---
+_queue = None
+_loop = None
+_pending = {}  # cell -> user ids waiting for its answer
+_pending_lock = threading.Lock()
+
+
+def enqueue_geocode(user_id: int, lat: float, lon: float) -> bool:
+    """
+    Queues a cache miss for the background worker (safe to call from threadpool endpoints).
+    Users in a cell that is already queued just join it. False if the worker isn't running or the queue is full.
+    """
+    cell, centre_lat, centre_lon = geocode_cell(lat, lon)
+    with _pending_lock:
+        if cell in _pending:
+            _pending[cell].add(user_id)
+            return True
+        if not GEOCODE_NOMINATIM_ENABLED or _loop is None or len(_pending) >= GEOCODE_QUEUE_MAX:
+            geocode_stats["dropped"] += 1
+            return False
+        _pending[cell] = {user_id}
+        # Read under the lock: the worker clears _loop (under it too) when it stops
+        loop, queue = _loop, _queue
+
+    try:
+        loop.call_soon_threadsafe(queue.put_nowait, (cell, centre_lat, centre_lon))
+    except RuntimeError:
+        # The loop closed between the check and the wake-up: the job can't run, forget it
+        with _pending_lock:
+            _pending.pop(cell, None)
+        geocode_stats["dropped"] += 1
+        return False
+    geocode_stats["queued"] += 1
+    return True
+
+
+def apply_location(user: User, details: dict):
+    # Only overwrite state/district if the geocoding successfully found them
+    if details["state"]:
+        user.state = details["state"]
+    if details["district"]:
+        user.district = details["district"]
+
+
+def resolve_queued_cell(cell: str, centre_lat: float, centre_lon: float):
+    details = get_location_details(centre_lat, centre_lon)
+    with _pending_lock:
+        user_ids = _pending.pop(cell, set())
+
+    if not details["state"] and not details["district"]:
+        geocode_stats["failed"] += 1
+        return
+    geocode_stats["nominatim"] += 1
+
+    db = SessionLocal()
+    try:
+        store_cached_location(db, cell, details["state"], details["district"], "nominatim")
+        users = db.query(User).filter(User.id.in_(user_ids)).all() if user_ids else []
+        for user in users:
+            # Skip users who have moved on since they were queued
+            if user.latitude is not None and geocode_cell(user.latitude, user.longitude)[0] == cell:
+                apply_location(user, details)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Geocode Cache Error: {e}")
+    finally:
+        db.close()
+
+
+async def run_geocode_worker():
+    """Background loop started from the app lifespan: opens the district index, then drains the queue at Nominatim's pace."""
+    global _queue, _loop
+    with _pending_lock:
+        _queue = asyncio.Queue()
+        _loop = asyncio.get_running_loop()
+    try:
+        await asyncio.to_thread(load_district_index)
+        while True:
+            cell, centre_lat, centre_lon = await _queue.get()
+            try:
+                await asyncio.to_thread(resolve_queued_cell, cell, centre_lat, centre_lon)
+            except Exception as e:
+                print(f"Geocode worker failed on {cell}: {repr(e)}")
+            await asyncio.sleep(NOMINATIM_MIN_INTERVAL_SECONDS)
+    finally:
+        with _pending_lock:
+            _loop = None
+            _pending.clear()
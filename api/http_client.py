@@ -0,0 +1,166 @@
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# --- PER-HOST POLICIES ---
+# Every outbound integration goes through the two shared clients below, so repeated
+# calls to the same host reuse warm keep-alive connections instead of a new TLS handshake.
+@dataclass(frozen=True)
+class HostPolicy:
+    max_concurrency: int      # Requests in flight to this host at once (pool size too)
+    timeout: float            # Total seconds per request unless the caller passes one
+    retries: int = 2          # Retries on connection errors and 502/503/504 (not on 429, callers pace those)
+
+
+DEFAULT_POLICY = HostPolicy(max_concurrency=10, timeout=15)
+
+HOST_POLICIES = {
+    # Mandi prices: slow, large pages; parallel date/page probes are capped here across all users
+    "api.data.gov.in": HostPolicy(max_concurrency=8, timeout=45),
+    "api.openweathermap.org": HostPolicy(max_concurrency=10, timeout=10),
+    # Nominatim usage policy: at most one request at a time
+    "nominatim.openstreetmap.org": HostPolicy(max_concurrency=1, timeout=10, retries=1),
+    "api.myscheme.gov.in": HostPolicy(max_concurrency=2, timeout=30),
+}
+
+RETRY_STATUSES = (502, 503, 504)
+RETRY_BACKOFF_SECONDS = 0.5
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).hostname or ""
+
+
+def policy_for(url: str) -> HostPolicy:
+    return HOST_POLICIES.get(host_of(url), DEFAULT_POLICY)
+
+
+# --- SYNC CLIENT (threadpool endpoints, sync scripts) ---
+_sync_session = None
+_sync_lock = threading.Lock()
+_sync_slots = {}
+
+
+def build_sync_session() -> requests.Session:
+    session = requests.Session()
+    for host, policy in HOST_POLICIES.items():
+        retry = Retry(
+            total=policy.retries,
+            backoff_factor=RETRY_BACKOFF_SECONDS,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=["GET", "HEAD"],
+            raise_on_status=False,
+        )
+        session.mount(f"https://{host}", HTTPAdapter(pool_connections=1, pool_maxsize=policy.max_concurrency, max_retries=retry))
+
+    default_retry = Retry(total=DEFAULT_POLICY.retries, backoff_factor=RETRY_BACKOFF_SECONDS, status_forcelist=RETRY_STATUSES, allowed_methods=["GET", "HEAD"], raise_on_status=False)
+    session.mount("https://", HTTPAdapter(pool_maxsize=DEFAULT_POLICY.max_concurrency, max_retries=default_retry))
+    session.mount("http://", HTTPAdapter(pool_maxsize=DEFAULT_POLICY.max_concurrency, max_retries=default_retry))
+    return session
+
+
+def get_sync_session() -> requests.Session:
+    """Shared requests.Session (created on first use, so standalone scripts need no setup)."""
+    global _sync_session
+    if _sync_session is None:
+        with _sync_lock:
+            if _sync_session is None:
+                _sync_session = build_sync_session()
+    return _sync_session
+
+
+def sync_slot(url: str) -> threading.BoundedSemaphore:
+    host = host_of(url)
+    with _sync_lock:
+        if host not in _sync_slots:
+            _sync_slots[host] = threading.BoundedSemaphore(policy_for(url).max_concurrency)
+        return _sync_slots[host]
+
+
+def http_get(url: str, timeout: float = None, **kwargs) -> requests.Response:
+    """GET through the shared session, with the host's timeout, retries and concurrency limit."""
+    with sync_slot(url):
+        return get_sync_session().get(url, timeout=timeout or policy_for(url).timeout, **kwargs)
+
+
+# --- ASYNC CLIENT (event-loop code) ---
+_async_session = None
+_async_slots = {}
+
+
+def get_async_session() -> aiohttp.ClientSession:
+    """Shared aiohttp session. Opened by startup(); created lazily if used outside the app."""
+    global _async_session
+    if _async_session is None or _async_session.closed:
+        _async_session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=DEFAULT_POLICY.timeout),
+            connector=aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=max(p.max_concurrency for p in HOST_POLICIES.values()),
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+            )
+        )
+        _async_slots.clear()
+    return _async_session
+
+
+@asynccontextmanager
+async def async_slot(url: str):
+    """Holds one of the host's concurrency slots for the duration of a request."""
+    host = host_of(url)
+    if host not in _async_slots:
+        _async_slots[host] = asyncio.Semaphore(policy_for(url).max_concurrency)
+    async with _async_slots[host]:
+        yield
+
+
+def async_timeout(url: str, total: float = None) -> aiohttp.ClientTimeout:
+    return aiohttp.ClientTimeout(total=total or policy_for(url).timeout)
+
+
+async def async_get(url: str, session: aiohttp.ClientSession = None, timeout: aiohttp.ClientTimeout = None, **kwargs) -> aiohttp.ClientResponse:
+    """
+    GET through the shared aiohttp session with the host's slot, timeout and retries, the async
+    twin of http_get. The body is read before the slot is released, so response.json() / text()
+    work afterwards. Timeouts are not retried: callers budget those themselves.
+    """
+    session = session or get_async_session()
+    retries = policy_for(url).retries
+    for attempt in range(retries + 1):
+        try:
+            async with async_slot(url), session.get(url, timeout=timeout or async_timeout(url), **kwargs) as response:
+                await response.read()
+        except aiohttp.ClientConnectionError as e:
+            if isinstance(e, asyncio.TimeoutError) or attempt == retries:
+                raise
+        else:
+            if response.status not in RETRY_STATUSES or attempt == retries:
+                return response
+
+        # Same backoff as the sync client's Retry, slept without holding the host slot
+        await asyncio.sleep(RETRY_BACKOFF_SECONDS * (2 ** attempt))
+
+
+# --- LIFECYCLE (called from the FastAPI lifespan) ---
+async def startup():
+    get_sync_session()
+    get_async_session()
+
+
+async def shutdown():
+    global _sync_session, _async_session
+    if _async_session is not None and not _async_session.closed:
+        await _async_session.close()
+    _async_session = None
+
+    if _sync_session is not None:
+        _sync_session.close()
+    _sync_session = None
@@ -1,83 +1,64 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Form, Response,BackgroundTasks, Query
 from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 from sqlalchemy.orm import Session
+from sqlalchemy import or_, and_, func
 from datetime import timedelta,date,datetime
 import random
 import os
-import threading
+import asyncio
 from dotenv import load_dotenv
 import re
-import requests
 import json
-from api.tts_service import generate_audio_bytes,stream_audio_generator
+
+# Before the api imports: several modules read their settings from the environment at import time
+load_dotenv()
+
+from api.tts_service import generate_audio_bytes,stream_audio_generator,get_audio_key
+from api.audio_store import get_audio_store
+from api.weather_prefetch import run_weather_prefetch, prefetch_stats, WEATHER_PREFETCH_ENABLED
+from api.geocoding import resolve_location, apply_location, enqueue_geocode, run_geocode_worker, geocode_stats
+from api.weather_service import fetch_forecast, get_cell_forecast, get_fresh_forecast, format_forecast_for_ai, format_today_for_prompt
 
 # Google GenAI Imports
-from google import genai
 from google.genai import types
 from google.genai.types import HarmCategory, HarmBlockThreshold
 
 # Local Imports
 from db import models
 from db.database import engine, get_db,SessionLocal
-from db.models import User, OTP, ChatSession, ChatMessage, get_ist_time, WeatherCache
-from api import schemas
-from api.bazarbhav import get_market_data, get_baazar_bhav_for_ai
+from db.models import User, OTP, ChatSession, ChatMessage, get_ist_time
+from api import schemas, http_client
+from api.bazarbhav import get_market_data, stream_market_rows, search_market_prices, summarize_market_prices, get_baazar_bhav_for_ai, market_cache, get_price_trend, get_price_trend_for_ai
+from api.gemini_client import key_pool
+from api.chat_context import load_history_window, build_history_contents, format_summary_context, refresh_session_summary
 
 # Create DB Tables
 models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Farmer Chatbot API")
-
-load_dotenv()
-
-# --- API KEY ROTATION MANAGER ---
-api_keys = []
-for i in range(1, 9):
-    key = os.getenv(f"GEMINI_API_KEY_{i}")
-    if key:
-        api_keys.append(key)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP client layer for every outbound integration
+    await http_client.startup()
 
-# Fallback just in case
-if not api_keys and os.getenv("GEMINI_API_KEY"):
-    api_keys.append(os.getenv("GEMINI_API_KEY"))
+    # Title jobs that were pending when the last process stopped will never finish
+    await run_in_threadpool(reset_pending_title_jobs)
 
-if not api_keys:
-    print("WARNING: No Gemini API keys found in environment variables!")
+    # Keep active users' weather cells warm so requests rarely wait on OpenWeatherMap
+    prefetch_task = asyncio.create_task(run_weather_prefetch()) if WEATHER_PREFETCH_ENABLED else None
+    # Opens the offline district index, then resolves location cache misses via Nominatim
+    geocode_task = asyncio.create_task(run_geocode_worker())
 
-current_key_index = 0
-key_lock = threading.Lock()
+    yield
 
-def get_current_client():
-    """Returns a client initialized with the currently active key."""
-    return genai.Client(api_key=api_keys[current_key_index])
+    background_tasks = [task for task in (prefetch_task, geocode_task) if task]
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await http_client.shutdown()
 
-def generate_content_with_retry(model: str, contents: list, config: types.GenerateContentConfig):
-    global current_key_index
-    max_retries = len(api_keys)
-
-    for attempt in range(max_retries):
-        client = get_current_client()
-        try:
-            response = client.models.generate_content(
-                model=model,
-                contents=contents,
-                config=config
-            )
-            return response
-            
-        except Exception as e:
-            error_msg = str(e).lower()
-            if "429" in error_msg or "quota" in error_msg or "exhausted" in error_msg or "resource_exhausted" in error_msg:
-                with key_lock:
-                    new_index = (current_key_index + 1) % len(api_keys)
-                    if new_index != current_key_index: # Only print if it actually changed
-                        current_key_index = new_index
-                        print(f"⚠️ Key limit reached. Switching to GEMINI_API_KEY_{current_key_index + 1}...")
-            else:
-                raise e
-                
-    # If we loop through all 8 keys and they all fail
-    raise Exception("All Gemini API keys have exhausted their limits.")
+app = FastAPI(title="Farmer Chatbot API", lifespan=lifespan)
 
 # --- 1. Send OTP Endpoint (No Code in Response) ---
 @app.post("/auth/send-otp")
@@ -226,25 +207,47 @@ def get_user_sessions(user_id: int, db: Session = Depends(get_db)):
     sessions = db.query(ChatSession).filter(ChatSession.user_id == user_id).order_by(ChatSession.created_at.desc()).all()
     return sessions
 
+# --- HELPER: AUDIO DB STEPS (always run in the threadpool) ---
+def link_message_audio(message_id: int, key: str):
+    """Points the message at its clip in the audio store. Uses its own session."""
+    db = SessionLocal()
+    try:
+        db.query(ChatMessage).filter(ChatMessage.id == message_id).update({"audio_key": key}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def load_audio_message(message_id: int):
+    db = SessionLocal()
+    try:
+        # Only the columns we need, the legacy blob is fetched separately if at all
+        return db.query(ChatMessage.id, ChatMessage.content, ChatMessage.audio_key, ChatMessage.has_audio).filter(
+            ChatMessage.id == message_id
+        ).first()
+    finally:
+        db.close()
+
+def load_legacy_audio(message_id: int):
+    db = SessionLocal()
+    try:
+        return db.query(ChatMessage.audio_data).filter(ChatMessage.id == message_id).scalar()
+    finally:
+        db.close()
+
 # --- BACKGROUND TASK ---
 async def process_tts_background(message_id: int, text: str):
-    """Runs in the background to generate and save audio to the DB."""
-    # We must open a NEW database session for background tasks
-    db = SessionLocal() 
+    """Runs in the background to generate audio into the audio store and link it to the message."""
     try:
-        # Generate the audio bytes
-        audio_bytes = await generate_audio_bytes(text)
+        # Served from the TTS cache when this exact answer was spoken before;
+        # a fresh synthesis is written to the audio store by the cache itself
+        key = get_audio_key(text)
+        await generate_audio_bytes(text)
         
-        # Save to database
-        message = db.query(ChatMessage).filter(ChatMessage.id == message_id).first()
-        if message:
-            message.audio_data = audio_bytes
-            db.commit()
-            print(f"Successfully saved audio for message {message_id}")
+        # Save the reference to the database (off the event loop)
+        await run_in_threadpool(link_message_audio, message_id, key)
+        print(f"Successfully saved audio for message {message_id}")
     except Exception as e:
         print(f"Background TTS Error: {e}")
-    finally:
-        db.close()
 
 
 # --- HELPER: SYSTEM INSTRUCTIONS ---
@@ -258,24 +261,11 @@ def build_system_instruction(user, db, is_voice_mode: bool = False, language: st
             f"(District: {user.district}, State: {user.state})"
         )
 
-        # --- SILENTLY INJECT TODAY'S WEATHER IF CACHED ---
-        three_hours_ago = datetime.utcnow() - timedelta(hours=3)
+        # --- SILENTLY INJECT TODAY'S WEATHER IF CACHED (shared per grid cell) ---
+        cached_daily = get_fresh_forecast(db, user.latitude, user.longitude)
 
-        cached_weather = db.query(WeatherCache).filter(
-            WeatherCache.user_id == user.id,
-            WeatherCache.fetched_at >= three_hours_ago
-        ).first()
-
-        if cached_weather:
-            forecast = json.loads(cached_weather.forecast_data)
-            today_weather = forecast[0]
-
-            weather_context = (
-                f"TODAY'S WEATHER: {today_weather['condition']}, "
-                f"Max Temp: {today_weather['temp_max']}°C, "
-                f"Min Temp: {today_weather['temp_min']}°C, "
-                f"Rainfall Expected: {today_weather['rain_mm']}mm."
-            )
+        if cached_daily:
+            weather_context = format_today_for_prompt(cached_daily)
         else:
             weather_context = (
                 "Weather: Not cached right now. "
@@ -325,90 +315,249 @@ FARMER PROFILE:
 
 SCOPE OF CAPABILITIES:
 1. **General Farming Advice:** You are a fully qualified agronomist. You MUST answer general questions about farming, crop diseases (e.g., tomato blight, pests), soil preparation, and cultivation techniques using your own extensive knowledge.
-2. **When to use Tools:** ONLY use the `get_weather_forecast` or `get_baazar_bhav` tools if the user explicitly asks for weather updates or current market prices. For everything else, answer directly without a tool.
+2. **When to use Tools:** ONLY use the `get_weather_forecast`, `get_baazar_bhav` or `get_price_trend` tools if the user explicitly asks for weather updates, current market prices, or whether a price is going up or down. For everything else, answer directly without a tool.
 
 CORE BEHAVIOR:
 {behavior_rules}
 4. **Pesticides/Fertilizers:** If the user asks about a disease or pest, provide the Chemical Name + common Brand and Dosage (per 15L pump).
 
 MARKET PRICE TOOL RULES:
-Always extract the crop/commodity from the user's message before calling the Baazar Bhav tool.
-
-CRITICAL CROP NAME TRANSLATIONS:
-You MUST map the farmer's spoken Hindi/Marathi/English word to these EXACT official government names:
-* Pyaaz / Kanda / Onion -> "Onion"
-* Aloo / Batata / Potato -> "Potato"
-* Tamatar / Tomato -> "Tomato"
-* Gajar / Gaajar / Carrot -> "Carrot"
-* Baingan / Vangi / Brinjal -> "Brinjal"
-* Bhindi / Bhendi / Okra -> "Bhindi(Ladies Finger)"
-* Patta Gobi / Kobi / Cabbage -> "Cabbage"
-* Phool Gobi / Flower / Cauliflower -> "Cauliflower"
-* Lehsun / Lasun / Garlic -> "Garlic"
-* Adrak / Ale / Ginger -> "Ginger"
-* Hari Mirch / Hirvi Mirchi -> "Green Chilli"
-* Karela / Karle -> "Bitter Gourd"
-* Lauki / Dudhi -> "Bottle Gourd"
-* Kaddu / Lal Bhopla -> "Pumpkin"
-* Palak / Spinach -> "Spinach"
-* Kapas / Kapus / Cotton -> "Kapas"
-* Gehun / Gahu / Wheat -> "Wheat"
-* Soyabean -> "Soyabean"
-* Chana / Harbara / Chickpeas -> "Bengal Gram(Gram)(Whole)"
-* Toor / Tur / Arhar -> "Arhar (Tur/Red Gram)(Whole)"
-* Sarson / Mohri / Mustard -> "Mustard"
-* Dhan / Bhaat / Paddy -> "Paddy(Dhan)(Common)"
-* Bajra / Bajri / Pearl Millet -> "Bajra(Pearl Millet/Cumbu)"
-* Jowar / Sorghum -> "Jowar(Sorghum)"
+Always extract the crop/commodity from the user's message before calling the Baazar Bhav or price trend tool.
+Use `get_price_trend` (not `get_baazar_bhav`) when the farmer asks if a price is rising, falling, or whether to sell now or wait.
+Pass the crop name the way the farmer said it (any language or spelling), the server maps it to the official market name.
 """
 
-# --- 9. Send Message & Get Response ---
-@app.post("/chat/{session_id}/message", response_model=schemas.MessageResponse)
-def chat_with_gemini(
-        session_id: int,
-        request: schemas.MessageCreateSchema,
-        user_id: int,
-        background_tasks: BackgroundTasks,
-        db: Session = Depends(get_db)
-):
+# --- HELPER: TOOL EXECUTION ---
+async def execute_tool_call(function_call, user, db: Session) -> str:
+    """Runs a Gemini function call without blocking the event loop and returns the result text."""
+    args = function_call.args or {}
+
+    if function_call.name == "get_weather_forecast":
+        # We don't actually need args.lat/lon because we use the user's DB location
+        if user.latitude and user.longitude:
+            forecast_json = await run_in_threadpool(get_cached_weather, user.latitude, user.longitude, db)
+
+            if forecast_json:
+                # Convert JSON into a string for Gemini
+                weather_result = format_forecast_for_ai(forecast_json)
+            else:
+                weather_result = "Failed to fetch weather data."
+        else:
+            weather_result = "Cannot check weather: GPS coordinates are missing from profile."
+
+        print(f"--- SENDING WEATHER TO GEMINI: {weather_result} ---")
+        return weather_result
+
+    if function_call.name == "get_baazar_bhav":
+        state = args.get("state") or user.state
+        district = args.get("district") or user.district # Optional now
+        commodity = args.get("commodity")
+
+        if state and commodity:
+            bhav_result = await get_baazar_bhav_for_ai(state=state, commodity=commodity, district=district)
+        else:
+            bhav_result = "Cannot check prices. Please ensure GPS location is saved and you mentioned a specific crop."
+
+        print(f"--- SENDING THIS DB RESULT TO GEMINI: {bhav_result} ---")
+        return bhav_result
+
+    if function_call.name == "get_price_trend":
+        state = args.get("state") or user.state
+        district = args.get("district") or user.district
+        commodity = args.get("commodity")
+        period = args.get("period") if args.get("period") in ("day", "week", "month") else "week"
+
+        if state and commodity:
+            trend_result = await get_price_trend_for_ai(state=state, district=district, commodity=commodity, period=period)
+        else:
+            trend_result = "Cannot check the price trend. Please ensure GPS location is saved and you mentioned a specific crop."
+
+        print(f"--- SENDING THIS TREND TO GEMINI: {trend_result} ---")
+        return trend_result
+
+    return f"Unknown tool: {function_call.name}"
+
+# --- HELPER: CHAT DB STEPS (run in the threadpool, they are quick) ---
+def prepare_chat_turn(db: Session, session_id: int, user_id: int, request: schemas.MessageCreateSchema):
+    """Validates the session, saves the user message and builds the Gemini history + system prompt."""
     # 1. Validate Session
     session = db.query(ChatSession).filter(ChatSession.id == session_id, ChatSession.user_id == user_id).first()
     if not session: raise HTTPException(status_code=404, detail="Session not found")
-    
+
     # 2. Save User Message
     user_msg = ChatMessage(session_id=session.id, role="user", content=request.content)
     db.add(user_msg)
     db.commit()
-    
 
-    history_objs = db.query(ChatMessage).filter(ChatMessage.session_id == session.id).order_by(ChatMessage.created_at.asc()).all()
-    
-    chat_history = []
-    for msg in history_objs:
-        chat_history.append(types.Content(
-            role=msg.role,
-            parts=[types.Part.from_text(text=msg.content)]
-        ))
+    # Only the newest turns go verbatim, older ones live in the rolling summary
+    window, fold_before_id = load_history_window(db, session)
+    chat_history = build_history_contents(window)
 
     user = session.user
     system_instruction = build_system_instruction(
-        user=user, 
-        db=db, 
-        is_voice_mode=request.is_voice_mode, 
+        user=user,
+        db=db,
+        is_voice_mode=request.is_voice_mode,
         language=request.language
-    )
+    ) + format_summary_context(session.summary)
+
+    summary_job = (session.id, fold_before_id) if fold_before_id else None
+
+    # Hand the connection back to the pool while we wait on Gemini (loaded objects stay readable)
+    db.close()
+
+    return session, user, chat_history, system_instruction, summary_job
+
+def save_model_message(db: Session, session_id: int, ai_text: str) -> schemas.MessageResponse:
+    ai_msg = ChatMessage(session_id=session_id, role="model", content=ai_text)
+    db.add(ai_msg)
+    db.commit()
+    db.refresh(ai_msg)
+    # Serialize here so later commits can't trigger lazy reloads on the event loop
+    saved = schemas.MessageResponse.model_validate(ai_msg)
+    db.close()
+    return saved
+
+DEFAULT_TITLES = ["New Consultation", "New Chat", "string"]
+# A pending title job older than this lost its worker (crash, restart) and may be claimed again
+TITLE_CLAIM_TIMEOUT_SECONDS = int(os.getenv("TITLE_CLAIM_TIMEOUT_SECONDS", 120))
+
+def claim_title_job(db: Session, session_id: int) -> bool:
+    """Marks the session title as pending if it still has a default title. Only one caller wins."""
+    now = get_ist_time()
+    claimed = db.query(ChatSession).filter(
+        ChatSession.id == session_id,
+        or_(ChatSession.title.is_(None), func.trim(ChatSession.title) == "", ChatSession.title.in_(DEFAULT_TITLES)),
+        or_(
+            ChatSession.title_status.is_(None),
+            ChatSession.title_status == "failed",
+            and_(
+                ChatSession.title_status == "pending",
+                or_(ChatSession.title_claimed_at.is_(None), ChatSession.title_claimed_at < now - timedelta(seconds=TITLE_CLAIM_TIMEOUT_SECONDS))
+            )
+        )
+    ).update({"title_status": "pending", "title_claimed_at": now}, synchronize_session=False)
+    db.commit()
+    db.close()
+    return claimed > 0
+
+def reset_pending_title_jobs():
+    """Startup: title jobs left pending by a stopped process go back to failed, so the next message retries them."""
+    db = SessionLocal()
+    try:
+        reset = db.query(ChatSession).filter(ChatSession.title_status == "pending").update(
+            {"title_status": "failed"}, synchronize_session=False
+        )
+        db.commit()
+        if reset:
+            print(f"Reset {reset} title job(s) left pending by the last run.")
+    finally:
+        db.close()
+
+# --- HELPER: TITLE GENERATION ---
+async def generate_session_title(content: str) -> str:
+    """Asks the lite model for a short session title and returns it cleaned up ("" on empty output)."""
+    title_prompt = f"""
+    Summarize this into a 3-5 word title. 
+    RULES:
+    1. Do NOT use numbering (e.g., no "1.", no "-").
+    2. Do NOT use quotes.
+    3. Just output the raw words.
     
-    generate_config = types.GenerateContentConfig(
+    Query: {content}
+    """
+
+    title_response = await key_pool.generate_content(
+        model="gemini-2.5-flash-lite",
+        contents=[title_prompt], 
+        config=types.GenerateContentConfig(max_output_tokens=20)
+    )
+
+    new_title = ""
+    if title_response.text:
+        new_title = title_response.text.strip()
+    elif title_response.candidates and title_response.candidates[0].content.parts:
+        new_title = title_response.candidates[0].content.parts[0].text.strip()
+
+    if new_title:
+        # REGEX CLEANUP: Removes "1.", "1)", "- ", "* " from the start
+        new_title = re.sub(r'^[\d\.\-\*\s]+', '', new_title)
+
+        # Remove quotes
+        new_title = new_title.replace('"', '').replace("'", "").strip()
+
+    return new_title
+
+TITLE_MAX_ATTEMPTS = 3
+TITLE_PUSH_WAIT_SECONDS = 10
+
+# Strong refs for title jobs started with create_task (the loop only keeps weak ones)
+_title_jobs = set()
+
+async def process_title_background(session_id: int, content: str):
+    """Generates the session title off the request path, retrying with backoff, and records the outcome."""
+    new_title = ""
+    for attempt in range(TITLE_MAX_ATTEMPTS):
+        try:
+            new_title = await generate_session_title(content)
+            break
+        except Exception as title_error:
+            print(f"Title generation attempt {attempt + 1} failed ({title_error}).")
+            if attempt + 1 < TITLE_MAX_ATTEMPTS:
+                await asyncio.sleep(2 ** attempt + random.random())
+
+    def save_title():
+        db = SessionLocal()
+        try:
+            session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+            if not session:
+                return
+            if new_title:
+                session.title = new_title
+                session.title_status = "ready"
+                print(f"Auto-updated session title to: {new_title}")
+            else:
+                session.title_status = "failed"
+                print("Title generation failed. Keeping default title.")
+            db.commit()
+        finally:
+            db.close()
+
+    await run_in_threadpool(save_title)
+    return new_title
+
+def build_chat_config(system_instruction: str, allow_tools: bool = True) -> types.GenerateContentConfig:
+    # allow_tools=False keeps the tools declared (the history has their calls) but forces a text answer
+    return types.GenerateContentConfig(
         system_instruction=system_instruction,
         temperature=0.7,
         max_output_tokens=1500,
-        tools=[weather_tool, bhav_tool], 
+        tools=[weather_tool, bhav_tool, trend_tool], 
+        tool_config=None if allow_tools else types.ToolConfig(
+            function_calling_config=types.FunctionCallingConfig(mode="NONE")
+        ),
         automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True) 
     )
 
+# --- 9. Send Message & Get Response ---
+@app.post("/chat/{session_id}/message", response_model=schemas.MessageResponse)
+async def chat_with_gemini(
+        session_id: int,
+        request: schemas.MessageCreateSchema,
+        user_id: int,
+        background_tasks: BackgroundTasks,
+        db: Session = Depends(get_db)
+):
+    # DB work is short and runs in the threadpool; the slow Gemini calls are awaited on the event loop
+    session, user, chat_history, system_instruction, summary_job = await run_in_threadpool(
+        prepare_chat_turn, db, session_id, user_id, request
+    )
+    
+    generate_config = build_chat_config(system_instruction)
+
     try:
         model = "gemini-2.5-flash" 
-        response = generate_content_with_retry(
+        response = await key_pool.generate_content(
             model=model,
             contents=chat_history,
             config=generate_config
@@ -418,72 +567,25 @@ def chat_with_gemini(
         
         if response.function_calls:
             function_call = response.function_calls[0]
-            args = function_call.args 
-            
-            if function_call.name == "get_weather_forecast":
-                # We don't actually need args.lat/lon because we use the user's DB location
-                if user.latitude and user.longitude:
-                    forecast_json = get_cached_weather(user.id, user.latitude, user.longitude, db)
-                    
-                    if forecast_json:
-                        # Convert JSON into a string for Gemini
-                        weather_result = "5-Day Forecast:\n"
-                        for day in forecast_json:
-                            weather_result += f"- {day['date']}: {day['condition']}, High {day['temp_max']}°C, Low {day['temp_min']}°C, Rain: {day['rain_mm']}mm\n"
-                    else:
-                        weather_result = "Failed to fetch weather data."
-                else:
-                    weather_result = "Cannot check weather: GPS coordinates are missing from profile."
-                
-                print(f"--- SENDING WEATHER TO GEMINI: {weather_result} ---")
-                # ... append to history and generate response as usual ...
-                
-                chat_history.append(response.candidates[0].content)
-
-                chat_history.append(types.Content(
-                    role="user",
-                    parts=[types.Part.from_function_response(
-                        name="get_weather_forecast",
-                        response={"result": weather_result}
-                    )]
-                ))
+            tool_result = await execute_tool_call(function_call, user, db)
 
-                final_response = generate_content_with_retry(
-                    model=model,
-                    contents=chat_history,
-                    config=generate_config
-                )
-                ai_text = final_response.text
-
-            elif function_call.name == "get_baazar_bhav": 
-                state = args.get("state") or user.state
-                district = args.get("district") or user.district # Optional now
-                commodity = args.get("commodity")
-                
-                if state and commodity:
-                    # PASS THE DB SESSION HERE
-                    bhav_result = get_baazar_bhav_for_ai(state=state, commodity=commodity, district=district)
-                else:
-                    bhav_result = "Cannot check prices. Please ensure GPS location is saved and you mentioned a specific crop."
-
-                print(f"--- SENDING THIS DB RESULT TO GEMINI: {bhav_result} ---")
-
-                chat_history.append(response.candidates[0].content)
-
-                chat_history.append(types.Content(
-                    role="user",
-                    parts=[types.Part.from_function_response(
-                        name="get_baazar_bhav",
-                        response={"result": bhav_result}
-                    )]
-                ))
+            chat_history.append(response.candidates[0].content)
+
+            chat_history.append(types.Content(
+                role="user",
+                parts=[types.Part.from_function_response(
+                    name=function_call.name,
+                    response={"result": tool_result}
+                )]
+            ))
 
-                final_response = generate_content_with_retry(
-                    model=model,
-                    contents=chat_history,
-                    config=generate_config
-                )
-                ai_text = final_response.text
+            # Tools off for the answer, so the tool result always gets a text reply
+            final_response = await key_pool.generate_content(
+                model=model,
+                contents=chat_history,
+                config=build_chat_config(system_instruction, allow_tools=False)
+            )
+            ai_text = final_response.text
 
         else:
             ai_text = response.text
@@ -496,87 +598,174 @@ def chat_with_gemini(
         ai_text = "I received the data but couldn't generate a response."
 
     # 6. Save AI Response
-    ai_msg = ChatMessage(session_id=session.id, role="model", content=ai_text)
-    db.add(ai_msg)
-    db.commit()
-    db.refresh(ai_msg) 
+    ai_msg = await run_in_threadpool(save_model_message, db, session_id, ai_text)
+
+    # --- TITLE LOGIC (deferred, poll /chat/sessions/{session_id}/title) ---
+    if await run_in_threadpool(claim_title_job, db, session_id):
+        background_tasks.add_task(process_title_background, session_id, request.content)
 
     if request.is_voice_mode: # Optional: Only generate if they are in voice mode
         background_tasks.add_task(process_tts_background, ai_msg.id, ai_text)
 
-    # --- TITLE LOGIC ---
-    current_title = session.title
-    defaults = ["New Consultation", "New Chat", "string"]
+    if summary_job:
+        background_tasks.add_task(refresh_session_summary, *summary_job)
 
-    if not current_title or current_title.strip() == "" or current_title in defaults:
-        try:
-            title_prompt = f"""
-            Summarize this into a 3-5 word title. 
-            RULES:
-            1. Do NOT use numbering (e.g., no "1.", no "-").
-            2. Do NOT use quotes.
-            3. Just output the raw words.
-            
-            Query: {request.content}
-            """
+    return ai_msg
 
-            title_response = generate_content_with_retry(
-                model="gemini-2.5-flash-lite",
-                contents=[title_prompt], 
-                config=types.GenerateContentConfig(max_output_tokens=20)
-            )
+# --- 9b. Send Message & Stream Response (Server-Sent Events) ---
+MAX_TOOL_ROUNDS = 2
 
-            new_title = ""
-            if title_response.text:
-                new_title = title_response.text.strip()
-            elif title_response.candidates and title_response.candidates[0].content.parts:
-                new_title = title_response.candidates[0].content.parts[0].text.strip()
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-            if new_title:
-                # REGEX CLEANUP: Removes "1.", "1)", "- ", "* " from the start
-                new_title = re.sub(r'^[\d\.\-\*\s]+', '', new_title)
+@app.post("/chat/{session_id}/message/stream")
+async def chat_with_gemini_stream(
+        session_id: int,
+        request: schemas.MessageCreateSchema,
+        user_id: int,
+        background_tasks: BackgroundTasks,
+        db: Session = Depends(get_db)
+):
+    """
+    Same as /chat/{session_id}/message but streams the answer as SSE:
+    `delta` events carry text as it arrives, `tool` marks a weather/bhav lookup,
+    `done` carries the saved message (same shape as MessageResponse).
+    """
+    session, user, chat_history, system_instruction, summary_job = await run_in_threadpool(
+        prepare_chat_turn, db, session_id, user_id, request
+    )
+    generate_config = build_chat_config(system_instruction)
+    answer_config = build_chat_config(system_instruction, allow_tools=False)
 
-                # Remove quotes
-                new_title = new_title.replace('"', '').replace("'", "").strip()
+    async def event_stream():
+        # The request-scoped session may be gone before the stream ends, so use our own
+        stream_db = SessionLocal()
+        ai_text = ""
+        try:
+            model = "gemini-2.5-flash"
+            contents = list(chat_history)
+
+            # MAX_TOOL_ROUNDS tool rounds, then one round with tools off so the last result gets an answer
+            for tool_round in range(MAX_TOOL_ROUNDS + 1):
+                function_call = None
+                model_content = None
+                round_config = generate_config if tool_round < MAX_TOOL_ROUNDS else answer_config
+
+                async for chunk in key_pool.stream_content(model=model, contents=contents, config=round_config):
+                    if not chunk.candidates or not chunk.candidates[0].content or not chunk.candidates[0].content.parts:
+                        continue
+                    for part in chunk.candidates[0].content.parts:
+                        if part.function_call and not function_call:
+                            function_call = part.function_call
+                            model_content = chunk.candidates[0].content
+                        elif part.text:
+                            ai_text += part.text
+                            yield sse_event("delta", {"text": part.text})
+
+                if not function_call or tool_round == MAX_TOOL_ROUNDS:
+                    break
+
+                # Run the tool mid-stream and feed the result back for the next round
+                yield sse_event("tool", {"name": function_call.name})
+                tool_result = await execute_tool_call(function_call, user, stream_db)
+                contents.append(model_content)
+                contents.append(types.Content(
+                    role="user",
+                    parts=[types.Part.from_function_response(
+                        name=function_call.name,
+                        response={"result": tool_result}
+                    )]
+                ))
 
-                session.title = new_title
-                db.commit()
-                print(f"Auto-updated session title to: {new_title}")
+        except Exception as e:
+            print(f"Gemini Streaming Error: {e}")
+            if not ai_text:
+                ai_text = "Sorry, I am having trouble connecting to the network right now."
+                yield sse_event("delta", {"text": ai_text})
 
-        except Exception as title_error:
-            print(f"Title generation failed ({title_error}). Keeping default title.")
+        try:
+            if not ai_text:
+                ai_text = "I received the data but couldn't generate a response."
+                yield sse_event("delta", {"text": ai_text})
+
+            # Persist the full answer once the stream is complete
+            ai_msg = await run_in_threadpool(save_model_message, stream_db, session_id, ai_text)
+            yield sse_event("done", ai_msg.model_dump(mode="json"))
+
+            if request.is_voice_mode:
+                # Background tasks run after the stream is fully sent, so adding one here still works
+                background_tasks.add_task(process_tts_background, ai_msg.id, ai_text)
+
+            if summary_job:
+                background_tasks.add_task(refresh_session_summary, *summary_job)
+
+            # --- TITLE LOGIC (deferred job, pushed here if it finishes while the stream is open) ---
+            if await run_in_threadpool(claim_title_job, stream_db, session_id):
+                title_job = asyncio.create_task(process_title_background(session_id, request.content))
+                _title_jobs.add(title_job)
+                title_job.add_done_callback(_title_jobs.discard)
+                try:
+                    new_title = await asyncio.wait_for(asyncio.shield(title_job), timeout=TITLE_PUSH_WAIT_SECONDS)
+                    if new_title:
+                        yield sse_event("title", {"session_id": session_id, "title": new_title})
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-    return ai_msg
+# --- 9c. Poll Session Title ---
+@app.get("/chat/sessions/{session_id}/title", response_model=schemas.SessionTitleResponse)
+def get_session_title(session_id: int, user_id: int, db: Session = Depends(get_db)):
+    session = db.query(ChatSession).filter(ChatSession.id == session_id, ChatSession.user_id == user_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    return {"session_id": session.id, "title": session.title, "title_status": session.title_status}
 
 # --- 10. FETCH OR STREAM SAVED AUDIO ---
 @app.get("/chat/message/{message_id}/audio")
-async def get_message_audio(message_id: int, db: Session = Depends(get_db)):
+async def get_message_audio(message_id: int):
     """Retrieves stored MP3 or streams it instantly if missing."""
-    message = db.query(ChatMessage).filter(ChatMessage.id == message_id).first()
+    # Short-lived session in the threadpool: nothing blocks the event loop and no
+    # connection stays checked out while the audio streams
+    message = await run_in_threadpool(load_audio_message, message_id)
     
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
-        
-    # 1. FAST PATH: If audio already exists in DB, send the complete file
-    if message.audio_data:
-        return Response(content=message.audio_data, media_type="audio/mpeg")
 
-    # 2. STREAM PATH: Generate on-the-fly, stream to client, then save to DB
+    store = get_audio_store()
+
+    # 1. FAST PATH: Audio already in the store (supports Range/ETag for seeking and caching)
+    if message.audio_key and await run_in_threadpool(store.exists, message.audio_key):
+        return store.response(message.audio_key)
+
+    # Legacy rows whose MP3 still lives in the table
+    if message.has_audio and not message.audio_key:
+        audio_data = await run_in_threadpool(load_legacy_audio, message_id)
+        if audio_data:
+            return Response(content=audio_data, media_type="audio/mpeg")
+
+    content = message.content
+
+    # 2. STREAM PATH: Generate on-the-fly, stream to client, then save to the store
     async def audio_streamer():
-        audio_buffer = bytearray()
         try:
-            async for chunk in stream_audio_generator(message.content):
-                audio_buffer.extend(chunk)
+            # The TTS cache stores the finished clip, we only need to link it
+            async for chunk in stream_audio_generator(content):
                 yield chunk
-                
-           
-            message.audio_data = bytes(audio_buffer)
-            db.commit()
-            print(f"Stream complete & saved to DB for message {message_id}")
+
+            # The request session may already be closed here, link_message_audio opens its own
+            await run_in_threadpool(link_message_audio, message_id, get_audio_key(content))
+            print(f"Stream complete & saved to audio store for message {message_id}")
             
         except Exception as e:
             print(f"Streaming TTS Error: {e}")
-            db.rollback()
 
    
     return StreamingResponse(audio_streamer(), media_type="audio/mpeg")
@@ -589,7 +778,14 @@ def get_chat_history(session_id: int, user_id: int, db: Session = Depends(get_db
         raise HTTPException(status_code=404, detail="Session not found")
 
     
-    messages = db.query(ChatMessage).filter(ChatMessage.session_id == session_id).order_by(ChatMessage.created_at.asc()).all()
+    # has_audio is computed in SQL (audio_data IS NOT NULL), the MP3 blobs are never fetched
+    messages = db.query(
+        ChatMessage.id,
+        ChatMessage.role,
+        ChatMessage.content,
+        ChatMessage.created_at,
+        ChatMessage.has_audio
+    ).filter(ChatMessage.session_id == session_id).order_by(ChatMessage.created_at.asc()).all()
     return messages
 
 # --- 11. Delete Session along with messages ---
@@ -622,38 +818,6 @@ def delete_chat_session(
 
     return {"message": "Chat session and history deleted successfully"}
 
-# --- Helper to get State and district from Latitude and Longitude ---
-def get_location_details(lat: float, lon: float):
-    url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}&zoom=10"
-    
-    user_agent = os.getenv("NOMINATIM_USER_AGENT")
-    
-    #Fallback if forgot to add in env
-    if not user_agent:
-        user_agent = "KisanMitraApp/1.0 (fallback_email@example.com)"
-
-    headers = {
-        'User-Agent': user_agent 
-    }
-    
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            address = data.get('address', {})
-            
-            # Extract district and state
-            district = address.get('state_district', address.get('county', ''))
-            state = address.get('state', '')
-            
-            district = district.replace(' District', '').replace(' district', '').strip()
-            
-            return {"district": district, "state": state}
-    except Exception as e:
-        print(f"Geocoding error: {e}")
-        
-    return {"district": None, "state": None}
-
 # --- 13. Post User location (latitude and longitude) ---
 @app.post("/users/{user_id}/location")
 def update_user_location(
@@ -666,16 +830,16 @@ def update_user_location(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    loc_details = get_location_details(location_data.latitude, location_data.longitude)
-    
     user.latitude = location_data.latitude
     user.longitude = location_data.longitude
-    
-    # Only overwrite state/district if the geocoding successfully found them
-    if loc_details["state"]:
-        user.state = loc_details["state"]
-    if loc_details["district"]:
-        user.district = loc_details["district"]
+
+    # Offline boundaries or the geocode cache; true misses go to the rate-limited Nominatim queue
+    loc_details = resolve_location(db, location_data.latitude, location_data.longitude)
+    if loc_details:
+        apply_location(user, loc_details)
+        geocode_status = "resolved"
+    else:
+        geocode_status = "pending" if enqueue_geocode(user.id, location_data.latitude, location_data.longitude) else "unresolved"
         
     try:
         db.commit()
@@ -685,24 +849,30 @@ def update_user_location(
             "latitude": user.latitude,
             "longitude": user.longitude,
             "district": user.district,
-            "state": user.state
+            "state": user.state,
+            "geocode_status": geocode_status
         }
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail="Database update failed")
 
+# --- 13a. Geocoding Stats ---
+@app.get("/geocode/stats")
+def get_geocode_stats():
+    return geocode_stats
+
 # --- Baazar Bhav Tool for gemini ---
 bhav_tool = types.Tool(
     function_declarations=[
         types.FunctionDeclaration(
-            name="get_baazar_bhav_for_ai", 
+            name="get_baazar_bhav", 
             description="Get the current agricultural market price (Baazar Bhav/Mandi rates) for a specific crop/commodity.",
             parameters=types.Schema(
                 type=types.Type.OBJECT,
                 properties={
                     "state": types.Schema(type=types.Type.STRING, description="The Indian state"),
                     "district": types.Schema(type=types.Type.STRING, description="The Indian district"),
-                    "commodity": types.Schema(type=types.Type.STRING, description="The name of the crop or commodity (e.g., Cotton, Wheat, Onion)"),
+                    "commodity": types.Schema(type=types.Type.STRING, description="The crop or commodity as the farmer named it, in any language (e.g., Kanda, Gehun, Cotton)"),
                 },
                 required=["state", "district", "commodity"]
             )
@@ -710,6 +880,26 @@ bhav_tool = types.Tool(
     ]
 )
 
+# --- Price Trend Tool for gemini ---
+trend_tool = types.Tool(
+    function_declarations=[
+        types.FunctionDeclaration(
+            name="get_price_trend",
+            description="Get the recent price trend (up, down or stable, with averages and volatility) of a crop in the Indian mandis.",
+            parameters=types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    "state": types.Schema(type=types.Type.STRING, description="The Indian state"),
+                    "district": types.Schema(type=types.Type.STRING, description="The Indian district"),
+                    "commodity": types.Schema(type=types.Type.STRING, description="The crop or commodity as the farmer named it, in any language (e.g., Kanda, Gehun, Cotton)"),
+                    "period": types.Schema(type=types.Type.STRING, enum=["day", "week", "month"], description="Granularity of the trend, 'week' unless the farmer asks otherwise"),
+                },
+                required=["state", "commodity"]
+            )
+        )
+    ]
+)
+
 
 # --- 15. Get Market Data for User's State ---
 @app.get("/market/my-state/{user_id}")
@@ -734,9 +924,37 @@ async def get_user_state_bhavs(user_id: int, db: Session = Depends(get_db)):
 
 # --- 16. Search Market Data by State or District ---
 @app.get("/market/search")
-async def search_market(state: str, district: str | None = None):
+async def search_market(
+    state: str,
+    district: str | None = None,
+    commodity: str | None = None,
+    market: str | None = None,
+    min_price: float | None = Query(None, ge=0, description="Lowest modal price (₹/quintal)"),
+    max_price: float | None = Query(None, ge=0, description="Highest modal price (₹/quintal)"),
+    sort: str | None = Query(None, pattern="^(commodity|market|price_asc|price_desc)$"),
+    top_n: int | None = Query(None, ge=1, le=500, description="Return only the first N rows after sorting")
+):
+    # No query options: the full cached list, same as before
+    if not any(v is not None for v in (commodity, market, min_price, max_price, sort, top_n)):
+        data = await get_market_data(state, district)
+    else:
+        data = await search_market_prices(
+            state, district,
+            commodity=commodity, market=market, min_price=min_price, max_price=max_price,
+            sort=sort or "commodity", top_n=top_n
+        )
+
+    return {
+        "state": state,
+        "district": district,
+        "data": data
+    }
 
-    data = await get_market_data(state, district)
+# --- 16a. Market Price Summary per Commodity ---
+@app.get("/market/summary")
+async def market_summary(state: str, district: str | None = None, commodity: str | None = None):
+    """Min/average/max per commodity across the mandis of a state or district, with the cheapest and costliest mandi."""
+    data = await summarize_market_prices(state, district, commodity=commodity)
 
     return {
         "state": state,
@@ -744,6 +962,37 @@ async def search_market(state: str, district: str | None = None):
         "data": data
     }
 
+# --- 16b. Price Trend for a Crop ---
+@app.get("/market/trend")
+async def market_trend(
+    state: str,
+    commodity: str,
+    district: str | None = None,
+    market: str | None = None,
+    period: str = Query("week", pattern="^(day|week|month)$"),
+    points: int = Query(8, ge=1, le=60, description="Number of periods, newest last")
+):
+    """Average/min/max modal price and volatility per period, read from the precomputed rollups."""
+    return await get_price_trend(state, commodity, district, market, period, points)
+
+# --- 16c. Stream Market Data as NDJSON ---
+@app.get("/market/search/stream")
+async def stream_market_search(state: str, district: str | None = None):
+    """
+    One JSON object per line, sent page by page as the rows come in. Meant for big states
+    where the full list is slow to build and heavy to hold in one response.
+    """
+    async def ndjson():
+        async for rows in stream_market_rows(state, district):
+            yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+# --- 17. Market Cache Stats ---
+@app.get("/market/cache/stats")
+def get_market_cache_stats():
+    return market_cache.stats()
+
 # ---Helper Weather Tool ---
 weather_tool = types.Tool(
     function_declarations=[
@@ -764,129 +1013,15 @@ weather_tool = types.Tool(
 
 # --- Weather Forecast 5 days openweather ---
 def get_weather_forecast(lat: float, lon: float):
-    api_key = os.getenv("OPENWEATHERMAP_API_KEY")
-    if not api_key:
-        return "Error: Server API Key missing."
-        
-    url = f"https://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={api_key}&units=metric"
-    
-    try:
-        response = requests.get(url)
-        data = response.json()
-        
-        if response.status_code == 200:
-            daily_forecast = {}
-            
-            # Group the 3-hour chunks into daily highs/lows
-            for item in data['list']:
-                date_str = item['dt_txt'].split(' ')[0] 
-                
-                if date_str not in daily_forecast:
-                    daily_forecast[date_str] = {
-                        'temp_max': item['main']['temp_max'],
-                        'temp_min': item['main']['temp_min'],
-                        'desc': item['weather'][0]['description']
-                    }
-                else:
-                    if item['main']['temp_max'] > daily_forecast[date_str]['temp_max']:
-                        daily_forecast[date_str]['temp_max'] = item['main']['temp_max']
-                    if item['main']['temp_min'] < daily_forecast[date_str]['temp_min']:
-                        daily_forecast[date_str]['temp_min'] = item['main']['temp_min']
-            
-            # Format the data into a clean, readable string for Gemini
-            result_str = "5-Day Weather Forecast:\n"
-            for date, info in list(daily_forecast.items())[:5]:
-                # Convert YYYY-MM-DD to a more readable format if desired
-                result_str += f"- {date}: {info['desc'].title()}, High: {info['temp_max']}°C, Low: {info['temp_min']}°C.\n"
-                
-            return result_str
-        else:
-            return f"Weather data unavailable: {data.get('message', 'Unknown error')}"
-    except Exception as e:
-        return f"Connection error: {str(e)}"
+    series = fetch_forecast(lat, lon)
+    if series is None:
+        return "Weather data unavailable right now."
+    return format_forecast_for_ai(series.daily())
     
 
-def get_cached_weather(user_id: int, lat: float, lon: float, db: Session):
-    """Fetches weather from OWM, processes rain/conditions, and caches it for 3 hours."""
-    
-    # 1. Check 3-hour cache
-    three_hours_ago = datetime.utcnow() - timedelta(hours=3)
-    cached_weather = db.query(WeatherCache).filter(
-        WeatherCache.user_id == user_id,
-        WeatherCache.fetched_at >= three_hours_ago
-    ).first()
-
-    if cached_weather:
-        print("--- Loaded Weather from 3-Hour Database Cache ---")
-        return json.loads(cached_weather.forecast_data)
-
-    # 2. Fetch new data from OpenWeatherMap
-    print("--- Cache expired. Fetching fresh Weather from OpenWeatherMap ---")
-    api_key = os.getenv("OPENWEATHERMAP_API_KEY")
-    url = f"https://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={api_key}&units=metric"
-    
-    try:
-        response = requests.get(url, timeout=10)
-        if response.status_code != 200:
-            return None
-            
-        data = response.json()
-        daily_forecast = {}
-        
-        # Group 3-hour chunks into Daily Summaries
-        for item in data['list']:
-            date_str = item['dt_txt'].split(' ')[0]
-            # Safely extract rain volume in mm (OWM uses 'rain': {'3h': 0.5})
-            rain_mm = item.get('rain', {}).get('3h', 0.0)
-            condition = item['weather'][0]['main'] # e.g., Rain, Clouds, Clear
-
-            if date_str not in daily_forecast:
-                daily_forecast[date_str] = {
-                    'temp_max': item['main']['temp_max'],
-                    'temp_min': item['main']['temp_min'],
-                    'rain_mm': rain_mm,
-                    'conditions': [condition]
-                }
-            else:
-                daily_forecast[date_str]['temp_max'] = max(daily_forecast[date_str]['temp_max'], item['main']['temp_max'])
-                daily_forecast[date_str]['temp_min'] = min(daily_forecast[date_str]['temp_min'], item['main']['temp_min'])
-                daily_forecast[date_str]['rain_mm'] += rain_mm
-                daily_forecast[date_str]['conditions'].append(condition)
-
-        # 3. Format cleanly for Flutter UI and Gemini
-        final_forecast = []
-        for date_str, info in list(daily_forecast.items())[:5]:
-            # Determine main condition for the day
-            conds = info['conditions']
-            if 'Rain' in conds or 'Thunderstorm' in conds or 'Drizzle' in conds:
-                main_cond = 'Rainy'
-            elif 'Clear' in conds:
-                main_cond = 'Sunny'
-            else:
-                main_cond = 'Cloudy'
-
-            final_forecast.append({
-                "date": date_str,
-                "temp_max": round(info['temp_max'], 1),
-                "temp_min": round(info['temp_min'], 1),
-                "rain_mm": round(info['rain_mm'], 1),
-                "condition": main_cond
-            })
-
-        # 4. Save to Database Cache
-        db.query(WeatherCache).filter(WeatherCache.user_id == user_id).delete()
-        new_cache = WeatherCache(
-            user_id=user_id,
-            forecast_data=json.dumps(final_forecast)
-        )
-        db.add(new_cache)
-        db.commit()
-
-        return final_forecast
-
-    except Exception as e:
-        print(f"Weather Fetch Error: {e}")
-        return None
+def get_cached_weather(lat: float, lon: float, db: Session):
+    """Daily forecast for a location, shared with every user in the same ~5 km grid cell (3-hour cache)."""
+    return get_cell_forecast(db, lat, lon)
     
 # --- 19. Get User's Weather ---
 @app.get("/weather/my-forecast/{user_id}")
@@ -895,12 +1030,17 @@ def get_user_weather_page(user_id: int, db: Session = Depends(get_db)):
     if not user or not user.latitude or not user.longitude:
         raise HTTPException(status_code=400, detail="User GPS location not found.")
         
-    weather_data = get_cached_weather(user.id, user.latitude, user.longitude, db)
+    weather_data = get_cached_weather(user.latitude, user.longitude, db)
     if not weather_data:
         raise HTTPException(status_code=500, detail="Failed to fetch weather data.")
         
     return {"location": f"{user.district}, {user.state}", "forecast": weather_data}
 
+# --- 19a. Weather Prefetch Stats ---
+@app.get("/weather/prefetch/stats")
+def get_weather_prefetch_stats():
+    return {"enabled": WEATHER_PREFETCH_ENABLED, **prefetch_stats}
+
 # --- 20. Get Government Schemes ---
 @app.get("/api/schemes/cleaned")
 def get_cleaned_schemes(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
@@ -0,0 +1,74 @@
+import sys
+import logging
+import traceback
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from sqlalchemy.orm import undefer
+from db.database import SessionLocal
+from db.models import ChatMessage
+from api.audio_store import get_audio_store
+from api.tts_service import get_audio_key
+
+# --- Set up Logging ---
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+
+# Small batches: every row in a batch carries a full MP3
+BATCH_SIZE = 50
+
+def migrate_audio_blobs():
+    """Moves MP3s out of chat_messages.audio_data into the audio store, keeping only the key."""
+    logging.info("--- Starting Audio Blob Migration ---")
+
+    store = get_audio_store()
+    db = SessionLocal()
+    moved = 0
+    shared = 0
+    last_id = 0
+
+    try:
+        while True:
+            batch = db.query(ChatMessage).options(undefer(ChatMessage.audio_data)).filter(
+                ChatMessage.id > last_id,
+                ChatMessage.audio_data.isnot(None)
+            ).order_by(ChatMessage.id.asc()).limit(BATCH_SIZE).all()
+
+            if not batch:
+                break
+
+            for message in batch:
+                # Same key the TTS path uses, so these files are reused by future answers
+                key = get_audio_key(message.content)
+                if store.exists(key):
+                    shared += 1
+                else:
+                    store.write(key, message.audio_data)
+
+                message.audio_key = key
+                message.audio_data = None
+                moved += 1
+                last_id = message.id
+
+            db.commit()
+            # Drop the blobs we just cleared from the identity map
+            db.expunge_all()
+            logging.info(f"Moved {moved} clips so far (up to message {last_id})...")
+
+        logging.info(f"Migration complete. Moved {moved} clips, {shared} were already in the store.")
+
+    except Exception:
+        logging.error("Migration failed! Full error traceback below:")
+        logging.error(traceback.format_exc())
+        db.rollback()
+    finally:
+        db.close()
+        logging.info("--- Audio Blob Migration Ended ---\n")
+
+if __name__ == "__main__":
+    migrate_audio_blobs()
@@ -0,0 +1,219 @@
+import math
+from datetime import date, timedelta
+from sqlalchemy import String, func, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from db.database import SessionLocal
+from db.models import MandiPrice, MandiPriceRollup, get_ist_time
+
+ROLLUP_PERIODS = ("day", "week", "month")
+PERIOD_LABELS = {"day": "Daily", "week": "Weekly", "month": "Monthly"}
+ROLLUP_KEY_COLUMNS = ["state", "commodity", "period", "district", "market", "period_start"]
+PRICE_KEY_COLUMNS = ["state", "district", "market", "commodity", "variety", "grade", "arrival_date"]
+
+
+def lock_order(db, columns: list) -> list:
+    """
+    ORDER BY for taking row locks in the same order Python's sorted() gives the keys:
+    byte order of the UTF-8 text, which is SQLite's default and "C" collation on Postgres.
+    """
+    if db.bind.dialect.name != "postgresql":
+        return columns
+    return [column.collate("C") if isinstance(column.type, String) else column for column in columns]
+
+
+def period_start(day: date, period: str) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def contribution(modal_price):
+    """(observations, sum, sum of squares) one price adds to a bucket."""
+    if modal_price is None:
+        return 0, 0.0, 0.0
+    return 1, modal_price, modal_price * modal_price
+
+
+# --- INCREMENTAL UPDATE (called from upsert_mandi_prices, same transaction) ---
+def lock_previous_prices(db, rows: list) -> dict:
+    """
+    Modal prices currently stored for the given mandi_prices rows, keyed like the unique constraint.
+    The rows stay locked (FOR UPDATE) until the caller commits, so a concurrent writer of the same
+    arrivals waits and then reads our prices instead of folding the same delta in a second time.
+    """
+    if not rows:
+        return {}
+
+    key_columns = [getattr(MandiPrice, c) for c in PRICE_KEY_COLUMNS]
+    keys = [tuple(row[c] for c in PRICE_KEY_COLUMNS) for row in rows]
+
+    previous = {}
+    # Chunked so the IN list stays a sensible size for big sync pages
+    for i in range(0, len(keys), 500):
+        found_rows = db.query(*key_columns, MandiPrice.modal_price).filter(
+            tuple_(*key_columns).in_(keys[i:i + 500])
+        ).order_by(*lock_order(db, key_columns)).with_for_update().all()  # Same lock order in every writer, no deadlocks
+        for found in found_rows:
+            previous[tuple(found[:-1])] = found[-1]
+    return previous
+
+
+def apply_price_rollups(db, rows: list, previous: dict):
+    """
+    Folds new or revised prices into the day/week/month buckets at market, district and
+    state level. A revised price swaps its old contribution out, so re-syncing a date
+    never double-counts. Min/max only ever widen (a revised extreme is not narrowed back).
+    """
+    deltas = {}
+    for row in rows:
+        key = tuple(row[c] for c in PRICE_KEY_COLUMNS)
+        old_price = previous.get(key)
+        new_price = row["modal_price"]
+        if key in previous and old_price == new_price:
+            continue  # Re-synced, nothing changed
+
+        new_n, new_sum, new_sq = contribution(new_price)
+        old_n, old_sum, old_sq = contribution(old_price)
+        if new_n == old_n == 0:
+            continue
+
+        scopes = ((row["district"], row["market"]), (row["district"], ""), ("", ""))
+        for period in ROLLUP_PERIODS:
+            start = period_start(row["arrival_date"], period)
+            for district, market in scopes:
+                bucket_key = (row["state"], row["commodity"], period, district, market, start)
+                bucket = deltas.setdefault(bucket_key, [0, 0.0, 0.0, None, None])
+                bucket[0] += new_n - old_n
+                bucket[1] += new_sum - old_sum
+                bucket[2] += new_sq - old_sq
+                if new_price is not None:
+                    bucket[3] = new_price if bucket[3] is None else min(bucket[3], new_price)
+                    bucket[4] = new_price if bucket[4] is None else max(bucket[4], new_price)
+
+    if not deltas:
+        return 0
+
+    # Buckets in key order: the state- and district-wide buckets are shared by every writer
+    # of that state, so they must be locked in the same order to never deadlock
+    values = [{
+        **dict(zip(ROLLUP_KEY_COLUMNS, bucket_key)),
+        "observations": n,
+        "modal_sum": total,
+        "modal_sum_sq": total_sq,
+        "min_modal_price": low,
+        "max_modal_price": high,
+        "updated_at": get_ist_time(),
+    } for bucket_key, (n, total, total_sq, low, high) in sorted(deltas.items())]
+
+    is_postgres = db.bind.dialect.name == "postgresql"
+    insert = postgresql.insert if is_postgres else sqlite.insert
+    # Two-argument least/greatest; SQLite spells them min/max
+    least = func.least if is_postgres else func.min
+    greatest = func.greatest if is_postgres else func.max
+
+    stmt = insert(MandiPriceRollup).values(values)
+    table = MandiPriceRollup.__table__.c
+    stmt = stmt.on_conflict_do_update(
+        index_elements=ROLLUP_KEY_COLUMNS,
+        set_={
+            "observations": table.observations + stmt.excluded.observations,
+            "modal_sum": table.modal_sum + stmt.excluded.modal_sum,
+            "modal_sum_sq": table.modal_sum_sq + stmt.excluded.modal_sum_sq,
+            # coalesce on both sides: a NULL on either side must not wipe the other
+            "min_modal_price": least(func.coalesce(table.min_modal_price, stmt.excluded.min_modal_price), func.coalesce(stmt.excluded.min_modal_price, table.min_modal_price)),
+            "max_modal_price": greatest(func.coalesce(table.max_modal_price, stmt.excluded.max_modal_price), func.coalesce(stmt.excluded.max_modal_price, table.max_modal_price)),
+            "updated_at": stmt.excluded.updated_at,
+        }
+    )
+    db.execute(stmt)
+    return len(values)
+
+
+# --- TREND QUERIES ---
+def rollup_point(bucket: MandiPriceRollup) -> dict:
+    n = bucket.observations
+    mean = bucket.modal_sum / n
+    variance = max(0.0, bucket.modal_sum_sq / n - mean * mean)
+    return {
+        "period_start": bucket.period_start.isoformat(),
+        "avg_modal_price": round(mean, 2),
+        "min_modal_price": bucket.min_modal_price,
+        "max_modal_price": bucket.max_modal_price,
+        # Coefficient of variation: spread of prices relative to their level
+        "volatility_pct": round(100 * math.sqrt(variance) / mean, 1) if mean else None,
+        "observations": n,
+    }
+
+
+def load_price_trend(state: str, commodity: str, district: str = None, market: str = None, period: str = "week", points: int = 8) -> dict:
+    """Newest `points` buckets for one crop (oldest first), plus the change across them."""
+    db = SessionLocal()
+    try:
+        filters = [
+            MandiPriceRollup.state == state.title(),
+            # Plain equality (the name is already canonical) so the unique bucket index serves the lookup
+            MandiPriceRollup.commodity == commodity,
+            MandiPriceRollup.period == period,
+            MandiPriceRollup.market == (market or ""),
+            MandiPriceRollup.observations > 0,
+        ]
+        # A market name is specific enough on its own, the district is only needed for district-wide rows
+        if district or not market:
+            filters.append(MandiPriceRollup.district == (district or ""))
+
+        buckets = db.query(MandiPriceRollup).filter(*filters).order_by(MandiPriceRollup.period_start.desc()).limit(points).all()
+    finally:
+        db.close()
+
+    series = [rollup_point(bucket) for bucket in reversed(buckets)]
+
+    change_pct = None
+    if len(series) >= 2 and series[0]["avg_modal_price"]:
+        change_pct = round(100 * (series[-1]["avg_modal_price"] - series[0]["avg_modal_price"]) / series[0]["avg_modal_price"], 1)
+
+    return {
+        "state": state.title(),
+        "district": district,
+        "market": market,
+        "commodity": commodity,
+        "period": period,
+        "change_pct": change_pct,
+        "series": series,
+    }
+
+
+def format_trend_for_ai(trend: dict) -> str:
+    series = trend["series"]
+    place = trend["market"] or trend["district"] or trend["state"]
+    if not series:
+        return f"Politely inform the user that there is not enough price history for {trend['commodity']} in {place} yet."
+
+    change = trend["change_pct"]
+    if change is None:
+        direction = "only one period of data"
+    elif change > 2:
+        direction = f"going UP ({change:+.1f}%)"
+    elif change < -2:
+        direction = f"going DOWN ({change:+.1f}%)"
+    else:
+        direction = f"roughly STABLE ({change:+.1f}%)"
+
+    lines = "\n".join(
+        f"- {p['period_start']}: avg ₹{p['avg_modal_price']:g}, range ₹{p['min_modal_price']:g}-₹{p['max_modal_price']:g}, volatility {p['volatility_pct']}%"
+        for p in series
+    )
+    return f"""
+{PERIOD_LABELS[trend['period']]} modal price trend for {trend['commodity']} in {place} (₹/Quintal, oldest first):
+{lines}
+
+Overall: {direction}.
+
+INSTRUCTIONS FOR AI:
+1. Tell the farmer whether the price is going up, down or is stable, using the overall change.
+2. Mention the latest average price and the range, using bold (**) for key numbers.
+3. If volatility is high (above 15%), mention that prices are swinging a lot.
+4. Keep it short, do not list every period.
+"""
@@ -0,0 +1,63 @@
+import sys
+import traceback
+import logging
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from db.database import SessionLocal
+from db.models import MandiPrice, MandiPriceRollup
+from api.price_rollups import apply_price_rollups, PRICE_KEY_COLUMNS
+
+# --- Set up Logging ---
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+
+BATCH_SIZE = 2000
+
+def rebuild_price_rollups():
+    """
+    Recomputes mandi_price_rollups from everything in mandi_prices.
+    Only needed once after the migration (or to repair the table); ingestion keeps it current.
+    """
+    logging.info("--- Rebuilding Mandi Price Rollups ---")
+    db = SessionLocal()
+    try:
+        db.query(MandiPriceRollup).delete(synchronize_session=False)
+
+        last_id = 0
+        folded = 0
+        while True:
+            batch = db.query(MandiPrice).filter(MandiPrice.id > last_id).order_by(MandiPrice.id.asc()).limit(BATCH_SIZE).all()
+            if not batch:
+                break
+
+            rows = [{**{c: getattr(price, c) for c in PRICE_KEY_COLUMNS}, "modal_price": price.modal_price} for price in batch]
+            # Empty "previous" map: every row counts as a new arrival
+            apply_price_rollups(db, rows, {})
+
+            last_id = batch[-1].id
+            folded += len(batch)
+            logging.info(f"Folded {folded} price rows so far...")
+
+        db.commit()
+        logging.info(f"Rollups rebuilt from {folded} price rows.")
+
+    except Exception as e:
+        logging.error("Rebuild failed! Full error traceback below:")
+        logging.error(traceback.format_exc())
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_price_rollups()
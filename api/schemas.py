@@ -68,11 +68,17 @@ class SessionResponse(BaseModel):
     id: int
     user_id: int
     title: str
+    title_status: Optional[str] = None
     created_at: datetime
 
     class Config:
         from_attributes = True
 
+class SessionTitleResponse(BaseModel):
+    session_id: int
+    title: str
+    title_status: Optional[str] = None
+
 class LocationUpdateSchema(BaseModel):
     latitude: float
     longitude: float
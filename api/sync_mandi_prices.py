@@ -0,0 +1,129 @@
+import requests
+import time
+import os
+import sys
+import traceback
+import logging
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+load_dotenv()
+
+from db.database import SessionLocal
+from api.bazarbhav import BASE_URL, HEADERS, API_KEY, upsert_mandi_prices, record_coverage, retry_after_seconds
+from api.http_client import http_get
+
+# --- Set up Logging ---
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler("mandi_sync_log.txt"), # Logs to this text file
+        logging.StreamHandler()                    # Also prints to the terminal
+    ]
+)
+
+# Bulk pages: the whole country for one arrival date is a few thousand records
+PAGE_SIZE = int(os.getenv("MANDI_SYNC_PAGE_SIZE", 1000))
+# Today plus the previous days, late arrivals keep getting published for a while
+DAYS_TO_SYNC = int(os.getenv("MANDI_SYNC_DAYS", 3))
+MAX_RETRIES = 3
+
+def fetch_page(arrival_date: str, offset: int):
+    params = {
+        "api-key": API_KEY,
+        "format": "json",
+        "limit": PAGE_SIZE,
+        "offset": offset,
+        "filters[Arrival_Date]": arrival_date
+    }
+
+    for attempt in range(MAX_RETRIES):
+        try:
+            response = http_get(BASE_URL, params=params, headers=HEADERS, timeout=60)
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code == 429:
+                delay = retry_after_seconds(response.headers.get("Retry-After"), attempt + 1)
+                logging.warning(f"Rate limited (429) on {arrival_date} offset {offset}. Waiting {delay:.1f}s...")
+                time.sleep(delay)
+                continue
+            logging.warning(f"HTTP {response.status_code} on {arrival_date} offset {offset}: {response.text[:200]}")
+        except requests.exceptions.Timeout:
+            logging.warning(f"Timeout on {arrival_date} offset {offset} (attempt {attempt + 1}).")
+        time.sleep(2 ** attempt)
+
+    return None
+
+def sync_date(db, arrival_date: str) -> int:
+    offset = 0
+    written = 0
+    total = 0
+    complete = False
+
+    while True:
+        logging.info(f"Fetching arrivals for {arrival_date} from offset {offset}...")
+        data = fetch_page(arrival_date, offset)
+        if data is None:
+            logging.error(f"Giving up on {arrival_date} at offset {offset}.")
+            break
+
+        total = int(data.get("total", 0) or 0) or total
+        records = data.get("records", [])
+        if not records:
+            # An empty page ends the date; it's only complete if we got everything the API reported
+            complete = not total or offset >= total
+            if not complete:
+                logging.warning(f"Empty page for {arrival_date} at offset {offset} of {total}.")
+            break
+
+        written += upsert_mandi_prices(db, records)
+        # Step by what came back: the API may cap the page size below PAGE_SIZE
+        offset += len(records)
+
+        if total and offset >= total:
+            complete = True
+            break
+
+        time.sleep(0.5)
+
+    if complete and offset:
+        # The whole country's list for this date is local now (state="" scope)
+        record_coverage(db, "", "", datetime.strptime(arrival_date, "%d/%m/%Y").date(), "sync", offset)
+        db.commit()
+    elif offset:
+        logging.warning(f"{arrival_date} is only partly synced ({offset} of {total or '?'} records), not marking it covered.")
+
+    return written
+
+def sync_mandi_prices():
+    logging.info("--- Starting Mandi Price Sync ---")
+
+    if not API_KEY:
+        logging.error("DATA_GOV_API_KEY is missing. Skipping sync.")
+        return
+
+    db = SessionLocal()
+    try:
+        today = datetime.now()
+        for days_back in range(DAYS_TO_SYNC):
+            arrival_date = (today - timedelta(days=days_back)).strftime("%d/%m/%Y")
+            written = sync_date(db, arrival_date)
+            logging.info(f"{arrival_date}: upserted {written} price rows.")
+
+        logging.info("Mandi price sync complete.")
+
+    except Exception as e:
+        logging.error("Sync failed! Full error traceback below:")
+        logging.error(traceback.format_exc())
+        db.rollback()
+    finally:
+        db.close()
+        logging.info("--- Mandi Price Sync Ended ---\n")
+
+if __name__ == "__main__":
+    sync_mandi_prices()
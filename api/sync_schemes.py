@@ -1,4 +1,3 @@
-import requests
 import time
 import os
 import traceback
@@ -13,6 +12,7 @@ sys.path.append(str(BASE_DIR))
 
 from db.database import SessionLocal
 from db.models import RawScheme, CleanedScheme
+from api.http_client import http_get
 
 # --- Set up Logging ---
 logging.basicConfig(
@@ -86,7 +86,7 @@ def sync_schemes():
             params["from"] = start
             logging.info(f"Fetching schemes from offset {start}...")
             
-            response = requests.get(API_URL, params=params, headers=headers)
+            response = http_get(API_URL, params=params, headers=headers)
             data = response.json()
             items = data.get("data", {}).get("hits", {}).get("items", [])
             
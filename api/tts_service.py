@@ -1,6 +1,13 @@
+import os
 import re
+import asyncio
+from collections import OrderedDict
 import edge_tts
-from langdetect import detect, LangDetectException
+from langdetect import detect, DetectorFactory, LangDetectException
+from api.audio_store import content_key, get_audio_store
+
+# langdetect is random by default; a fixed seed keeps the voice (and so the audio key) stable
+DetectorFactory.seed = 0
 
 def clean_text_for_tts(text: str) -> str:
     """Cleans markdown, links, and formatting for smooth TTS reading."""
@@ -33,23 +40,183 @@ def get_voice_for_language(text: str) -> str:
     except LangDetectException:
         return "hi-IN-MadhurNeural"
 
-async def stream_audio_generator(text: str):
-    """Generates TTS and yields raw MP3 chunks instantly for streaming."""
+def get_audio_key(text: str) -> str:
+    """Storage key for the clip this text would produce (hash of cleaned text + voice)."""
     clean_text = clean_text_for_tts(text)
-    voice = get_voice_for_language(clean_text)
-    
+    return content_key(clean_text, get_voice_for_language(clean_text))
+
+async def synthesize_stream(clean_text: str, voice: str):
+    """Raw Edge TTS synthesis, no caching. Yields MP3 chunks as they arrive."""
     communicate = edge_tts.Communicate(clean_text, voice)
     
     async for chunk in communicate.stream():
         if chunk["type"] == "audio":
             yield chunk["data"]
 
+# --- SENTENCE-CHUNKED SYNTHESIS ---
+# Long answers are split at sentence boundaries and synthesized in parallel, so the
+# first sentence can play while the rest is still being generated.
+TTS_CHUNKED = os.getenv("TTS_CHUNKED", "true").lower() != "false"
+TTS_CHUNK_MAX_CHARS = int(os.getenv("TTS_CHUNK_MAX_CHARS", 250))
+TTS_CHUNK_CONCURRENCY = int(os.getenv("TTS_CHUNK_CONCURRENCY", 3))
+
+# Sentence ends: . ! ? and the Devanagari danda used in Hindi/Marathi
+SENTENCE_END = re.compile(r'(?<=[.!?\u0964])\s+')
+
+def split_sentences(clean_text: str, max_chars: int = TTS_CHUNK_MAX_CHARS) -> list:
+    """Splits text into sentence groups of at most max_chars (long sentences are cut at spaces)."""
+    pieces = []
+    for sentence in SENTENCE_END.split(clean_text):
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            pieces.append(sentence)
+
+    # Merge short sentences so we don't pay a round-trip per "Okay."
+    # The first piece stays a single sentence to get the first audio out fast.
+    chunks = []
+    for piece in pieces:
+        if len(chunks) > 1 and len(chunks[-1]) + len(piece) + 1 <= max_chars:
+            chunks[-1] = f"{chunks[-1]} {piece}"
+        else:
+            chunks.append(piece)
+    return chunks
+
+async def synthesize_chunked(clean_text: str, voice: str, concurrency: int = TTS_CHUNK_CONCURRENCY):
+    """
+    Yields MP3 chunks strictly in sentence order. The first sentence streams live while
+    the following ones render concurrently in the background (bounded by concurrency).
+    """
+    chunks = split_sentences(clean_text)
+    if len(chunks) <= 1:
+        async for chunk in synthesize_stream(clean_text, voice):
+            yield chunk
+        return
+
+    # One slot is taken by the live first sentence
+    semaphore = asyncio.Semaphore(max(1, concurrency - 1))
+
+    async def render(text: str) -> bytes:
+        async with semaphore:
+            audio_data = bytearray()
+            async for chunk in synthesize_stream(text, voice):
+                audio_data.extend(chunk)
+            return bytes(audio_data)
+
+    # Tasks queue on the semaphore in order, so earlier sentences are rendered first
+    pending = [asyncio.create_task(render(text)) for text in chunks[1:]]
+    try:
+        async for chunk in synthesize_stream(chunks[0], voice):
+            yield chunk
+        for task in pending:
+            yield await task
+    finally:
+        for task in pending:
+            task.cancel()
+
+# --- TWO-TIER TTS CACHE ---
+# Hot clips in memory (LRU, bounded by total bytes), everything else in the audio store on disk.
+# Both tiers use the same key: hash of (cleaned text, voice).
+TTS_MEMORY_CACHE_BYTES = int(os.getenv("TTS_MEMORY_CACHE_MB", 32)) * 1024 * 1024
+CACHE_HIT_CHUNK_BYTES = 32 * 1024
+
+class AudioLRU:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.size = 0
+
+    def get(self, key: str):
+        data = self.items.get(key)
+        if data is not None:
+            self.items.move_to_end(key)
+        return data
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        if key in self.items:
+            self.size -= len(self.items.pop(key))
+        self.items[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self.items.popitem(last=False)
+            self.size -= len(evicted)
+
+memory_cache = AudioLRU(TTS_MEMORY_CACHE_BYTES)
+# key -> Future of the synthesis currently running for it (single-flight)
+_in_flight = {}
+
+async def get_cached_audio(key: str):
+    """Memory first, then the audio store. Disk hits are promoted to memory."""
+    data = memory_cache.get(key)
+    if data is not None:
+        return data
+
+    data = await asyncio.to_thread(get_audio_store().read, key)
+    if data:
+        memory_cache.put(key, data)
+        return data
+    return None
+
+async def store_audio(key: str, data: bytes):
+    memory_cache.put(key, data)
+    await asyncio.to_thread(get_audio_store().write, key, data)
+
+async def stream_audio_generator(text: str):
+    """Yields MP3 chunks for the text: straight from cache on a hit, live from Edge TTS on a miss."""
+    clean_text = clean_text_for_tts(text)
+    voice = get_voice_for_language(clean_text)
+    key = content_key(clean_text, voice)
+
+    data = await get_cached_audio(key)
+
+    # Someone is already synthesizing this exact clip, wait for their result
+    if data is None and key in _in_flight:
+        try:
+            data = await asyncio.shield(_in_flight[key])
+        except Exception:
+            data = None  # Their stream failed or was dropped, do our own below
+
+    if data is not None:
+        for start in range(0, len(data), CACHE_HIT_CHUNK_BYTES):
+            yield data[start:start + CACHE_HIT_CHUNK_BYTES]
+        return
+
+    # Miss: we lead the synthesis, stream it live and share the result when done
+    future = asyncio.get_running_loop().create_future()
+    # Nobody may be waiting; mark the exception as retrieved so asyncio doesn't log it
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _in_flight[key] = future
+    audio_data = bytearray()
+    try:
+        synthesize = synthesize_chunked if TTS_CHUNKED else synthesize_stream
+        async for chunk in synthesize(clean_text, voice):
+            audio_data.extend(chunk)
+            yield chunk
+
+        data = bytes(audio_data)
+        await store_audio(key, data)
+        future.set_result(data)
+    except BaseException as e:
+        # Includes the client disconnecting mid-stream (GeneratorExit / cancellation)
+        if not future.done():
+            future.set_exception(RuntimeError(f"TTS synthesis did not complete: {e!r}"))
+        raise
+    finally:
+        if _in_flight.get(key) is future:
+            del _in_flight[key]
+
 async def generate_audio_bytes(text: str) -> bytes:
-    """Collects all chunks into a single byte payload for background saving."""
+    """Collects all chunks into a single byte payload (cached in memory and in the audio store)."""
     audio_data = bytearray()
     
     # Reuse the generator 
     async for chunk in stream_audio_generator(text):
         audio_data.extend(chunk)
         
-    return bytes(audio_data)
\ No newline at end of file
+    return bytes(audio_data)
@@ -0,0 +1,114 @@
+import os
+import asyncio
+from datetime import timedelta
+
+from db.database import SessionLocal
+from db.models import User, ChatSession, ChatMessage, WeatherCache, get_ist_time
+from api.weather_service import weather_cell, fresh_until, cell_lock, load_fresh_cache_row, refresh_cell_forecast
+
+# --- PREFETCH TUNING ---
+# Run in every worker unless turned off (set to 0 on all but one worker when running several)
+WEATHER_PREFETCH_ENABLED = os.getenv("WEATHER_PREFETCH_ENABLED", "1") == "1"
+WEATHER_PREFETCH_INTERVAL_SECONDS = int(os.getenv("WEATHER_PREFETCH_INTERVAL_SECONDS", 600))
+# Refresh cells this long before their 3-hour cache expires
+WEATHER_PREFETCH_LEAD_MINUTES = int(os.getenv("WEATHER_PREFETCH_LEAD_MINUTES", 20))
+# Users who chatted within this window count as active
+WEATHER_PREFETCH_ACTIVE_DAYS = int(os.getenv("WEATHER_PREFETCH_ACTIVE_DAYS", 3))
+# Upstream budget for prefetching (the OWM free tier allows 60 calls/minute in total)
+WEATHER_PREFETCH_PER_MINUTE = int(os.getenv("WEATHER_PREFETCH_PER_MINUTE", 30))
+WEATHER_PREFETCH_MAX_PER_ROUND = int(os.getenv("WEATHER_PREFETCH_MAX_PER_ROUND", 200))
+
+prefetch_stats = {"rounds": 0, "refreshed": 0, "skipped": 0, "failed": 0, "last_due": 0}
+
+
+def find_due_cells() -> list:
+    """(cell, centre_lat, centre_lon) for active users' cells that are missing or about to expire."""
+    db = SessionLocal()
+    try:
+        since = get_ist_time() - timedelta(days=WEATHER_PREFETCH_ACTIVE_DAYS)
+        locations = db.query(User.latitude, User.longitude).join(
+            ChatSession, ChatSession.user_id == User.id
+        ).join(
+            ChatMessage, ChatMessage.session_id == ChatSession.id
+        ).filter(
+            ChatMessage.created_at >= since,
+            User.latitude.isnot(None),
+            User.longitude.isnot(None)
+        ).distinct().all()
+
+        cells = {}
+        for lat, lon in locations:
+            cell, centre_lat, centre_lon = weather_cell(lat, lon)
+            cells[cell] = (cell, centre_lat, centre_lon)
+        if not cells:
+            return []
+
+        fresh = set()
+        cell_keys = list(cells)
+        for i in range(0, len(cell_keys), 500):
+            fresh |= {row.cell for row in db.query(WeatherCache.cell).filter(
+                WeatherCache.cell.in_(cell_keys[i:i + 500]),
+                WeatherCache.expires_at > fresh_until(WEATHER_PREFETCH_LEAD_MINUTES)
+            ).all()}
+
+        return [cells[cell] for cell in cell_keys if cell not in fresh]
+    finally:
+        db.close()
+
+
+def refresh_cell(cell: str, centre_lat: float, centre_lon: float):
+    """True when refreshed, False on failure, None when the cell is fresh already or being refreshed."""
+    # Same per-cell lock as the request path, so a user request and the prefetch never both fetch.
+    # Never wait for it: a request holding it is refreshing the cell right now
+    lock = cell_lock(cell)
+    if not lock.acquire(blocking=False):
+        return None
+    try:
+        db = SessionLocal()
+        try:
+            # A user request may have refreshed the cell while it waited in the batch
+            if load_fresh_cache_row(db, cell, WEATHER_PREFETCH_LEAD_MINUTES):
+                return None
+            return refresh_cell_forecast(db, cell, centre_lat, centre_lon) is not None
+        finally:
+            db.close()
+    finally:
+        lock.release()
+
+
+async def prefetch_round():
+    due = await asyncio.to_thread(find_due_cells)
+    prefetch_stats["rounds"] += 1
+    prefetch_stats["last_due"] = len(due)
+    if not due:
+        return
+
+    batch = due[:WEATHER_PREFETCH_MAX_PER_ROUND]
+    print(f"🌦️ Weather prefetch: {len(due)} cell(s) due, refreshing {len(batch)}.")
+
+    # Spread the calls evenly over the minute instead of bursting them
+    spacing = 60 / max(1, WEATHER_PREFETCH_PER_MINUTE)
+    tasks = []
+    for cell, centre_lat, centre_lon in batch:
+        tasks.append(asyncio.create_task(asyncio.to_thread(refresh_cell, cell, centre_lat, centre_lon)))
+        await asyncio.sleep(spacing)
+
+    for ok in await asyncio.gather(*tasks, return_exceptions=True):
+        if ok is True:
+            prefetch_stats["refreshed"] += 1
+        elif ok is None:
+            prefetch_stats["skipped"] += 1
+        else:
+            prefetch_stats["failed"] += 1
+
+
+async def run_weather_prefetch():
+    """Background loop started from the app lifespan."""
+    while True:
+        try:
+            await prefetch_round()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Weather prefetch round failed: {repr(e)}")
+        await asyncio.sleep(WEATHER_PREFETCH_INTERVAL_SECONDS)
@@ -0,0 +1,305 @@
+import os
+import json
+import threading
+import weakref
+from array import array
+from datetime import date, timedelta
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+
+from api import http_client
+from db.models import WeatherCache, get_ist_time
+
+OWM_FORECAST_URL = "https://api.openweathermap.org/data/2.5/forecast"
+FORECAST_DAYS = 5
+# OWM reports the offset with every payload, this is only the fallback (IST)
+DEFAULT_UTC_OFFSET_SECONDS = 19800
+
+# Grid size of the shared cache: 0.05° is ~5.5 km, well inside one OWM forecast point
+WEATHER_CELL_DEGREES = float(os.getenv("WEATHER_CELL_DEGREES", 0.05))
+WEATHER_CACHE_HOURS = 3
+# How long a request waits on another request's OWM call for the same cell before serving the stale row
+WEATHER_CELL_LOCK_WAIT_SECONDS = float(os.getenv("WEATHER_CELL_LOCK_WAIT_SECONDS", 5))
+
+RAIN_CONDITIONS = {"Rain", "Thunderstorm", "Drizzle"}
+EPOCH = date(1970, 1, 1)
+
+
+def most_common(values: list):
+    # At most 8 slots a day, cheaper than building a Counter; ties go to the earliest slot
+    return max(values, key=values.count)
+
+
+class ForecastSeries:
+    """
+    The 3-hourly OWM forecast in columnar form: one typed array per field instead of
+    40 nested dicts. Parsed once per fetch; the daily view and the hourly series are
+    both computed from these columns, and the cache keeps the columns so the hourly
+    series can be rebuilt without the payload. This is about the cache format, not speed:
+    parse + daily costs a little more than the old single dict loop (benchmarks/weather_parse.py).
+    """
+
+    NUMERIC_COLUMNS = ("temp", "temp_min", "temp_max", "humidity", "rain_mm", "pop", "wind_speed")
+
+    def __init__(self, times, columns: dict, conditions: list, descriptions: list, utc_offset: int):
+        self.times = times                # array('q') of unix timestamps (UTC)
+        self.columns = columns            # name -> array('d')
+        self.conditions = conditions      # "Rain", "Clouds", "Clear", ...
+        self.descriptions = descriptions  # "light rain", ...
+        self.utc_offset = utc_offset
+
+    def __len__(self):
+        return len(self.times)
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "ForecastSeries":
+        items = payload.get("list") or []
+        times = array("q", [item["dt"] for item in items])
+
+        mains = [item["main"] for item in items]
+        columns = {
+            "temp": array("d", [m["temp"] for m in mains]),
+            "temp_min": array("d", [m["temp_min"] for m in mains]),
+            "temp_max": array("d", [m["temp_max"] for m in mains]),
+            "humidity": array("d", [m.get("humidity", 0) for m in mains]),
+            # OWM leaves the rain block out entirely for dry slots ('rain': {'3h': 0.5} otherwise)
+            "rain_mm": array("d", [item.get("rain", {}).get("3h", 0.0) for item in items]),
+            "pop": array("d", [item.get("pop", 0.0) for item in items]),
+            "wind_speed": array("d", [item.get("wind", {}).get("speed", 0.0) for item in items]),
+        }
+        weather = [item["weather"][0] for item in items]
+
+        utc_offset = (payload.get("city") or {}).get("timezone", DEFAULT_UTC_OFFSET_SECONDS)
+        return cls(times, columns, [w["main"] for w in weather], [w["description"] for w in weather], utc_offset)
+
+    def day_numbers(self) -> list:
+        """Local day number of every slot (the OWM dt_txt field is UTC and splits Indian days at 5:30 am)."""
+        offset = self.utc_offset
+        return [(t + offset) // 86400 for t in self.times]
+
+    def day_slices(self):
+        """(date, start, end) for each run of slots on the same local day; slots are in time order."""
+        days = self.day_numbers()
+        start = 0
+        for i in range(1, len(days) + 1):
+            if i == len(days) or days[i] != days[start]:
+                yield (EPOCH + timedelta(days=days[start])).isoformat(), start, i
+                start = i
+
+    def daily(self, days: int = FORECAST_DAYS) -> list:
+        """Daily aggregates over each local day's slice of the columns (min/max/sum per slice)."""
+        temp_min, temp_max = self.columns["temp_min"], self.columns["temp_max"]
+        rain, pop, humidity = self.columns["rain_mm"], self.columns["pop"], self.columns["humidity"]
+
+        result = []
+        for date_str, start, end in self.day_slices():
+            conditions = set(self.conditions[start:end])
+            if conditions & RAIN_CONDITIONS:
+                condition = "Rainy"
+            elif "Clear" in conditions:
+                condition = "Sunny"
+            else:
+                condition = "Cloudy"
+
+            result.append({
+                "date": date_str,
+                "temp_max": round(max(temp_max[start:end]), 1),
+                "temp_min": round(min(temp_min[start:end]), 1),
+                "rain_mm": round(sum(rain[start:end]), 1),
+                "condition": condition,
+                "description": most_common(self.descriptions[start:end]),
+                "rain_chance": round(100 * max(pop[start:end])),
+                "humidity": round(sum(humidity[start:end]) / (end - start)),
+            })
+            if len(result) == days:
+                break
+        return result
+
+    def to_columns(self) -> dict:
+        """JSON-friendly hourly series, kept next to the daily view in the cache."""
+        return {
+            "utc_offset": self.utc_offset,
+            "time": list(self.times),
+            **{name: list(values) for name, values in self.columns.items()},
+            "condition": self.conditions,
+            "description": self.descriptions,
+        }
+
+    @classmethod
+    def from_columns(cls, data: dict) -> "ForecastSeries":
+        return cls(
+            array("q", data["time"]),
+            {name: array("d", data[name]) for name in cls.NUMERIC_COLUMNS},
+            data["condition"],
+            data["description"],
+            data["utc_offset"],
+        )
+
+
+# --- FETCHING ---
+def fetch_forecast(lat: float, lon: float):
+    """ForecastSeries for a location, or None if OWM is unreachable or the key is missing."""
+    api_key = os.getenv("OPENWEATHERMAP_API_KEY")
+    if not api_key:
+        print("Weather Fetch Error: OPENWEATHERMAP_API_KEY missing.")
+        return None
+
+    try:
+        response = http_client.http_get(OWM_FORECAST_URL, params={"lat": lat, "lon": lon, "appid": api_key, "units": "metric"})
+        if response.status_code != 200:
+            print(f"Weather Fetch Error: HTTP {response.status_code} {response.text[:200]}")
+            return None
+        return ForecastSeries.from_payload(response.json())
+    except Exception as e:
+        print(f"Weather Fetch Error: {e}")
+        return None
+
+
+# --- GRID CELLS ---
+def weather_cell(lat: float, lon: float):
+    """(cell key, cell centre lat, cell centre lon). Everyone in a cell shares one forecast."""
+    # Centres sit on multiples of the cell size, so the key is stable for float noise in GPS fixes
+    centre_lat = round(round(lat / WEATHER_CELL_DEGREES) * WEATHER_CELL_DEGREES, 4)
+    centre_lon = round(round(lon / WEATHER_CELL_DEGREES) * WEATHER_CELL_DEGREES, 4)
+    return f"{centre_lat:.4f},{centre_lon:.4f}", centre_lat, centre_lon
+
+
+# --- CACHE FORMAT ---
+def serialize_forecast(series: ForecastSeries, daily: list) -> str:
+    return json.dumps({"daily": daily, "hourly": series.to_columns()})
+
+
+def load_cached_forecast(forecast_data: str):
+    """
+    (daily, hourly) from a cache row; hourly is the raw column dict (ForecastSeries.from_columns
+    turns it back into a series) or None for older rows that hold just the daily list.
+    """
+    data = json.loads(forecast_data)
+    if isinstance(data, list):
+        return data, None
+    return data["daily"], data["hourly"]
+
+
+# --- FORMATTING ---
+def format_forecast_for_ai(daily: list) -> str:
+    lines = "".join(
+        f"- {day['date']}: {day['condition']}, High {day['temp_max']}°C, Low {day['temp_min']}°C, Rain: {day['rain_mm']}mm\n"
+        for day in daily
+    )
+    return f"{len(daily)}-Day Forecast:\n{lines}"
+
+
+def format_today_for_prompt(daily: list) -> str:
+    today = daily[0]
+    return (
+        f"TODAY'S WEATHER: {today['condition']}, "
+        f"Max Temp: {today['temp_max']}°C, "
+        f"Min Temp: {today['temp_min']}°C, "
+        f"Rainfall Expected: {today['rain_mm']}mm."
+    )
+
+
+# --- SHARED CELL CACHE ---
+# A cell's lock lives only while someone holds or waits on it, so the dict stays as small as the traffic
+_cell_locks = weakref.WeakValueDictionary()
+_cell_locks_guard = threading.Lock()
+
+def cell_lock(cell: str) -> threading.Lock:
+    with _cell_locks_guard:
+        lock = _cell_locks.get(cell)
+        if lock is None:
+            lock = _cell_locks[cell] = threading.Lock()
+        return lock
+
+
+def fresh_until(lead_minutes: float = 0):
+    """
+    Rows must expire after this to count as fresh (with a lead: fresh for at least that long).
+    Timezone-aware like the stored expires_at, so the comparison is right on every database.
+    """
+    return get_ist_time() + timedelta(minutes=lead_minutes)
+
+
+def load_fresh_cache_row(db: Session, cell: str, lead_minutes: float = 0):
+    # Served by ix_weather_cache_cell_expires_at
+    return db.query(WeatherCache).filter(
+        WeatherCache.cell == cell,
+        WeatherCache.expires_at > fresh_until(lead_minutes)
+    ).first()
+
+
+def get_fresh_forecast(db: Session, lat: float, lon: float):
+    """One-shot cache lookup: the cell's daily forecast if fresh, else None. Never calls OWM."""
+    cached = load_fresh_cache_row(db, weather_cell(lat, lon)[0])
+    return load_cached_forecast(cached.forecast_data)[0] if cached else None
+
+
+def get_stale_forecast(db: Session, cell: str):
+    """The cell's last stored daily forecast whatever its age, or None if it was never fetched."""
+    cached = db.query(WeatherCache).filter(WeatherCache.cell == cell).first()
+    return load_cached_forecast(cached.forecast_data)[0] if cached else None
+
+
+def store_cell_forecast(db: Session, cell: str, forecast_data: str):
+    """Upsert of the cell's single row (no delete + reinsert)."""
+    insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    now = get_ist_time()
+    stmt = insert(WeatherCache).values(
+        cell=cell,
+        forecast_data=forecast_data,
+        fetched_at=now,
+        expires_at=now + timedelta(hours=WEATHER_CACHE_HOURS)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["cell"],
+        set_={col: stmt.excluded[col] for col in ("forecast_data", "fetched_at", "expires_at")}
+    )
+    db.execute(stmt)
+    db.commit()
+
+
+def get_cell_forecast(db: Session, lat: float, lon: float):
+    """
+    Daily forecast for the grid cell around (lat, lon), from the shared cache or OWM.
+    Concurrent misses for one cell in this process wait for a single upstream call, but only
+    for WEATHER_CELL_LOCK_WAIT_SECONDS: after that (or if OWM fails) the stale row is served,
+    so a slow OWM call can't pin a threadpool worker per waiting request.
+    """
+    cell, centre_lat, centre_lon = weather_cell(lat, lon)
+
+    daily = get_fresh_forecast(db, lat, lon)
+    if daily:
+        print("--- Loaded Weather from 3-Hour Database Cache ---")
+        return daily
+
+    lock = cell_lock(cell)
+    if not lock.acquire(timeout=WEATHER_CELL_LOCK_WAIT_SECONDS):
+        print(f"--- Weather refresh for cell {cell} still running, serving the stale forecast ---")
+        return get_stale_forecast(db, cell)
+
+    try:
+        # Another request may have refreshed the cell while we waited
+        db.expire_all()
+        daily = get_fresh_forecast(db, lat, lon)
+        if daily:
+            return daily
+
+        print(f"--- Cache expired. Fetching fresh Weather from OpenWeatherMap for cell {cell} ---")
+        return refresh_cell_forecast(db, cell, centre_lat, centre_lon) or get_stale_forecast(db, cell)
+    finally:
+        lock.release()
+
+
+def refresh_cell_forecast(db: Session, cell: str, centre_lat: float, centre_lon: float):
+    """Fetches OWM for a cell centre and upserts the cell row. Returns the daily view (None on failure)."""
+    series = fetch_forecast(centre_lat, centre_lon)
+    if series is None:
+        return None
+
+    daily = series.daily()
+    try:
+        store_cell_forecast(db, cell, serialize_forecast(series, daily))
+    except Exception as e:
+        db.rollback()
+        print(f"Weather Cache Error: {e}")
+    return daily
@@ -0,0 +1,101 @@
+"""
+Responsiveness check for GET /chat/message/{message_id}/audio.
+
+Opens N audio streams at once (each a cache miss, synthesized by a slow fake
+Edge TTS) and measures /users/{user_id} latency while they are in flight, then
+confirms every streamed clip was linked to its message afterwards.
+
+Usage:
+    python benchmarks/audio_concurrency.py --streams 50 --stream-seconds 3
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+WORK_DIR = Path(tempfile.mkdtemp())
+os.environ["DATABASE_URL"] = f"sqlite:///{WORK_DIR / 'bench.db'}"
+os.environ["AUDIO_STORE_DIR"] = str(WORK_DIR / "audio")
+
+
+class SlowFakeCommunicate:
+    """Stands in for edge_tts.Communicate: 20 small frames spread over stream_seconds."""
+    stream_seconds = 3.0
+
+    def __init__(self, text: str, voice: str):
+        self.text = text
+
+    async def stream(self):
+        for _ in range(20):
+            await asyncio.sleep(self.stream_seconds / 20)
+            yield {"type": "audio", "data": b"\xff" * 512}
+
+
+async def run(streams: int, stream_seconds: float):
+    import httpx
+    from api.main import app
+    from api import tts_service
+    from db.database import SessionLocal
+    from db.models import ChatMessage
+
+    SlowFakeCommunicate.stream_seconds = stream_seconds
+    tts_service.edge_tts.Communicate = SlowFakeCommunicate
+    tts_service.TTS_CHUNKED = False
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        login = await client.post("/auth/verify-otp", json={"phone_number": "9876543210", "otp": "123456"})
+        user_id = login.json()["user_id"]
+        session_id = (await client.post(f"/chat/sessions?user_id={user_id}", json={"title": "Audio bench"})).json()["id"]
+
+        db = SessionLocal()
+        messages = [ChatMessage(session_id=session_id, role="model", content=f"Advice number {i} for the farmer.") for i in range(streams)]
+        db.add_all(messages)
+        db.commit()
+        message_ids = [m.id for m in messages]
+        db.close()
+
+        async def play(message_id):
+            async with client.stream("GET", f"/chat/message/{message_id}/audio") as response:
+                return sum([len(chunk) async for chunk in response.aiter_bytes()])
+
+        probe_latencies = []
+        streams_done = asyncio.Event()
+
+        async def probe_cheap_endpoint():
+            while not streams_done.is_set():
+                start = time.perf_counter()
+                await client.get(f"/users/{user_id}")
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.05)
+
+        probe_task = asyncio.create_task(probe_cheap_endpoint())
+        start = time.perf_counter()
+        sizes = await asyncio.gather(*(play(mid) for mid in message_ids))
+        wall = time.perf_counter() - start
+        streams_done.set()
+        await probe_task
+
+    db = SessionLocal()
+    linked = db.query(ChatMessage).filter(ChatMessage.id.in_(message_ids), ChatMessage.audio_key.isnot(None)).count()
+    db.close()
+
+    print(f"{streams} concurrent audio streams, {stream_seconds:.1f}s each")
+    print(f"  wall time        : {wall:.2f}s ({sum(sizes)} bytes streamed)")
+    print(f"  /users p50 / max : {statistics.median(probe_latencies) * 1000:.1f}ms / {max(probe_latencies) * 1000:.1f}ms over {len(probe_latencies)} probes")
+    print(f"  clips linked     : {linked}/{streams}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--stream-seconds", type=float, default=3.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.streams, args.stream_seconds))
@@ -0,0 +1,131 @@
+"""
+Load benchmark for POST /chat/{session_id}/message against a stubbed Gemini server.
+
+The stub answers every generateContent call after GEMINI_STUB_DELAY seconds, so the
+numbers show how many chats the API can keep in flight and whether cheap endpoints
+like /users/{user_id} stay fast while they are waiting on the model. It also checks that
+the per-key connection pool limit (POOL_LIMITS in api/gemini_client.py) holds.
+
+Usage:
+    python benchmarks/chat_load.py --concurrency 200 --delay 2.0
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from aiohttp import web
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+STUB_PORT = 8765
+
+# Connections the API opened to the stub and the most requests it had in flight at once
+stub_stats = {"peers": set(), "in_flight": 0, "peak_in_flight": 0}
+
+
+# --- STUB GEMINI SERVER ---
+def build_stub_app(delay: float) -> web.Application:
+    async def generate_content(request: web.Request):
+        stub_stats["peers"].add(request.transport.get_extra_info("peername"))
+        stub_stats["in_flight"] += 1
+        stub_stats["peak_in_flight"] = max(stub_stats["peak_in_flight"], stub_stats["in_flight"])
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            stub_stats["in_flight"] -= 1
+        return web.json_response({
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": "Stub answer from the fake Gemini server."}]},
+                "finishReason": "STOP"
+            }],
+            "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 8, "totalTokenCount": 18}
+        })
+
+    app = web.Application()
+    app.router.add_route("POST", "/{tail:.*}", generate_content)
+    return app
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run(concurrency: int, delay: float):
+    # Point the API at a throwaway SQLite DB and the stub before importing it
+    db_file = Path(tempfile.mkdtemp()) / "bench.db"
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_file}"
+    os.environ["GEMINI_API_KEY_1"] = "stub-key"
+    os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{STUB_PORT}"
+
+    import httpx
+    from api.main import app
+    from api.gemini_client import POOL_LIMITS
+
+    runner = web.AppRunner(build_stub_app(delay))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", STUB_PORT).start()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        login = await client.post("/auth/verify-otp", json={"phone_number": "9876543210", "otp": "123456"})
+        user_id = login.json()["user_id"]
+
+        session_ids = []
+        for i in range(concurrency):
+            res = await client.post(f"/chat/sessions?user_id={user_id}", json={"title": f"Bench {i}"})
+            session_ids.append(res.json()["id"])
+
+        async def send_chat(session_id):
+            start = time.perf_counter()
+            res = await client.post(
+                f"/chat/{session_id}/message?user_id={user_id}",
+                json={"content": "Tomato leaves are turning yellow, what should I do?"}
+            )
+            res.raise_for_status()
+            return time.perf_counter() - start
+
+        probe_latencies = []
+        chats_done = asyncio.Event()
+
+        async def probe_cheap_endpoint():
+            while not chats_done.is_set():
+                start = time.perf_counter()
+                await client.get(f"/users/{user_id}")
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.05)
+
+        probe_task = asyncio.create_task(probe_cheap_endpoint())
+        wall_start = time.perf_counter()
+        chat_latencies = await asyncio.gather(*(send_chat(sid) for sid in session_ids))
+        wall = time.perf_counter() - wall_start
+        chats_done.set()
+        await probe_task
+
+    await runner.cleanup()
+
+    print(f"Chats: {concurrency} concurrent, stub delay {delay:.2f}s")
+    print(f"  wall time        : {wall:.2f}s")
+    print(f"  throughput       : {concurrency / wall:.1f} chats/s")
+    print(f"  chat p50 / p99   : {statistics.median(chat_latencies):.2f}s / {percentile(chat_latencies, 0.99):.2f}s")
+    if probe_latencies:
+        print(f"  /users p50 / p99 : {statistics.median(probe_latencies) * 1000:.1f}ms / {percentile(probe_latencies, 0.99) * 1000:.1f}ms")
+
+    peak = stub_stats["peak_in_flight"]
+    print(f"  Gemini conns     : {len(stub_stats['peers'])} opened, peak {peak} in flight (pool limit {POOL_LIMITS.max_connections})")
+    if peak > POOL_LIMITS.max_connections:
+        print("  ❌ The per-key pool limit is not enforced on the async client.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=120)
+    parser.add_argument("--delay", type=float, default=2.0, help="Seconds the stub Gemini waits before answering")
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency, args.delay))
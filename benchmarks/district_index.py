@@ -0,0 +1,170 @@
+"""
+Startup cost, memory and lookup speed of the compiled district index used by api/geocoding.py,
+against parsing the source GeoJSON at startup.
+
+Uses synthetic districts over India's bounding box: a jittered grid of cells whose shared
+edges are wiggly polylines (both neighbours get the same vertices, like real boundaries).
+Pass --geojson to measure a real boundary file instead.
+
+Usage:
+    python benchmarks/district_index.py --districts 750 --edge-points 150
+    python benchmarks/district_index.py --geojson data/india_districts.geojson
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from api.district_index import DistrictIndex, build_district_index
+from api.build_district_index import read_geojson_districts
+
+INDIA_BOUNDS = (68.0, 6.0, 98.0, 37.0)
+
+
+def synthetic_geojson(districts: int, edge_points: int) -> dict:
+    random.seed(11)
+    min_lon, min_lat, max_lon, max_lat = INDIA_BOUNDS
+    cols = int(math.sqrt(districts * (max_lon - min_lon) / (max_lat - min_lat)))
+    rows = max(1, districts // cols)
+    dx, dy = (max_lon - min_lon) / cols, (max_lat - min_lat) / rows
+
+    # Jittered corners; the outer frame stays straight
+    corners = {}
+    for r in range(rows + 1):
+        for c in range(cols + 1):
+            jx = 0 if c in (0, cols) else random.uniform(-0.3, 0.3) * dx
+            jy = 0 if r in (0, rows) else random.uniform(-0.3, 0.3) * dy
+            corners[r, c] = (min_lon + c * dx + jx, min_lat + r * dy + jy)
+
+    edges = {}
+
+    def edge(a, b):
+        """Wiggly polyline from corner a to corner b, generated once per shared edge."""
+        if (b, a) in edges:
+            return edges[b, a][::-1]
+        if (a, b) not in edges:
+            (x0, y0), (x1, y1) = corners[a], corners[b]
+            length = math.hypot(x1 - x0, y1 - y0)
+            nx, ny = (y0 - y1) / length, (x1 - x0) / length
+            frame = a[0] == b[0] in (0, rows) or a[1] == b[1] in (0, cols)
+            phase = random.random() * 6.28
+            points = []
+            for i in range(edge_points):
+                t = i / edge_points
+                wiggle = 0 if frame else 0.04 * length * math.sin(t * math.pi) * math.sin(phase + t * 25)
+                points.append([x0 + (x1 - x0) * t + nx * wiggle, y0 + (y1 - y0) * t + ny * wiggle])
+            edges[a, b] = points
+        return edges[a, b]
+
+    features = []
+    for r in range(rows):
+        for c in range(cols):
+            ring = edge((r, c), (r, c + 1)) + edge((r, c + 1), (r + 1, c + 1)) + edge((r + 1, c + 1), (r + 1, c)) + edge((r + 1, c), (r, c))
+            ring.append(ring[0])
+            features.append({
+                "type": "Feature",
+                "properties": {"st_nm": f"State {r // 4}", "district": f"District {r}-{c}"},
+                "geometry": {"type": "Polygon", "coordinates": [ring]},
+            })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def rss_kb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def brute_force(districts: list, lat: float, lon: float):
+    """Reference answer: even-odd over every ring of every district."""
+    for d, (_, _, rings) in enumerate(districts):
+        inside = False
+        for ring in rings:
+            xj, yj = ring[-1]
+            for xi, yi in ring:
+                if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+                    inside = not inside
+                xj, yj = xi, yi
+        if inside:
+            return d
+    return -1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--geojson")
+    parser.add_argument("--districts", type=int, default=750)
+    parser.add_argument("--edge-points", type=int, default=150)
+    parser.add_argument("--cell-degrees", type=float, default=0.05)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    geojson_path = args.geojson
+    if not geojson_path:
+        geojson_path = os.path.join(workdir, "districts.geojson")
+        with open(geojson_path, "w") as f:
+            json.dump(synthetic_geojson(args.districts, args.edge_points), f)
+    index_path = os.path.join(workdir, "districts.idx")
+
+    # --- GeoJSON at startup (what api/geocoding.py did before the compiled index) ---
+    tracemalloc.start()
+    started = time.perf_counter()
+    districts = read_geojson_districts(geojson_path)
+    geojson_seconds = time.perf_counter() - started
+    geojson_heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    vertices = sum(len(ring) for _, _, rings in districts for ring in rings)
+    print(f"source: {len(districts)} districts, {vertices} vertices, {os.path.getsize(geojson_path) / 1e6:.1f} MB GeoJSON")
+    print(f"GeoJSON parse at startup           {geojson_seconds * 1000:8.1f} ms, {geojson_heap / 1e6:7.1f} MB heap")
+
+    started = time.perf_counter()
+    stats = build_district_index(districts, index_path, args.cell_degrees)
+    print(f"compile (offline, once)            {(time.perf_counter() - started) * 1000:8.1f} ms -> {stats['bytes'] / 1e6:.1f} MB index, grid {stats['grid']}, {stats['boundary_cells']} boundary cells")
+
+    # --- Compiled index ---
+    rss_before = rss_kb()
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = DistrictIndex(index_path)
+    open_seconds = time.perf_counter() - started
+    open_heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"index open at startup              {open_seconds * 1000:8.2f} ms, {open_heap / 1e6:7.2f} MB heap")
+
+    random.seed(3)
+    min_lon, min_lat, max_lon, max_lat = INDIA_BOUNDS
+    points = [(random.uniform(min_lat, max_lat), random.uniform(min_lon, max_lon)) for _ in range(args.lookups)]
+
+    started = time.perf_counter()
+    results = [index.district_at(lat, lon) for lat, lon in points]
+    elapsed = time.perf_counter() - started
+    print(f"point lookup (random points)       {elapsed / len(points) * 1e6:8.1f} µs per point")
+
+    direct = sum(1 for lat, lon in points if index.cells[index.cell_of(lat, lon)] >= -1)
+    print(f"  answered from the grid alone     {100 * direct / len(points):8.1f} %")
+
+    started = time.perf_counter()
+    index.lookup_many(points)
+    print(f"batch lookup_many                  {(time.perf_counter() - started) / len(points) * 1e6:8.1f} µs per point")
+    print(f"RSS growth after lookups           {(rss_kb() - rss_before) / 1e3:8.1f} MB (mapped pages touched, shared with the page cache)")
+
+    sample = points[:300]
+    mismatches = sum(1 for (lat, lon), got in zip(sample, results) if brute_force(districts, lat, lon) != got)
+    print(f"mismatches vs brute force ({len(sample)} pts)  {mismatches:6d}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
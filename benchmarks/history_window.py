@@ -0,0 +1,110 @@
+"""
+Prompt size and context-build latency vs. session length: full history vs. the
+bounded window + rolling summary used by the chat endpoints.
+
+Builds synthetic sessions in a throwaway SQLite DB. With --live (and a Gemini key in
+the environment) it also sends each prompt to Gemini and reports the real
+prompt_token_count and model latency.
+
+Usage:
+    python benchmarks/history_window.py --lengths 10 50 100 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench.db'}")
+
+from google.genai import types
+
+from db import models
+from db.database import engine, SessionLocal
+from db.models import User, ChatSession, ChatMessage
+from api.chat_context import load_history_window, build_history_contents, estimate_tokens
+from api.gemini_client import key_pool
+
+SAMPLE_QUESTION = "My soybean field in Latur has yellow patches on the lower leaves after the last rain, what should I spray and how much per 15L pump?"
+SAMPLE_ANSWER = (
+    "Yellowing of lower leaves after heavy rain is usually nitrogen loss or early root rot. "
+    "Drain standing water first. Spray 19:19:19 at 75g per 15L pump, and if the roots look brown "
+    "drench Carbendazim 50% WP at 30g per 15L pump near the stem. Check again after 5 days."
+)
+SAMPLE_SUMMARY = "Farmer grows soybean in Latur. Discussed yellowing after rain, 19:19:19 foliar spray and Carbendazim drench."
+
+
+def seed_session(db, user_id: int, length: int) -> ChatSession:
+    session = ChatSession(user_id=user_id, title=f"Bench {length}", summary=SAMPLE_SUMMARY)
+    db.add(session)
+    db.flush()
+    for i in range(length):
+        role = "user" if i % 2 == 0 else "model"
+        db.add(ChatMessage(session_id=session.id, role=role, content=SAMPLE_QUESTION if role == "user" else SAMPLE_ANSWER))
+    db.commit()
+    return session
+
+
+def timed(fn, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat * 1000
+
+
+async def live_call(contents):
+    start = time.perf_counter()
+    response = await key_pool.generate_content(
+        model="gemini-2.5-flash",
+        contents=contents,
+        config=types.GenerateContentConfig(max_output_tokens=50)
+    )
+    tokens = response.usage_metadata.prompt_token_count if response.usage_metadata else None
+    return tokens, time.perf_counter() - start
+
+
+def main(lengths, live):
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = User(phone_number="9876543210", is_verified=True)
+    db.add(user)
+    db.commit()
+
+    print(f"{'msgs':>6} | {'full tokens':>11} {'full ms':>8} | {'window tokens':>13} {'window ms':>9}" + (" | live full / window" if live else ""))
+    for length in lengths:
+        session = seed_session(db, user.id, length)
+
+        def load_full():
+            msgs = db.query(ChatMessage).filter(ChatMessage.session_id == session.id).order_by(ChatMessage.created_at.asc()).all()
+            return build_history_contents(msgs)
+
+        def load_window():
+            window, _ = load_history_window(db, session)
+            return build_history_contents(window)
+
+        full, full_ms = timed(load_full)
+        windowed, window_ms = timed(load_window)
+        full_tokens = sum(estimate_tokens(c.parts[0].text) for c in full)
+        window_tokens = sum(estimate_tokens(c.parts[0].text) for c in windowed) + estimate_tokens(session.summary)
+
+        line = f"{length:>6} | {full_tokens:>11} {full_ms:>8.2f} | {window_tokens:>13} {window_ms:>9.2f}"
+        if live:
+            full_live = asyncio.run(live_call(full))
+            window_live = asyncio.run(live_call(windowed))
+            line += f" | {full_live[0]} tok {full_live[1]:.2f}s / {window_live[0]} tok {window_live[1]:.2f}s"
+        print(line)
+
+    db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 50, 100, 200, 400])
+    parser.add_argument("--live", action="store_true", help="Also call Gemini and report real prompt tokens and latency")
+    args = parser.parse_args()
+    main(args.lengths, args.live)
@@ -0,0 +1,115 @@
+"""
+Time-to-first-audio-byte for long answers: single-request TTS vs. sentence-chunked
+parallel synthesis, against a local fake TTS server.
+
+The fake server mimics the Edge TTS latency profile: a fixed setup cost plus a
+per-character processing cost before it starts returning audio. edge_tts.Communicate
+is swapped for a small client that talks to it, everything else is the real
+tts_service code path (caching is bypassed).
+
+Usage:
+    python benchmarks/tts_first_byte.py --setup-ms 300 --per-char-ms 4
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from api import tts_service
+
+FAKE_TTS_PORT = 8766
+
+SAMPLE_ANSWER = (
+    "Namaste! Yellowing of the lower leaves after heavy rain usually means nitrogen has washed out of the soil. "
+    "First, drain any standing water from the field within a day. "
+    "Then spray 19:19:19 water soluble fertilizer at 75 grams per 15 litre pump, preferably in the evening. "
+    "If the roots look brown or soft, drench Carbendazim 50 percent WP at 30 grams per 15 litre pump near the stem. "
+    "Avoid urea top dressing until the soil dries, otherwise it will be lost again. "
+    "Check the new leaves after five days, they should come out green. "
+    "If the yellowing spreads upward, send me a photo and we will look at sulphur or zinc deficiency next."
+)
+
+
+# --- FAKE TTS SERVER ---
+def build_fake_server(setup_ms: float, per_char_ms: float) -> web.Application:
+    async def synthesize(request: web.Request):
+        text = (await request.json())["text"]
+        await asyncio.sleep((setup_ms + per_char_ms * len(text)) / 1000)
+
+        response = web.StreamResponse(headers={"Content-Type": "audio/mpeg"})
+        await response.prepare(request)
+        # ~1 byte of "audio" per character, sent in a few frames
+        for _ in range(4):
+            await response.write(b"\xff" * max(1, len(text) // 4))
+            await asyncio.sleep(0.01)
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post("/synthesize", synthesize)
+    return app
+
+
+class FakeCommunicate:
+    """Drop-in for edge_tts.Communicate that calls the fake server."""
+    session = None
+
+    def __init__(self, text: str, voice: str):
+        self.text = text
+
+    async def stream(self):
+        async with FakeCommunicate.session.post(f"http://127.0.0.1:{FAKE_TTS_PORT}/synthesize", json={"text": self.text}) as response:
+            async for data in response.content.iter_any():
+                yield {"type": "audio", "data": data}
+
+
+async def measure(chunked: bool, concurrency: int):
+    clean_text = tts_service.clean_text_for_tts(SAMPLE_ANSWER)
+    voice = "en-IN-PrabhatNeural"
+    if chunked:
+        stream = tts_service.synthesize_chunked(clean_text, voice, concurrency)
+    else:
+        stream = tts_service.synthesize_stream(clean_text, voice)
+
+    start = time.perf_counter()
+    first_byte = None
+    total = 0
+    async for chunk in stream:
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        total += len(chunk)
+    return first_byte, time.perf_counter() - start, total
+
+
+async def run(setup_ms: float, per_char_ms: float, concurrency: int):
+    runner = web.AppRunner(build_fake_server(setup_ms, per_char_ms))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", FAKE_TTS_PORT).start()
+
+    FakeCommunicate.session = aiohttp.ClientSession()
+    tts_service.edge_tts.Communicate = FakeCommunicate
+
+    chunks = tts_service.split_sentences(tts_service.clean_text_for_tts(SAMPLE_ANSWER))
+    print(f"Answer: {len(SAMPLE_ANSWER)} chars, {len(chunks)} chunks; fake server {setup_ms}ms + {per_char_ms}ms/char")
+    for label, chunked in (("single request", False), (f"chunked x{concurrency}", True)):
+        first_byte, total_time, size = await measure(chunked, concurrency)
+        print(f"  {label:<15} first byte {first_byte * 1000:7.0f}ms   complete {total_time * 1000:7.0f}ms   {size} bytes")
+
+    await FakeCommunicate.session.close()
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--setup-ms", type=float, default=300)
+    parser.add_argument("--per-char-ms", type=float, default=4)
+    parser.add_argument("--concurrency", type=int, default=tts_service.TTS_CHUNK_CONCURRENCY)
+    args = parser.parse_args()
+    asyncio.run(run(args.setup_ms, args.per_char_ms, args.concurrency))
@@ -0,0 +1,107 @@
+"""
+Parse + daily aggregation cost of one OpenWeatherMap 5-day/3-hour payload: the old
+per-slot dict loop vs. the columnar ForecastSeries used by api/weather_service.py.
+The old loop computes fewer fields (no description, rain chance or humidity, UTC days)
+and is still the faster of the two; the columnar form pays off in the cache, where the
+hourly series is rebuilt from stored columns instead of re-fetched.
+
+Uses a synthetic 40-slot payload shaped like the real API (dry slots have no 'rain' key).
+
+Usage:
+    python benchmarks/weather_parse.py --iterations 5000
+"""
+import argparse
+import random
+import sys
+import time
+import timeit
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from api.weather_service import ForecastSeries
+
+
+def synthetic_payload(slots: int = 40) -> dict:
+    random.seed(7)
+    start = int(time.time()) // 10800 * 10800
+    items = []
+    for i in range(slots):
+        condition = random.choice(["Rain", "Clouds", "Clear", "Clouds", "Drizzle"])
+        item = {
+            "dt": start + i * 10800,
+            "main": {"temp": 28 + random.random() * 6, "temp_min": 24 + random.random() * 4, "temp_max": 30 + random.random() * 6, "humidity": random.randint(40, 95)},
+            "weather": [{"main": condition, "description": {"Rain": "light rain", "Drizzle": "drizzle", "Clear": "clear sky"}.get(condition, "scattered clouds")}],
+            "wind": {"speed": random.random() * 8},
+            "pop": random.random(),
+            "dt_txt": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start + i * 10800)),
+        }
+        if condition in ("Rain", "Drizzle"):
+            item["rain"] = {"3h": round(random.random() * 5, 2)}
+        items.append(item)
+    return {"list": items, "city": {"timezone": 19800}}
+
+
+def legacy_daily(data: dict) -> list:
+    """The loop get_cached_weather used before (UTC dates from dt_txt)."""
+    daily_forecast = {}
+    for item in data['list']:
+        date_str = item['dt_txt'].split(' ')[0]
+        rain_mm = item.get('rain', {}).get('3h', 0.0)
+        condition = item['weather'][0]['main']
+
+        if date_str not in daily_forecast:
+            daily_forecast[date_str] = {
+                'temp_max': item['main']['temp_max'],
+                'temp_min': item['main']['temp_min'],
+                'rain_mm': rain_mm,
+                'conditions': [condition]
+            }
+        else:
+            daily_forecast[date_str]['temp_max'] = max(daily_forecast[date_str]['temp_max'], item['main']['temp_max'])
+            daily_forecast[date_str]['temp_min'] = min(daily_forecast[date_str]['temp_min'], item['main']['temp_min'])
+            daily_forecast[date_str]['rain_mm'] += rain_mm
+            daily_forecast[date_str]['conditions'].append(condition)
+
+    final_forecast = []
+    for date_str, info in list(daily_forecast.items())[:5]:
+        conds = info['conditions']
+        if 'Rain' in conds or 'Thunderstorm' in conds or 'Drizzle' in conds:
+            main_cond = 'Rainy'
+        elif 'Clear' in conds:
+            main_cond = 'Sunny'
+        else:
+            main_cond = 'Cloudy'
+        final_forecast.append({
+            "date": date_str,
+            "temp_max": round(info['temp_max'], 1),
+            "temp_min": round(info['temp_min'], 1),
+            "rain_mm": round(info['rain_mm'], 1),
+            "condition": main_cond
+        })
+    return final_forecast
+
+
+def report(name: str, seconds: float, iterations: int):
+    print(f"{name:<34} {seconds / iterations * 1e6:8.1f} µs per payload")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    payload = synthetic_payload()
+    series = ForecastSeries.from_payload(payload)
+    hourly = series.to_columns()
+
+    report("legacy dict loop (daily only)", timeit.timeit(lambda: legacy_daily(payload), number=args.iterations), args.iterations)
+    report("columnar parse", timeit.timeit(lambda: ForecastSeries.from_payload(payload), number=args.iterations), args.iterations)
+    report("columnar daily group-by", timeit.timeit(series.daily, number=args.iterations), args.iterations)
+    report("columnar parse + daily", timeit.timeit(lambda: ForecastSeries.from_payload(payload).daily(), number=args.iterations), args.iterations)
+    report("rebuild from cached hourly", timeit.timeit(lambda: ForecastSeries.from_columns(hourly), number=args.iterations), args.iterations)
+
+
+if __name__ == "__main__":
+    main()
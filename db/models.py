@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Float, LargeBinary, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, Date, Boolean, ForeignKey, Text, Float, LargeBinary, JSON, or_, UniqueConstraint, Index
+from sqlalchemy.orm import relationship, deferred, column_property
 import datetime
 import pytz
 from db.database import Base
@@ -47,6 +47,14 @@ class ChatSession(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     title = Column(String, default="New Chat") 
+    # Auto-title job state: None (not requested), pending, ready, failed
+    title_status = Column(String, nullable=True)
+    # When the pending job was claimed; a pending job older than the claim timeout is up for grabs again
+    title_claimed_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Rolling summary of messages that fell out of the verbatim history window
+    summary = Column(Text, nullable=True)
+    summary_message_id = Column(Integer, nullable=True)
 
     created_at = Column(DateTime(timezone=True), default=get_ist_time)
 
@@ -61,25 +69,50 @@ class ChatMessage(Base):
     role = Column(String, nullable=False) 
     content = Column(Text, nullable=False)
     
-    audio_data = Column(LargeBinary, nullable=True) 
+    # Reference into the audio store (content hash of cleaned text + voice)
+    audio_key = Column(String, nullable=True, index=True)
+    # Legacy inline MP3, kept only until api/migrate_audio_blobs.py has moved it out.
+    # Deferred: the blob is only fetched when audio_data itself is accessed
+    audio_data = deferred(Column(LargeBinary, nullable=True))
+    # Computed in SQL so listing messages never pulls the blob
+    has_audio = column_property(or_(audio_key.isnot(None), audio_data.expression.isnot(None)))
     
-    # Using our custom IST function
-    created_at = Column(DateTime(timezone=True), default=get_ist_time)
+    # Using our custom IST function. Indexed for the weather prefetch's "recently active" scan
+    created_at = Column(DateTime(timezone=True), default=get_ist_time, index=True)
     session = relationship("ChatSession", back_populates="messages")
 
-    @property
-    def has_audio(self) -> bool:
-        return self.audio_data is not None
-
 class WeatherCache(Base):
+    """One forecast per location grid cell (~5 km), shared by every farmer inside it."""
     __tablename__ = "weather_cache"
+    __table_args__ = (
+        UniqueConstraint("cell", name="uq_weather_cache_cell"),
+        # Freshness lookup on every chat turn: cell = ? AND expires_at > now
+        Index("ix_weather_cache_cell_expires_at", "cell", "expires_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    cell = Column(String, nullable=False)  # e.g. "19.9000,73.8000", see weather_service.weather_cell
+    # Legacy per-user key, no longer written
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=True)
     forecast_data = Column(Text, nullable=False) 
     
     # Using our custom IST function
     fetched_at = Column(DateTime(timezone=True), default=get_ist_time)
+    # Explicit expiry, compared against an aware "now" (never a naive utcnow)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
+
+class GeocodeCache(Base):
+    """Nominatim answers per location cell (~1 km, see api/geocoding.geocode_cell), so each area is looked up once."""
+    __tablename__ = "geocode_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cell = Column(String, unique=True, index=True, nullable=False)  # e.g. "19.9900,73.7900"
+    state = Column(String, nullable=True)
+    district = Column(String, nullable=True)
+    source = Column(String, nullable=False, default="nominatim")
+    resolved_at = Column(DateTime(timezone=True), default=get_ist_time)
 
 
 class RawScheme(Base):
@@ -114,4 +147,81 @@ class CleanedScheme(Base):
     
     tags = Column(JSON)
     
-    created_at = Column(DateTime(timezone=True), default=get_ist_time)
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), default=get_ist_time)
+
+class MandiPrice(Base):
+    """Local copy of the data.gov.in daily mandi arrivals, filled by api/sync_mandi_prices.py."""
+    __tablename__ = "mandi_prices"
+    __table_args__ = (
+        UniqueConstraint("state", "district", "market", "commodity", "variety", "grade", "arrival_date", name="uq_mandi_prices_record"),
+        # Latest prices for a state / district (market screen)
+        Index("ix_mandi_prices_state_district_date", "state", "district", "arrival_date"),
+        # Latest price of one crop (Gemini bhav tool)
+        Index("ix_mandi_prices_state_commodity_date", "state", "commodity", "arrival_date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    state = Column(String, nullable=False)
+    district = Column(String, nullable=False)
+    market = Column(String, nullable=False)
+    commodity = Column(String, nullable=False)
+    # Empty string instead of NULL so the unique key also matches these rows
+    variety = Column(String, nullable=False, default="")
+    grade = Column(String, nullable=False, default="")
+    arrival_date = Column(Date, nullable=False)
+
+    min_price = Column(Float, nullable=True)
+    max_price = Column(Float, nullable=True)
+    modal_price = Column(Float, nullable=True)
+
+    fetched_at = Column(DateTime(timezone=True), default=get_ist_time)
+
+
+
+class MandiPriceCoverage(Base):
+    """
+    Scopes whose full arrival list for a date is in mandi_prices: a completed cron sync (state="",
+    the whole country) or a completed live fetch of a state (district="") or a district.
+    Local reads only serve covered dates, so partial fetches never pass for a complete list.
+    """
+    __tablename__ = "mandi_price_coverage"
+    __table_args__ = (
+        UniqueConstraint("state", "district", "arrival_date", name="uq_mandi_price_coverage_scope"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    state = Column(String, nullable=False, default="")
+    district = Column(String, nullable=False, default="")
+    arrival_date = Column(Date, nullable=False)
+    source = Column(String, nullable=False)  # "sync" or "live"
+    records = Column(Integer, nullable=False, default=0)
+    completed_at = Column(DateTime(timezone=True), default=get_ist_time)
+
+
+class MandiPriceRollup(Base):
+    """
+    Running modal-price aggregates per day / week / month, kept up to date by upsert_mandi_prices.
+    district="" and market="" rows are the district-wide and state-wide rollups.
+    """
+    __tablename__ = "mandi_price_rollups"
+    __table_args__ = (
+        # Also the lookup index for trend queries (newest buckets first)
+        UniqueConstraint("state", "commodity", "period", "district", "market", "period_start", name="uq_mandi_price_rollups_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    state = Column(String, nullable=False)
+    district = Column(String, nullable=False, default="")
+    market = Column(String, nullable=False, default="")
+    commodity = Column(String, nullable=False)
+    period = Column(String, nullable=False)  # "day", "week" (starts Monday) or "month"
+    period_start = Column(Date, nullable=False)
+
+    # Sums instead of averages so new arrivals can be added (and revised prices swapped) in place
+    observations = Column(Integer, nullable=False, default=0)
+    modal_sum = Column(Float, nullable=False, default=0)
+    modal_sum_sq = Column(Float, nullable=False, default=0)
+    min_modal_price = Column(Float, nullable=True)
+    max_modal_price = Column(Float, nullable=True)
+
+    updated_at = Column(DateTime(timezone=True), default=get_ist_time, onupdate=get_ist_time)